@@ -1,17 +1,40 @@
 import os
+import json
+import time
+import asyncio
 import logging
-from fastapi import FastAPI,Depends,HTTPException
+from fastapi import FastAPI,Depends,HTTPException,Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from functools import partial
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from typing import List, Optional
-from ..helper.rate_limiter import check_rate_limit
-from ..helper.history_store import add_history, get_history
+from ..helper.rate_limiter import acheck_rate_limit, evict_idle_buckets, limit_for
+from ..helper.history_store import aadd_history, aget_history, get_history, count_history, HISTORY
 
 from ..helper.authentication import get_current_token
 from ..helper.s3_loader import load_text_from_s3_for_level,load_text_from_s3
-from ..helper.rag_engine import chroma_client,build_rag_from_text, search_similar_chunks,get_collection_name
+from ..helper.rag_engine import (
+    index_document, aembed_query_for_search, aretrieve_chunks, get_collection_name, RETRIEVAL_TOP_K,
+    aembed_queries_for_search, aretrieve_chunks_batch,
+)
+from ..helper.bm25 import reciprocal_rank_fusion
+from ..helper.router import aroute_question, ROUTER
+from ..helper.answer_cache import ANSWER_CACHE
+from ..helper.context_builder import build_context
+from ..helper.vector_store import get_vector_backend
+from ..helper.query_cache import normalise_query
+from ..helper.single_flight import SingleFlight
+from ..helper.snapshot import restore_snapshot
+from ..helper.readiness import READINESS, READY, FAILED
+from ..helper.embedding_cache import get_embedding_cache
+from ..helper.query_cache import QUERY_EMBEDDING_CACHE
+from ..helper.metrics import (
+    METRICS_ENABLED, REQUEST_SECONDS, stage, record_tokens, register_gauge, render_metrics,
+    start_request_timing, finish_request_timing, server_timing_header,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,90 +51,197 @@ AWS_PGT_KEY = os.getenv("AWS_PGT_KEY")
 AWS_PGR_KEY = os.getenv("AWS_PGR_KEY") 
 AWS_ACADEMIC_KEY = os.getenv("AWS_ACADEMIC_KEY") 
 
-client = OpenAI()
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+# Max questions processed concurrently per worker (retrieval + generation)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", 64))
+
+# "blocking": build every collection before serving (default)
+# "warm": serve immediately and answer 503 for collections still building
+STARTUP_MODE = os.getenv("STARTUP_MODE", "blocking").lower()
+WARMING_RETRY_AFTER_SECONDS = int(os.getenv("WARMING_RETRY_AFTER_SECONDS", 5))
+# Prebuilt index to restore at startup: local path or s3://bucket/key
+INDEX_SNAPSHOT = os.getenv("INDEX_SNAPSHOT")
+
+# History entries returned with an answer when include_history is set, and the /history page size cap
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 10))
+HISTORY_MAX_PAGE_SIZE = 100
+# /ask_batch: max questions per request, and chat completions in flight per batch
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", 50))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 8))
+
+client = AsyncOpenAI()
+request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+# Coalesces identical questions that are in flight at the same time
+inflight = SingleFlight()
+
 class QuestionRequest(BaseModel):
     question: str
     level: str   # "ug" | "pgt" | "pgr"
     origin: str| None = None
+    include_history: bool = False  # add the most recent HISTORY_PAGE_SIZE entries to the response
 
 class Response(BaseModel):
     answer: str
     context_used: List[str]
     collection_used: str
-    history: List[dict]
+    history: Optional[List[dict]] = None  # only when include_history was requested; see GET /history
+    # prompt context size (tiktoken cl100k_base, or a chars/4 estimate if it can't load); None on a cache hit
+    context_tokens: Optional[int] = None
+
+class AskResponse(Response):
+    category: str  # "handbook", "academic_integrity", "other", or "both" when the router was unsure
+    collections_used: List[str]
 
 class ErrorResponse(BaseModel):
     detail: str
 
+class HistoryPage(BaseModel):
+    items: List[dict]  # oldest first
+    total: int
+    limit: int
+    offset: int  # newest entries skipped
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[QuestionRequest]
+
+class BatchItemResponse(BaseModel):
+    status: int  # the status code this question would have had on its own
+    answer: Optional[str] = None
+    context_used: List[str] = []
+    collection_used: Optional[str] = None
+    category: Optional[str] = None
+    context_tokens: Optional[int] = None
+    detail: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResponse]
+
+async def build_collection(collection_name: str, load_text, index_kwargs: dict):
+    """Download one document and sync its collection, recording progress in READINESS."""
+    READINESS.mark_building(collection_name)
+    try:
+        text = await asyncio.to_thread(load_text)
+    except Exception as e:
+        print(f"[MISSING] No document for collection '{collection_name}': {e}")
+        READINESS.mark_unavailable(collection_name, str(e))
+        return
+
+    # Re-indexing is incremental: unchanged chunks are kept and only new
+    # chunks are embedded, so it is cheap to sync on every boot.
+    print(f"[SYNC] Syncing collection '{collection_name}'")
+    try:
+        await asyncio.to_thread(index_document, text, **index_kwargs)
+    except Exception as e:
+        logger.exception(f"Failed to build collection '{collection_name}'")
+        READINESS.mark_failed(collection_name, str(e))
+        return
+
+    READINESS.mark_ready(collection_name)
+    print(f"[OK] Collection '{collection_name}' ready")
+
+
+async def restore_from_snapshot(sources):
+    """
+    Restore collections from INDEX_SNAPSHOT, if configured, and return the
+    sources that still need building. Any failure falls back to a full build.
+    """
+    if not INDEX_SNAPSHOT:
+        return sources
+    try:
+        restored = set(await asyncio.to_thread(restore_snapshot, INDEX_SNAPSHOT))
+    except Exception as e:
+        print(f"[SNAPSHOT] Could not restore '{INDEX_SNAPSHOT}', building from documents instead: {e}")
+        return sources
+
+    for name in restored:
+        READINESS.mark_ready(name)
+    print(f"[SNAPSHOT] Restored {len(restored)} collections from '{INDEX_SNAPSHOT}'")
+    return [source for source in sources if source[0] not in restored]
+
+
+async def initialise_collections(sources):
+    """Restore what the snapshot provides, then build the rest concurrently."""
+    sources = await restore_from_snapshot(sources)
+    await asyncio.gather(*(build_collection(name, load, kwargs) for name, load, kwargs in sources))
+
+    states = READINESS.snapshot()
+    ready = [name for name, entry in states.items() if entry["state"] == READY]
+    if ready:
+        print(f"[INIT] RAG indexes initialised for: {', '.join(ready)}")
+    else:
+        print("No documents available. RAG NOT initialised.")
+
+
+async def fit_router(warmup_task: Optional[asyncio.Task] = None):
+    """Embed the router's examples after startup so the first /ask doesn't pay for it."""
+    if warmup_task is not None:
+        # Let a snapshot restore load the centroids first
+        await asyncio.wait([warmup_task])
+    if ROUTER.fitted:
+        return
+    try:
+        await asyncio.to_thread(ROUTER.fit)
+    except Exception as e:
+        # Not fatal: the router fits on first use, and /ask searches both collections if it can't
+        logger.warning(f"Router could not be fitted at startup: {e}")
+
+
+def check_batch_limit():
+    """A full batch must fit in the /ask_batch bucket, or it could never be accepted."""
+    capacity, _ = limit_for("/ask_batch")
+    if BATCH_MAX_QUESTIONS > capacity:
+        raise RuntimeError(
+            f"BATCH_MAX_QUESTIONS ({BATCH_MAX_QUESTIONS}) exceeds the /ask_batch rate limit ({int(capacity)}); "
+            f"raise it in RATE_LIMITS, e.g. /ask_batch={BATCH_MAX_QUESTIONS * 2}/60"
+        )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    check_batch_limit()
     levels = ["ug", "pgt", "pgr"]
-    handbooks = {}
-    missing_levels = []
-    integrity_text: str | None = None
-    from ..helper.rag_engine import chroma_client
-    try:
-        # Load handbooks from S3
-        for lvl in levels:
-            try:
-                text = load_text_from_s3_for_level(lvl)
-                handbooks[lvl] = text
-                print(f"[OK] Loaded handbook for level: {lvl.upper()}")
-            except Exception as e:
-                print(f"[MISSING] No handbook found for level {lvl.upper()}: {e}")
-                missing_levels.append(lvl)
-        # Load Academic Integrity Regulations
-        try:
-            integrity_text = load_text_from_s3(AWS_ACADEMIC_KEY)
-            print("[OK] Loaded Academic Integrity Regulations")
-        except Exception as e:
-            print(f"[MISSING] No Academic Integrity file: {e}")
-            integrity_text = None
-        except Exception as e:
-            print(f"[MISSING] No Academic Integrity file: {e}")
-
-        existing_names = {col.name for col in chroma_client.list_collections()}
-        if handbooks:
-            existing_names = {col.name for col in chroma_client.list_collections()}
-            # Build RAG only for levels that actually exist
-            for lvl, text in handbooks.items():
-                collection_name = get_collection_name(doc_type="handbook",level=lvl)
-                already_exists = collection_name in existing_names
-                if MODE == "production" and already_exists:
-                    print(f"[SKIP] Collection '{collection_name}' exists — skipping embedding.")
-                else:
-                    print(f"[BUILD] Creating/updating collection '{collection_name}'")
-                    build_rag_from_text(text, doc_type="handbook",level=lvl)
-
-        if integrity_text is not None:
-            integrity_collection = "academic-integrity"
-            already_exists = integrity_collection in existing_names
-
-            if MODE == "production" and already_exists:
-                print(f"[SKIP] Collection '{integrity_collection}' exists — skipping embedding.")
-            else:
-                print(f"[BUILD] Creating/updating collection '{integrity_collection}'")
-                build_rag_from_text(integrity_text, doc_type="academic-integrity")
-
-        if handbooks or integrity_text is not None:
-            print("[INIT] RAG indexes initialised.")
-        else:
-            print("No documents available. RAG NOT initialised.")               
-                
-            print(f"RAG index initialised for: {', '.join([lvl.upper() for lvl in handbooks])}")
+    sources = [
+        (get_collection_name("handbook", lvl), partial(load_text_from_s3_for_level, lvl),
+         {"doc_type": "handbook", "level": lvl})
+        for lvl in levels
+    ]
+    sources.append(
+        ("academic-integrity", partial(load_text_from_s3, AWS_ACADEMIC_KEY), {"doc_type": "academic-integrity"})
+    )
 
-    except Exception as e:
-        print(f"Error during startup initialisation: {e}")
-        raise
+    READINESS.reset()
+    for name, _, _ in sources:
+        READINESS.register(name)
+
+    warmup_task = None
+    if STARTUP_MODE == "warm":
+        # Serve immediately; endpoints return 503 for collections still building
+        print("[INIT] Serving while collections warm up")
+        warmup_task = asyncio.create_task(initialise_collections(sources))
+    else:
+        await initialise_collections(sources)
+        failed = [name for name, entry in READINESS.snapshot().items() if entry["state"] == FAILED]
+        if failed:
+            print(f"Error during startup initialisation: failed to build {', '.join(failed)}")
+            raise RuntimeError(f"Failed to build collections: {', '.join(failed)}")
+
+    eviction_task = asyncio.create_task(evict_idle_buckets())
+    # In the background, so it never delays readiness; a snapshot restore may already have fitted it
+    router_task = asyncio.create_task(fit_router(warmup_task))
 
     yield  # <-- the app runs between startup and shutdown
+    eviction_task.cancel()
+    router_task.cancel()
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
     try:
         if MODE == "development":
-            for col in chroma_client.list_collections():
-                chroma_client.delete_collection(col.name)
-            print("Cleaned up ChromaDB collection on shutdown.")
+            backend = get_vector_backend()
+            for name in backend.list_collection_names():
+                backend.delete_collection(name)
+            print(f"Cleaned up {backend.name} collections on shutdown.")
         else:
-            print("[CLEANUP] Production mode — skipping ChromaDB cleanup.")
+            print("[CLEANUP] Production mode — skipping vector store cleanup.")
         print("Shutting down AI assistant service.")
     except Exception as e:
         print(f"Error during cleanup: {e}")    
@@ -120,22 +250,554 @@ async def lifespan(app: FastAPI):
 # Create app with lifespan handler
 app = FastAPI(lifespan=lifespan)
 
+
+def cache_stats():
+    caches = {"answer": ANSWER_CACHE.stats(), "query_embedding": QUERY_EMBEDDING_CACHE.stats()}
+    embedding_cache = get_embedding_cache()
+    if embedding_cache is not None:
+        caches["embedding"] = embedding_cache.stats()
+    return caches
+
+
+register_gauge("rag_cache_hits", "Cache hits since start.", "cache",
+               lambda: {name: stats["hits"] for name, stats in cache_stats().items()})
+register_gauge("rag_cache_misses", "Cache misses since start.", "cache",
+               lambda: {name: stats["misses"] for name, stats in cache_stats().items()})
+register_gauge("rag_history_size", "Tokens and entries held by the history store.", "kind",
+               lambda: {k: HISTORY.stats()[k] for k in ("tokens", "entries")})
+register_gauge("rag_cache_hit_ratio", "Cache hit rate since start.", "cache",
+               lambda: {name: stats["hit_rate"] for name, stats in cache_stats().items()})
+
+
+if METRICS_ENABLED:
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        """Record request latency and report per-stage timings in a Server-Timing header."""
+        token = start_request_timing()
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            timings = finish_request_timing(token)
+        elapsed = time.perf_counter() - start
+
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(elapsed, route=getattr(route, "path", "unmatched"), status=response.status_code)
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+        return response
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of stage latencies, token counts and cache hit rates."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    """Liveness, with the build state of each collection."""
+    return {"status": "ok", "collections": READINESS.snapshot()}
+
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe for the load balancer: 503 until no collection is still building."""
+    ready = READINESS.all_settled()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "collections": READINESS.snapshot()},
+    )
+
+
+async def response_history(token: str, include: bool) -> Optional[List[dict]]:
+    """The latest page of history for a response, or None unless the client asked for it."""
+    return await aget_history(token, limit=HISTORY_PAGE_SIZE) if include else None
+
+
+# Sync on purpose: FastAPI runs it in the threadpool, off the event loop
+@app.get("/history",
+        summary="Page through the caller's question history",
+        description="Most recent entries first by page: `offset` skips the newest entries, each page is oldest first.",
+        response_model=HistoryPage,
+)
+def history(
+    limit: int = HISTORY_PAGE_SIZE,
+    offset: int = 0,
+    token: str = Depends(get_current_token),
+):
+    if limit < 1 or limit > HISTORY_MAX_PAGE_SIZE or offset < 0:
+        raise HTTPException(
+            status_code=400, detail=f"limit must be 1-{HISTORY_MAX_PAGE_SIZE} and offset must be >= 0"
+        )
+    return HistoryPage(items=get_history(token, limit, offset), total=count_history(token), limit=limit, offset=offset)
+
+
+def ensure_collection_ready(collection_name: str):
+    if READINESS.is_warming(collection_name):
+        raise HTTPException(
+            status_code=503,
+            detail=f"Collection '{collection_name}' is still being built. Please retry shortly.",
+            headers={"Retry-After": str(WARMING_RETRY_AFTER_SECONDS)},
+        )
+
+
+def handbook_system_prompt(level: str, origin: Optional[str]) -> str:
+    system_prompt = f"You are an assistant using the {level} student handbook context. "
+    if origin:
+        system_prompt += f"The student is {origin} student, so consider rules relevant to that."
+    return system_prompt
+
+
+def integrity_system_prompt(origin: Optional[str]) -> str:
+    system_prompt = "You are an assistant using the Academic Integrity Regulations."
+    if origin:
+        system_prompt += f" The student is {origin} student."
+    return system_prompt
+
+
+def combined_system_prompt(level: str, origin: Optional[str]) -> str:
+    system_prompt = (
+        f"You are an assistant using the {level} student handbook and the Academic Integrity Regulations context. "
+    )
+    if origin:
+        system_prompt += f"The student is {origin} student, so consider rules relevant to that."
+    return system_prompt
+
+
+def build_messages(system_prompt: str, context: str, question: str) -> List[dict]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "assistant", "content": context},
+        {"role": "user", "content": question},
+    ]
+
+
+async def retrieve_context(
+    question: str,
+    origin: Optional[str],
+    collection_name: str,
+    doc_type: str,
+    level: Optional[str] = None,
+):
+    """
+    Embed the question once and check the semantic answer cache. On a hit the
+    cached answer and its context are returned and retrieval is skipped.
+    The embedding is None for lexical-only retrieval, which bypasses the cache.
+
+    Returns (query_embedding, context_chunks, cached_answer or None).
+    """
+    query_embedding = await aembed_query_for_search(question, doc_type, level)
+    if query_embedding is not None:
+        cached = ANSWER_CACHE.lookup(collection_name, origin, query_embedding)
+        if cached is not None:
+            logger.info(f"Answer cache hit | collection={collection_name} | similarity={cached['similarity']:.3f}")
+            return query_embedding, cached["context_used"], cached["answer"]
+
+    context_chunks = await aretrieve_chunks(
+        question, doc_type=doc_type, level=level, query_embedding=query_embedding
+    )
+    return query_embedding, context_chunks, None
+
+
+async def generate_answer(system_prompt: str, context: str, question: str) -> str:
+    try:
+        with stage("chat"):
+            completion = await client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=build_messages(system_prompt, context, question),
+            )
+    except Exception as e:
+        logger.error(f"OpenAI API error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate answer from AI model.")
+
+    usage = getattr(completion, "usage", None)
+    record_tokens("prompt", getattr(usage, "prompt_tokens", None))
+    record_tokens("completion", getattr(usage, "completion_tokens", None))
+
+    return completion.choices[0].message.content
+
+
+async def answer_question(
+    question: str,
+    origin: Optional[str],
+    collection_name: str,
+    doc_type: str,
+    level: Optional[str],
+    system_prompt: str,
+    not_found_detail: str,
+):
+    """
+    Retrieval + generation pipeline.
+    Returns (context_chunks, answer, context_tokens); context_tokens is None on an answer cache hit.
+    """
+    async with request_semaphore:
+        query_embedding, context_chunks, answer = await retrieve_context(
+            question, origin, collection_name, doc_type=doc_type, level=level
+        )
+        if not context_chunks:
+            logger.warning(f"No context chunks found for collection={collection_name}")
+            raise HTTPException(status_code=404, detail=not_found_detail)
+
+        context_tokens = None
+        if answer is None:
+            context, context_tokens = build_context(context_chunks)
+            record_tokens("context", context_tokens)
+            answer = await generate_answer(system_prompt, context, question)
+            ANSWER_CACHE.store(collection_name, origin, query_embedding, answer, context_chunks)
+
+    return context_chunks, answer, context_tokens
+
+
+async def answer_question_once(endpoint: str, question: str, origin: Optional[str], **kwargs):
+    """
+    answer_question(), deduplicated: concurrent requests with the same
+    (endpoint, level, origin, normalised question) share one pipeline run.
+    """
+    key = (endpoint, kwargs.get("level"), origin or "", normalise_query(question))
+    return await inflight.ado(key, answer_question, question, origin, **kwargs)
+
+
+async def route_category(question: str, query_embedding: Optional[List[float]]) -> str:
+    """
+    "handbook", "academic_integrity" or "other" from the local router, or
+    "both" when it is unsure (or cannot run), so /ask searches both
+    collections instead of spending a chat call on classification: /ask
+    and /ask_batch make exactly one chat completion per question, whatever
+    ROUTER_LLM_FALLBACK says. "other" also searches both: a misrouted
+    question still gets an answer.
+    """
+    if query_embedding is None:
+        return "both"
+    try:
+        decision = await aroute_question(question, query_embedding, llm_fallback=False)
+    except Exception as e:
+        logger.warning(f"Routing failed ({e}); searching both collections")
+        return "both"
+    return decision["category"] if decision["confident"] else "both"
+
+
+NO_ROUTED_CONTENT = "No relevant content found for this question."
+
+
+def merge_rankings(rankings: List[List[str]]) -> List[str]:
+    """One ranked chunk list per searched collection -> a single list, fused with RRF when there are several."""
+    if len(rankings) == 1:
+        return rankings[0]
+    return reciprocal_rank_fusion(rankings)[:RETRIEVAL_TOP_K]
+
+
+def routed_system_prompt(category: str, level: str, origin: Optional[str]) -> str:
+    if category == "handbook":
+        return handbook_system_prompt(level, origin)
+    if category == "academic_integrity":
+        return integrity_system_prompt(origin)
+    return combined_system_prompt(level, origin)
+
+
+def routed_targets(category: str, level: str) -> List[tuple]:
+    """(collection_name, doc_type, level) to search; for "both"/"other", collections still building are skipped."""
+    handbook = (get_collection_name("handbook", level), "handbook", level)
+    integrity = ("academic-integrity", "academic-integrity", None)
+    if category == "handbook":
+        targets = [handbook]
+    elif category == "academic_integrity":
+        targets = [integrity]
+    else:
+        targets = [t for t in (handbook, integrity) if not READINESS.is_warming(t[0])] or [handbook]
+    for name, _, _ in targets:
+        ensure_collection_ready(name)
+    return targets
+
+
+async def answer_routed_question(question: str, origin: Optional[str], level: str):
+    """
+    /ask pipeline: embed once, route locally, retrieve from the routed
+    collection(s) concurrently, fuse the rankings and make one chat call.
+    Returns (category, collection_names, context_chunks, answer, context_tokens).
+    """
+    async with request_semaphore:
+        query_embedding = await aembed_query_for_search(question, "handbook", level)
+        category = await route_category(question, query_embedding)
+        targets = routed_targets(category, level)
+        names = [name for name, _, _ in targets]
+        cache_key = "+".join(names)
+
+        if query_embedding is not None:
+            cached = ANSWER_CACHE.lookup(cache_key, origin, query_embedding)
+            if cached is not None:
+                logger.info(f"Answer cache hit | collection={cache_key} | similarity={cached['similarity']:.3f}")
+                return category, names, cached["context_used"], cached["answer"], None
+
+        rankings = await asyncio.gather(*(
+            aretrieve_chunks(question, doc_type=doc_type, level=lvl, query_embedding=query_embedding)
+            for _, doc_type, lvl in targets
+        ))
+        context_chunks = merge_rankings(rankings)
+        if not context_chunks:
+            logger.warning(f"No context chunks found for collections={cache_key}")
+            raise HTTPException(status_code=404, detail=NO_ROUTED_CONTENT)
+
+        context, context_tokens = build_context(context_chunks)
+        record_tokens("context", context_tokens)
+        answer = await generate_answer(routed_system_prompt(category, level, origin), context, question)
+        ANSWER_CACHE.store(cache_key, origin, query_embedding, answer, context_chunks, collections=names)
+
+    return category, names, context_chunks, answer, context_tokens
+
+
+async def answer_batch(items: List[QuestionRequest]) -> List[BatchItemResponse]:
+    """
+    /ask_batch pipeline: one embeddings call for every question, local
+    routing, one multi-query vector search per collection, then chat
+    completions with at most BATCH_MAX_CONCURRENCY in flight. Failures are
+    reported per question; results keep the input order.
+    """
+    results: List[Optional[BatchItemResponse]] = [None] * len(items)
+    levels = [item.level.lower() for item in items]
+    valid = []
+    for i, level in enumerate(levels):
+        if level in ["ug", "pgt", "pgr"]:
+            valid.append(i)
+        else:
+            results[i] = BatchItemResponse(status=400, detail="level must be one of: 'ug','pgt','pgr'")
+
+    embeddings = dict(zip(valid, await aembed_queries_for_search([items[i].question for i in valid])))
+
+    # Route each question; answer cache hits are done here
+    plans = {}  # index -> (category, targets, cache_key)
+    for i in valid:
+        item = items[i]
+        category = await route_category(item.question, embeddings[i])
+        try:
+            targets = routed_targets(category, levels[i])
+        except HTTPException as e:
+            results[i] = BatchItemResponse(status=e.status_code, category=category, detail=e.detail)
+            continue
+        cache_key = "+".join(name for name, _, _ in targets)
+        cached = ANSWER_CACHE.lookup(cache_key, item.origin, embeddings[i]) if embeddings[i] is not None else None
+        if cached is not None:
+            results[i] = BatchItemResponse(
+                status=200, answer=cached["answer"], context_used=cached["context_used"],
+                collection_used=cache_key, category=category,
+            )
+        else:
+            plans[i] = (category, targets, cache_key)
+
+    # One retrieval call per collection for every question routed to it
+    groups = {}  # (doc_type, level) -> [index, ...]
+    for i, (_, targets, _) in plans.items():
+        for _, doc_type, lvl in targets:
+            groups.setdefault((doc_type, lvl), []).append(i)
+    group_keys = list(groups)
+    group_results = await asyncio.gather(*(
+        aretrieve_chunks_batch(
+            [items[i].question for i in groups[key]], key[0], key[1], [embeddings[i] for i in groups[key]]
+        )
+        for key in group_keys
+    ), return_exceptions=True)
+
+    retrieved = {i: {} for i in plans}  # index -> {(doc_type, level): chunks}
+    for key, outcome in zip(group_keys, group_results):
+        if isinstance(outcome, Exception):
+            logger.error(f"Batch retrieval failed for {key}: {outcome}")
+            outcome = [None] * len(groups[key])
+        for i, chunks in zip(groups[key], outcome):
+            retrieved[i][key] = chunks
+
+    limit = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def generate(i: int):
+        item = items[i]
+        category, targets, cache_key = plans[i]
+        rankings = [retrieved[i][(doc_type, lvl)] for _, doc_type, lvl in targets]
+        if any(r is None for r in rankings):
+            results[i] = BatchItemResponse(status=500, category=category, detail="Unexpected internal server error.")
+            return
+        context_chunks = merge_rankings(rankings)
+        if not context_chunks:
+            results[i] = BatchItemResponse(status=404, category=category, detail=NO_ROUTED_CONTENT)
+            return
+
+        context, context_tokens = build_context(context_chunks)
+        record_tokens("context", context_tokens)
+        try:
+            async with limit, request_semaphore:
+                answer = await generate_answer(
+                    routed_system_prompt(category, levels[i], item.origin), context, item.question
+                )
+        except HTTPException as e:
+            results[i] = BatchItemResponse(status=e.status_code, category=category, detail=e.detail)
+            return
+        ANSWER_CACHE.store(
+            cache_key, item.origin, embeddings[i], answer, context_chunks,
+            collections=[name for name, _, _ in targets],
+        )
+        results[i] = BatchItemResponse(
+            status=200, answer=answer, context_used=context_chunks, collection_used=cache_key,
+            category=category, context_tokens=context_tokens,
+        )
+
+    await asyncio.gather(*(generate(i) for i in plans))
+    return results
+
+
+async def stream_answer(system_prompt: str, context: str, question: str):
+    """Yield answer text deltas as the model produces them."""
+    stream = await client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=build_messages(system_prompt, context, question),
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_answer_response(
+    token: str,
+    question: str,
+    origin: Optional[str],
+    system_prompt: str,
+    query_embedding: List[float],
+    context_chunks: List[str],
+    collection_name: str,
+    cached_answer: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Server-Sent Events stream: a `context` event with the retrieved chunks,
+    one `token` event per answer delta, then `done` with the full answer
+    (or `error` if generation fails). The full answer is added to history
+    once the stream completes. A cached answer is sent as a single token.
+    """
+    async def events():
+        if cached_answer is not None:
+            yield sse_event("context", {"context_used": context_chunks, "collection_used": collection_name,
+                                        "context_tokens": None})
+            answer = cached_answer
+            yield sse_event("token", {"text": answer})
+        else:
+            context, context_tokens = build_context(context_chunks)
+            record_tokens("context", context_tokens)
+            yield sse_event("context", {"context_used": context_chunks, "collection_used": collection_name,
+                                        "context_tokens": context_tokens})
+            parts = []
+            try:
+                async with request_semaphore:
+                    with stage("chat_stream"):
+                        async for delta in stream_answer(system_prompt, context, question):
+                            parts.append(delta)
+                            yield sse_event("token", {"text": delta})
+            except Exception as e:
+                logger.error(f"OpenAI API error: {e}")
+                yield sse_event("error", {"detail": "Failed to generate answer from AI model."})
+                return
+            answer = "".join(parts)
+            ANSWER_CACHE.store(collection_name, origin, query_embedding, answer, context_chunks)
+
+        await aadd_history(token, question, answer)
+        yield sse_event("done", {"answer": answer})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/ask",
+        summary="Ask a question without choosing the document",
+        description=(
+            "Embeds the question once, routes it to the handbook or the Academic Integrity Regulations, "
+            "and searches both concurrently when the routing is ambiguous. One chat completion per question."
+        ),
+        response_model=AskResponse,
+        responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+)
+async def ask(
+    payload: QuestionRequest,
+    token: str = Depends(get_current_token),
+):
+    await acheck_rate_limit(token, "/ask")
+    question = payload.question
+    level = payload.level.lower()
+    origin = payload.origin
+    if level not in ["ug", "pgt", "pgr"]:
+        raise HTTPException(status_code=400, detail="level must be one of: 'ug','pgt','pgr'")
+
+    logger.info(f"/ask request | level={level} | question='{payload.question}'")
+
+    try:
+        key = ("ask", level, origin or "", normalise_query(question))
+        category, names, context_chunks, answer, context_tokens = await inflight.ado(
+            key, answer_routed_question, question, origin, level
+        )
+
+        await aadd_history(token, question, answer)
+
+        return AskResponse(
+            answer=answer,
+            context_used=context_chunks,
+            collection_used="+".join(names),
+            collections_used=names,
+            category=category,
+            history=await response_history(token, payload.include_history),
+            context_tokens=context_tokens,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Unexpected error in /ask")
+        raise HTTPException(status_code=500, detail="Unexpected internal server error.")
+
+
+@app.post("/ask_batch",
+        summary="Ask several questions in one request",
+        description=(
+            "Routes each question like /ask, embeds all of them in one call, groups retrieval per collection "
+            "and generates answers concurrently. Results are in request order, with a status per question."
+        ),
+        response_model=BatchResponse,
+        responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
+)
+async def ask_batch(
+    payload: BatchQuestionRequest,
+    token: str = Depends(get_current_token),
+):
+    if len(payload.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch.")
+    # Each question costs as much as one /ask call
+    await acheck_rate_limit(token, "/ask_batch", cost=len(payload.questions))
+
+    logger.info(f"/ask_batch request | questions={len(payload.questions)}")
+
+    try:
+        results = await answer_batch(payload.questions)
+    except Exception:
+        logger.exception("Unexpected error in /ask_batch")
+        raise HTTPException(status_code=500, detail="Unexpected internal server error.")
+
+    for item, result in zip(payload.questions, results):
+        if result.status == 200:
+            await aadd_history(token, item.question, result.answer)
+    return BatchResponse(results=results)
 
 
 @app.post("/ask_handbook",
         summary="Query the student handbook using RAG",
         description="Retrieves relevant handbook text (UG/PGT/PGR) and answers the question using GPT with RAG context.",
         response_model=Response,
-        responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
+        responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
 )
-def ask_handbook(
+async def ask_handbook(
     payload: QuestionRequest,
     token: str = Depends(get_current_token),
 ):
-    check_rate_limit(token)
+    await acheck_rate_limit(token, "/ask_handbook")
     question = payload.question
     level = payload.level.lower()
     origin = payload.origin
@@ -145,37 +807,25 @@ def ask_handbook(
     logger.info(f"/ask_handbook request | level={level} | question='{payload.question}'")
 
     collection_name = get_collection_name("handbook", level)
+    ensure_collection_ready(collection_name)
     try:
-    # Retrieve relevant chunks
-        context_chunks = search_similar_chunks(question,doc_type="handbook", level=level)
-        if not context_chunks:
-            logger.warning(f"No context chunks found for level={level}")
-            raise HTTPException(status_code=404, detail=f"No handbook content found for level '{level}'.")
-        system_prompt = f"You are an assistant using the {level} student handbook context. "
-        if origin:
-            system_prompt += f"The student is {origin} student, so consider rules relevant to that."
-        try: 
-            completion = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "assistant", "content": "\n".join(context_chunks)},
-                    {"role": "user", "content": question},
-                ],
-            )
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            raise HTTPException(status_code=500, detail="Failed to generate answer from AI model.")
-        
-        answer = completion.choices[0].message.content
+        context_chunks, answer, context_tokens = await answer_question_once(
+            "ask_handbook", question, origin,
+            collection_name=collection_name,
+            doc_type="handbook",
+            level=level,
+            system_prompt=handbook_system_prompt(level, origin),
+            not_found_detail=f"No handbook content found for level '{level}'.",
+        )
 
-        add_history(token, question, answer)
+        await aadd_history(token, question, answer)
 
         return Response(
             answer=answer,
             context_used=context_chunks,
             collection_used=collection_name,
-            history=get_history(token)
+            history=await response_history(token, payload.include_history),
+            context_tokens=context_tokens,
         )
     except HTTPException:
         raise
@@ -188,14 +838,14 @@ def ask_handbook(
         summary="Query the Academic Integrity Regulations using RAG",
         description="Retrieves relevant academic integrity text and answers the question using GPT with RAG context.",
         response_model=Response,
-        responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}},
+        responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
 )
-def ask_integrity(
+async def ask_integrity(
     payload: QuestionRequest,
     token: str = Depends(get_current_token),
 ):
 
-    check_rate_limit(token)
+    await acheck_rate_limit(token, "/ask_academic_integrity")
 
     logger.info(f"/ask_academic_integrity request | question='{payload.question}'")
 
@@ -203,39 +853,105 @@ def ask_integrity(
     origin = payload.origin
 
     collection_name = "academic-integrity"
+    ensure_collection_ready(collection_name)
     try:
-        context_chunks = search_similar_chunks(question, doc_type="academic-integrity")
-        if not context_chunks:
-            logger.warning("No academic integrity chunks found")
-            raise HTTPException(status_code=404, detail="No academic integrity content available.")
+        context_chunks, answer, context_tokens = await answer_question_once(
+            "ask_academic_integrity", question, origin,
+            collection_name=collection_name,
+            doc_type="academic-integrity",
+            level=None,
+            system_prompt=integrity_system_prompt(origin),
+            not_found_detail="No academic integrity content available.",
+        )
 
-        system_prompt = "You are an assistant using the Academic Integrity Regulations."
-        if origin:
-            system_prompt += f" The student is {origin} student."
-        try:
-            completion = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "assistant", "content": "\n".join(context_chunks)},
-                    {"role": "user", "content": question},
-                ]
-            )
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            raise HTTPException(status_code=500, detail="Failed to generate answer from AI model.")
-        
-        answer = completion.choices[0].message.content
-        add_history(token, question, answer)
+        await aadd_history(token, question, answer)
 
         return Response(
             answer=answer,
             context_used=context_chunks,
             collection_used=collection_name,
-            history=get_history(token)
+            history=await response_history(token, payload.include_history),
+            context_tokens=context_tokens,
         )
     except HTTPException:
         raise       
     except Exception as e:
         logger.exception("Unexpected error in /ask_academic_integrity")
-        raise HTTPException(status_code=500, detail="Unexpected internal server error.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Unexpected internal server error.")
+
+
+@app.post("/ask_handbook/stream",
+        summary="Stream an answer from the student handbook using RAG",
+        description="Same as /ask_handbook, but streams the retrieved context and then the answer tokens as Server-Sent Events.",
+        response_class=StreamingResponse,
+        responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+)
+async def ask_handbook_stream(
+    payload: QuestionRequest,
+    token: str = Depends(get_current_token),
+):
+    await acheck_rate_limit(token, "/ask_handbook/stream")
+    question = payload.question
+    level = payload.level.lower()
+    if level not in ["ug", "pgt", "pgr"]:
+        raise HTTPException(status_code=400, detail="level must be one of: 'ug','pgt','pgr'")
+
+    logger.info(f"/ask_handbook/stream request | level={level} | question='{payload.question}'")
+
+    collection_name = get_collection_name("handbook", level)
+    ensure_collection_ready(collection_name)
+    try:
+        async with request_semaphore:
+            query_embedding, context_chunks, cached_answer = await retrieve_context(
+                question, payload.origin, collection_name, doc_type="handbook", level=level
+            )
+    except Exception:
+        logger.exception("Unexpected error in /ask_handbook/stream")
+        raise HTTPException(status_code=500, detail="Unexpected internal server error.")
+
+    if not context_chunks:
+        logger.warning(f"No context chunks found for level={level}")
+        raise HTTPException(status_code=404, detail=f"No handbook content found for level '{level}'.")
+
+    system_prompt = handbook_system_prompt(level, payload.origin)
+    return sse_answer_response(
+        token, question, payload.origin, system_prompt, query_embedding,
+        context_chunks, collection_name, cached_answer,
+    )
+
+
+@app.post("/ask_academic_integrity/stream",
+        summary="Stream an answer from the Academic Integrity Regulations using RAG",
+        description="Same as /ask_academic_integrity, but streams the retrieved context and then the answer tokens as Server-Sent Events.",
+        response_class=StreamingResponse,
+        responses={404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+)
+async def ask_integrity_stream(
+    payload: QuestionRequest,
+    token: str = Depends(get_current_token),
+):
+    await acheck_rate_limit(token, "/ask_academic_integrity/stream")
+    question = payload.question
+
+    logger.info(f"/ask_academic_integrity/stream request | question='{payload.question}'")
+
+    collection_name = "academic-integrity"
+    ensure_collection_ready(collection_name)
+    try:
+        async with request_semaphore:
+            query_embedding, context_chunks, cached_answer = await retrieve_context(
+                question, payload.origin, collection_name, doc_type="academic-integrity"
+            )
+    except Exception:
+        logger.exception("Unexpected error in /ask_academic_integrity/stream")
+        raise HTTPException(status_code=500, detail="Unexpected internal server error.")
+
+    if not context_chunks:
+        logger.warning("No academic integrity chunks found")
+        raise HTTPException(status_code=404, detail="No academic integrity content available.")
+
+    system_prompt = integrity_system_prompt(payload.origin)
+    return sse_answer_response(
+        token, question, payload.origin, system_prompt, query_embedding,
+        context_chunks, collection_name, cached_answer,
+    )
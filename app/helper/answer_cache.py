@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed by (collection, origin, question embedding).
+
+    A lookup hits when a stored question for the same collection and origin
+    has cosine similarity >= threshold with the new question. Entries expire
+    after ttl_seconds and the least recently used entry is evicted once
+    max_entries is reached.
+
+    An answer built from several collections is stored under a combined key
+    with the set of collections it used, so invalidating any one of them
+    drops it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        enabled: bool = ANSWER_CACHE_ENABLED,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(embedding: List[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _expire(self, now: float):
+        expired = [k for k, e in self._entries.items() if now - e["created_at"] > self.ttl_seconds]
+        for k in expired:
+            del self._entries[k]
+
+    def lookup(self, collection: str, origin: Optional[str], embedding: List[float]) -> Optional[dict]:
+        """Return {"answer", "context_used", "similarity"} for the best match, or None."""
+        if not self.enabled:
+            return None
+
+        query = self._normalise(embedding)
+        with self._lock:
+            self._expire(time.time())
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if e["collection"] == collection and e["origin"] == (origin or "")
+            ]
+            if candidates:
+                matrix = np.stack([e["embedding"] for _, e in candidates])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return {
+                        "answer": entry["answer"],
+                        "context_used": list(entry["context_used"]),
+                        "similarity": float(scores[best]),
+                    }
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        collection: str,
+        origin: Optional[str],
+        embedding: Optional[List[float]],
+        answer: str,
+        context_used: List[str],
+        collections: Optional[Iterable[str]] = None,
+    ):
+        if not self.enabled or embedding is None:
+            return
+
+        entry = {
+            "collection": collection,
+            "collections": frozenset(collections or (collection,)),
+            "origin": origin or "",
+            "embedding": self._normalise(embedding),
+            "answer": answer,
+            "context_used": list(context_used),
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection: Optional[str] = None):
+        """Drop cached answers that used a collection, or for all collections."""
+        with self._lock:
+            if collection is None:
+                self._entries.clear()
+                return
+            for k in [k for k, e in self._entries.items() if collection in e["collections"]]:
+                del self._entries[k]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "entries": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+ANSWER_CACHE = SemanticAnswerCache()
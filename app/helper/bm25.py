@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+BM25_DIR = os.getenv("BM25_DIR", os.path.join(BASE_DIR, "data/bm25_index"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its my "
+    "of on or our shall should that the their there this to was what when where which who "
+    "will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an in-memory inverted index.
+
+    postings maps term -> {document position: term frequency}; documents are
+    kept so lexical-only retrieval can return chunk text without touching the
+    vector store.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        documents: List[str],
+        postings: Dict[str, Dict[int, int]],
+        doc_lengths: List[int],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.ids = ids
+        self.documents = documents
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_lengths)
+        self.avg_doc_length = (sum(doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, ids: Sequence[str], documents: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        doc_lengths = []
+        for pos, doc in enumerate(documents):
+            terms = tokenize(doc)
+            doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings[term][pos] = tf
+        return cls(list(ids), list(documents), dict(postings), doc_lengths, k1, b)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, str, float]]:
+        """Return up to top_k (id, document, score) tuples with a positive score."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for pos, tf in docs.items():
+                norm = 1 - self.b + self.b * self.doc_lengths[pos] / (self.avg_doc_length or 1)
+                scores[pos] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.ids[pos], self.documents[pos], score) for pos, score in ranked]
+
+    def to_dict(self) -> dict:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "documents": self.documents,
+            "doc_lengths": self.doc_lengths,
+            # JSON object keys must be strings
+            "postings": {term: [[pos, tf] for pos, tf in docs.items()] for term, docs in self.postings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        postings = {term: {pos: tf for pos, tf in docs} for term, docs in data["postings"].items()}
+        return cls(data["ids"], data["documents"], postings, data["doc_lengths"], data["k1"], data["b"])
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Fuse several ranked lists of keys: score(d) = sum(1 / (k + rank))."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
+
+
+# --------------------------------
+# Persistence (one JSON file per collection)
+# --------------------------------
+_loaded: Dict[str, Tuple[float, BM25Index]] = {}
+_lock = threading.Lock()
+
+
+def _index_path(collection_name: str) -> str:
+    return os.path.join(BM25_DIR, f"{collection_name}.json")
+
+
+def save_bm25_index(collection_name: str, index: BM25Index):
+    os.makedirs(BM25_DIR, exist_ok=True)
+    path = _index_path(collection_name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f)
+    os.replace(tmp_path, path)
+    with _lock:
+        _loaded[collection_name] = (os.path.getmtime(path), index)
+
+
+def get_bm25_index(collection_name: str) -> Optional[BM25Index]:
+    """Load (and memoise) the lexical index for a collection; None if it has none."""
+    path = _index_path(collection_name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _lock:
+        cached = _loaded.get(collection_name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        index = BM25Index.from_dict(json.load(f))
+    with _lock:
+        _loaded[collection_name] = (mtime, index)
+    return index
+
+
+def delete_bm25_index(collection_name: str):
+    with _lock:
+        _loaded.pop(collection_name, None)
+    try:
+        os.remove(_index_path(collection_name))
+    except FileNotFoundError:
+        pass
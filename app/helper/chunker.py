@@ -0,0 +1,218 @@
+import os
+import re
+from collections import Counter
+from typing import List, Optional
+
+from .tokens import count_tokens
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 400))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 40))
+
+# "Version 1.1 12" closes page 12 in the extracted MARP documents
+_PAGE_FOOTER_RE = re.compile(r"^Version \d+(?:\.\d+)* (\d+)$")
+# "PR 2.6 SUBMISSION OF THESIS", "AM 4 ACADEMIC MALPRACTICE IN ...", "APPENDIX 2: THE FORM ..."
+_HEADING_RE = re.compile(r"^(?:[A-Z]{1,3} \d+(?:\.\d+)*|APPENDIX \d+:?)\s+[^a-z]+$")
+# Numbered clauses ("PR 2.1.1 The degree shall...") and list items ("(a) an ability to...")
+_CLAUSE_RE = re.compile(r"^(?:[A-Z]{1,3} \d+(?:\.\d+)+\s|\([a-z]{1,4}\)\s|\d+(?:\.\d+)+\s|\d+\.\s)")
+_TOC_RE = re.compile(r"\.{5,}")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.;:!?])\s+(?=[A-Z(\"'])")
+
+# Short lines repeated this often are running headers ("MARP 2025-26")
+_BOILERPLATE_MIN_REPEATS = 5
+_BOILERPLATE_MAX_CHARS = 60
+
+
+def _is_heading(line: str) -> bool:
+    return bool(_HEADING_RE.match(line)) and not _TOC_RE.search(line) and any(c.isalpha() for c in line)
+
+
+def _split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_SPLIT_RE.split(text) if s.strip()]
+
+
+def _split_words(text: str, max_tokens: int) -> List[str]:
+    parts, current = [], []
+    for word in text.split():
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            parts.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+
+def _parse_blocks(text: str) -> List[dict]:
+    """
+    Turn extracted text into blocks: a heading, or a clause/paragraph with
+    its wrapped lines re-joined. Each block records its character span in
+    `text`, the page it starts/ends on and the section heading it sits under.
+    """
+    lines = []
+    offset = 0
+    for raw in text.split("\n"):
+        lines.append((offset, raw))
+        offset += len(raw) + 1
+
+    stripped = [raw.strip() for _, raw in lines]
+    counts = Counter(s for s in stripped if s)
+    boilerplate = {
+        s for s, n in counts.items()
+        if n >= _BOILERPLATE_MIN_REPEATS and len(s) <= _BOILERPLATE_MAX_CHARS
+    }
+
+    # A footer closes its page, so a line's page is the next footer's number
+    page_of_line: List[Optional[int]] = [None] * len(lines)
+    next_page: Optional[int] = None
+    last_footer: Optional[int] = None
+    for i in range(len(lines) - 1, -1, -1):
+        m = _PAGE_FOOTER_RE.match(stripped[i])
+        if m:
+            next_page = int(m.group(1))
+            last_footer = next_page if last_footer is None else last_footer
+        page_of_line[i] = next_page
+    if last_footer is not None:
+        # Lines after the final footer belong to the following page
+        for i in range(len(lines) - 1, -1, -1):
+            if _PAGE_FOOTER_RE.match(stripped[i]):
+                break
+            page_of_line[i] = last_footer + 1
+
+    blocks: List[dict] = []
+    section: Optional[str] = None
+    current: Optional[dict] = None
+    prev_was_heading = False
+
+    def flush():
+        nonlocal current
+        if current is not None:
+            current["text"] = " ".join(current["lines"])
+            del current["lines"]
+            blocks.append(current)
+            current = None
+
+    for (start, raw), line, page in zip(lines, stripped, page_of_line):
+        if not line or _PAGE_FOOTER_RE.match(line) or line in boilerplate:
+            continue
+        end = start + len(raw)
+
+        is_heading = _is_heading(line)
+        # Headings can wrap onto a following all-caps line without a number
+        continues_heading = prev_was_heading and line.isupper() and not _TOC_RE.search(line)
+        prev_was_heading = is_heading or continues_heading
+
+        if continues_heading and not is_heading:
+            heading = blocks[-1]
+            heading["text"] += " " + line
+            heading["end_char"] = end
+            heading["page_end"] = page
+            section = heading["section"] = heading["text"]
+            continue
+
+        if is_heading:
+            flush()
+            section = line
+            blocks.append({
+                "text": line, "is_heading": True, "section": section,
+                "start_char": start, "end_char": end, "page_start": page, "page_end": page,
+            })
+            continue
+
+        if current is None or _CLAUSE_RE.match(line):
+            flush()
+            current = {
+                "lines": [], "is_heading": False, "section": section,
+                "start_char": start, "end_char": end, "page_start": page, "page_end": page,
+            }
+        current["lines"].append(line)
+        current["end_char"] = end
+        current["page_end"] = page
+
+    flush()
+    return blocks
+
+
+def _make_chunk(pieces: List[dict]) -> dict:
+    metadata = {
+        "section": pieces[-1]["section"],  # most specific heading
+        "start_char": pieces[0]["start_char"],
+        "end_char": pieces[-1]["end_char"],
+        "page_start": pieces[0]["page_start"],
+        "page_end": pieces[-1]["page_end"],
+    }
+    return {
+        "text": "\n".join(p["text"] for p in pieces),
+        # Chroma rejects None metadata values
+        "metadata": {k: v for k, v in metadata.items() if v is not None},
+    }
+
+
+def chunk_document(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> List[dict]:
+    """
+    Structure-aware chunking.
+
+    Chunks never cross a section heading and prefer to break between
+    numbered clauses; a clause longer than max_tokens is split on sentence
+    boundaries, carrying up to overlap_tokens of trailing sentences into the
+    next piece. Returns [{"text", "metadata"}] where metadata holds the
+    section title, source character offsets and page numbers.
+    """
+    # Break over-long clauses into sentence-sized pieces first
+    pieces: List[dict] = []
+    for block in _parse_blocks(text):
+        block["tokens"] = count_tokens(block["text"])
+        if block["tokens"] <= max_tokens:
+            pieces.append(block)
+            continue
+
+        sentences = []
+        for sentence in _split_sentences(block["text"]):
+            if count_tokens(sentence) > max_tokens:
+                sentences.extend(_split_words(sentence, max_tokens))
+            else:
+                sentences.append(sentence)
+
+        # Leave room for the heading(s) this block will be packed under
+        heading_tokens = 0
+        for prev_piece in reversed(pieces):
+            if not prev_piece["is_heading"]:
+                break
+            heading_tokens += prev_piece["tokens"] + 1
+        budget = max(max_tokens - heading_tokens, max_tokens // 2)
+
+        window: List[str] = []
+        for sentence in sentences:
+            if window and count_tokens(" ".join(window + [sentence])) > budget:
+                pieces.append({**block, "text": " ".join(window), "tokens": count_tokens(" ".join(window))})
+                # keep trailing sentences as overlap for the next piece
+                carry: List[str] = []
+                for prev in reversed(window):
+                    if count_tokens(" ".join([prev] + carry + [sentence])) > max_tokens or \
+                            count_tokens(" ".join([prev] + carry)) > overlap_tokens:
+                        break
+                    carry.insert(0, prev)
+                window = carry
+                budget = max_tokens
+            window.append(sentence)
+        if window:
+            pieces.append({**block, "text": " ".join(window), "tokens": count_tokens(" ".join(window))})
+
+    # Greedily pack pieces into chunks within a section
+    chunks: List[dict] = []
+    current: List[dict] = []
+    current_tokens = 0
+    for piece in pieces:
+        starts_section = piece["is_heading"] and not (current and current[-1]["is_heading"])
+        if current and (starts_section or current_tokens + piece["tokens"] > max_tokens):
+            chunks.append(_make_chunk(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece["tokens"]
+    if current:
+        chunks.append(_make_chunk(current))
+
+    return chunks
@@ -0,0 +1,96 @@
+import os
+from typing import List, Tuple
+
+from .tokens import count_tokens, truncate_to_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2500))
+
+# Shortest shared span treated as a real chunk overlap rather than a coincidence
+MIN_OVERLAP_CHARS = 40
+# Don't bother adding a truncated tail shorter than this
+MIN_TAIL_TOKENS = 50
+
+SEPARATOR = "\n\n"
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b` (0 if shorter than MIN_OVERLAP_CHARS)."""
+    if len(a) < MIN_OVERLAP_CHARS or len(b) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = b[:MIN_OVERLAP_CHARS]
+    start = max(0, len(a) - len(b))
+    idx = a.find(probe, start)
+    while idx != -1:
+        if b.startswith(a[idx:]):
+            return len(a) - idx
+        idx = a.find(probe, idx + 1)
+    return 0
+
+
+def merge_chunks(chunks: List[str]) -> List[str]:
+    """
+    Remove duplicate spans between retrieved chunks, keeping relevance order.
+
+    Exact duplicates and chunks contained in another chunk are dropped, and
+    chunks that overlap end-to-start (adjacent windows of the same document)
+    are stitched into one segment at the position of the higher-ranked one.
+    """
+    segments: List[str] = []
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk or any(chunk in seg for seg in segments):
+            continue
+        # A chunk that contains earlier segments replaces them at the best rank
+        contained = [k for k, seg in enumerate(segments) if seg in chunk]
+        if contained:
+            segments[contained[0]] = chunk
+            for k in reversed(contained[1:]):
+                del segments[k]
+        else:
+            segments.append(chunk)
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(segments)):
+            for j in range(len(segments)):
+                if i == j:
+                    continue
+                ov = _overlap(segments[i], segments[j])
+                if ov:
+                    combined = segments[i] + segments[j][ov:]
+                    keep, drop = min(i, j), max(i, j)
+                    segments[keep] = combined
+                    del segments[drop]
+                    merged = True
+                    break
+            if merged:
+                break
+    return segments
+
+
+def build_context(chunks: List[str], token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, int]:
+    """
+    Merge overlapping chunks and pack them, most relevant first, into at most
+    token_budget tokens. Returns (context_text, token_count).
+    """
+    parts: List[str] = []
+    used = 0
+    sep_tokens = count_tokens(SEPARATOR)
+
+    for segment in merge_chunks(chunks):
+        cost = count_tokens(segment) + (sep_tokens if parts else 0)
+        if used + cost <= token_budget:
+            parts.append(segment)
+            used += cost
+            continue
+
+        remaining = token_budget - used - (sep_tokens if parts else 0)
+        if remaining >= MIN_TAIL_TOKENS:
+            tail = truncate_to_tokens(segment, remaining)
+            if tail:
+                parts.append(tail)
+        break
+
+    context = SEPARATOR.join(parts)
+    return context, count_tokens(context)
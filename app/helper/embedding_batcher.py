@@ -0,0 +1,167 @@
+import os
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .metrics import METRICS_ENABLED, EMBED_BATCH_SIZE
+
+# Questions arriving within this window share one embeddings call (0 disables batching)
+QUERY_EMBED_BATCH_WINDOW_MS = float(os.getenv("QUERY_EMBED_BATCH_WINDOW_MS", 5))
+# A batch is sent as soon as it holds this many distinct questions
+QUERY_EMBED_BATCH_MAX_SIZE = int(os.getenv("QUERY_EMBED_BATCH_MAX_SIZE", 64))
+
+
+class _Batch:
+    """Distinct texts collected for one embeddings call; results are shared by position."""
+
+    def __init__(self):
+        self.positions: Dict[str, int] = {}
+        self.callers = 0
+
+    def add(self, text: str) -> int:
+        self.callers += 1
+        return self.positions.setdefault(text, len(self.positions))
+
+    @property
+    def texts(self) -> List[str]:
+        return list(self.positions)
+
+
+class _AsyncBatch(_Batch):
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.loop = loop
+        self.future: asyncio.Future = loop.create_future()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class _SyncBatch(_Batch):
+    def __init__(self):
+        super().__init__()
+        self.done = threading.Event()
+        self.result: Optional[List[List[float]]] = None
+        self.error: Optional[BaseException] = None
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batch single-text embedding requests across concurrent callers.
+
+    The first caller opens a batch; callers arriving within window_ms (or
+    until max_batch_size distinct texts are queued) join it, and the batch
+    is embedded with one call. Each caller gets its own vector back, or the
+    call's exception.
+
+    aembed() is for coroutines, embed() for threads (sync code paths).
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        aembed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+        window_ms: float = QUERY_EMBED_BATCH_WINDOW_MS,
+        max_batch_size: int = QUERY_EMBED_BATCH_MAX_SIZE,
+    ):
+        self.embed_fn = embed_fn
+        self.aembed_fn = aembed_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+        self._abatch: Optional[_AsyncBatch] = None
+        self._sbatch: Optional[_SyncBatch] = None
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def _record(self, batch: _Batch):
+        size = len(batch.positions)
+        self.batches += 1
+        self.requests += batch.callers
+        self.largest_batch = max(self.largest_batch, size)
+        if METRICS_ENABLED:
+            EMBED_BATCH_SIZE.observe(size)
+
+    # ---------- async ----------
+    async def aembed(self, text: str) -> List[float]:
+        if not self.enabled:
+            return (await self.aembed_fn([text]))[0]
+
+        loop = asyncio.get_running_loop()
+        batch = self._abatch
+        if batch is None or batch.loop is not loop:
+            batch = self._abatch = _AsyncBatch(loop)
+            batch.timer = loop.call_later(self.window, self._aflush, batch)
+        position = batch.add(text)
+        if len(batch.positions) >= self.max_batch_size:
+            batch.timer.cancel()
+            self._aflush(batch)
+
+        # shield: one caller going away must not cancel the call for the others
+        return (await asyncio.shield(batch.future))[position]
+
+    def _aflush(self, batch: _AsyncBatch):
+        if self._abatch is batch:
+            self._abatch = None
+        self._record(batch)
+        batch.loop.create_task(self._arun(batch))
+
+    async def _arun(self, batch: _AsyncBatch):
+        try:
+            vectors = await self.aembed_fn(batch.texts)
+        except asyncio.CancelledError:
+            # e.g. shutdown: fail every waiter instead of leaving them hanging
+            batch.future.set_exception(RuntimeError("Embedding batch was cancelled"))
+            raise
+        except BaseException as e:
+            batch.future.set_exception(e)
+            return
+        batch.future.set_result(vectors)
+
+    # ---------- threads ----------
+    def embed(self, text: str) -> List[float]:
+        if not self.enabled:
+            return self.embed_fn([text])[0]
+
+        with self._cond:
+            batch = self._sbatch
+            leader = batch is None
+            if leader:
+                batch = self._sbatch = _SyncBatch()
+            position = batch.add(text)
+            if len(batch.positions) >= self.max_batch_size:
+                self._sbatch = None  # full: close it and wake the leader
+                self._cond.notify_all()
+
+        if leader:
+            self._collect_and_run(batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.result[position]
+
+    def _collect_and_run(self, batch: _SyncBatch):
+        with self._cond:
+            self._cond.wait_for(lambda: self._sbatch is not batch, timeout=self.window)
+            if self._sbatch is batch:
+                self._sbatch = None
+        self._record(batch)
+        try:
+            batch.result = self.embed_fn(batch.texts)
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "largest_batch": self.largest_batch,
+            "mean_batch_requests": self.requests / self.batches if self.batches else 0.0,
+        }
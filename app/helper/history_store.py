@@ -1,13 +1,286 @@
-from collections import defaultdict, deque
 import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from typing import List, Optional
+from .metrics import timed
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
 HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", 20))
-HISTORY = defaultdict(lambda: deque(maxlen=HISTORY_LIMIT))
+# "memory" (per process) or "sqlite" (persistent, shared by every worker on the host)
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "memory").lower()
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", os.path.join(BASE_DIR, "data/history.sqlite3"))
+# Global bound: at most this many tokens keep a history (least recently active evicted first)
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", 10000))
+# A token's history is dropped after this long without a new question
+HISTORY_IDLE_TTL_SECONDS = float(os.getenv("HISTORY_IDLE_TTL_SECONDS", 24 * 3600))
+
+# The SQLite store prunes idle/excess tokens once every this many writes
+_PRUNE_EVERY = 100
+
+
+def _page(entries: list, limit: Optional[int], offset: int) -> list:
+    """The `limit` most recent entries after skipping the newest `offset`, oldest first."""
+    end = len(entries) - max(0, offset)
+    if end <= 0:
+        return []
+    start = 0 if limit is None else max(0, end - limit)
+    return entries[start:end]
+
+
+class MemoryHistoryStore:
+    """
+    Per-process history: up to `limit` entries per token, at most `max_tokens`
+    tokens (LRU by last question) and idle tokens expire after idle_ttl_seconds.
+    """
+
+    def __init__(
+        self,
+        limit: int = HISTORY_LIMIT,
+        max_tokens: int = HISTORY_MAX_TOKENS,
+        idle_ttl_seconds: float = HISTORY_IDLE_TTL_SECONDS,
+    ):
+        self.limit = limit
+        self.max_tokens = max_tokens
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.evictions = 0
+        # token -> [last_active, deque of entries], least recently active first
+        self._histories: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        while self._histories:
+            token, (last_active, _) = next(iter(self._histories.items()))
+            if len(self._histories) <= self.max_tokens and now - last_active <= self.idle_ttl_seconds:
+                break
+            del self._histories[token]
+            self.evictions += 1
+
+    def add(self, token: str, question: str, answer: str):
+        now = time.time()
+        with self._lock:
+            entry = self._histories.pop(token, None)
+            if entry is None or now - entry[0] > self.idle_ttl_seconds:
+                entry = [now, deque(maxlen=self.limit)]
+            entry[0] = now
+            entry[1].append({"question": question, "answer": answer})
+            self._histories[token] = entry
+            self._evict(now)
+
+    def get(self, token: str, limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        with self._lock:
+            entry = self._histories.get(token)
+            if entry is None or time.time() - entry[0] > self.idle_ttl_seconds:
+                return []
+            return _page(list(entry[1]), limit, offset)
+
+    def count(self, token: str) -> int:
+        return len(self.get(token))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "tokens": len(self._histories),
+                "entries": sum(len(e[1]) for e in self._histories.values()),
+                "max_tokens": self.max_tokens,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._histories)
+
+    def clear(self):
+        with self._lock:
+            self._histories.clear()
+            self.evictions = 0
+
+
+class SQLiteHistoryStore:
+    """
+    History in a WAL-mode SQLite file, so it survives restarts and every
+    uvicorn worker on the host sees the same conversations. Tokens are
+    stored as sha256 digests. Same bounds as MemoryHistoryStore.
+    """
+
+    def __init__(
+        self,
+        path: str = HISTORY_DB_PATH,
+        limit: int = HISTORY_LIMIT,
+        max_tokens: int = HISTORY_MAX_TOKENS,
+        idle_ttl_seconds: float = HISTORY_IDLE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.limit = limit
+        self.max_tokens = max_tokens
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # timeout: wait for other workers' write locks instead of failing
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                token TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_token ON history(token, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS history_tokens (token TEXT PRIMARY KEY, last_active REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_history_tokens_last_active ON history_tokens(last_active)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _is_idle(self, key: str) -> bool:
+        row = self._conn.execute("SELECT last_active FROM history_tokens WHERE token = ?", (key,)).fetchone()
+        return row is None or time.time() - row[0] > self.idle_ttl_seconds
+
+    def add(self, token: str, question: str, answer: str):
+        key = self._key(token)
+        with self._lock:
+            if self._is_idle(key):
+                self._conn.execute("DELETE FROM history WHERE token = ?", (key,))
+            self._conn.execute(
+                "INSERT INTO history (token, question, answer) VALUES (?, ?, ?)", (key, question, answer)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history_tokens (token, last_active) VALUES (?, ?)", (key, time.time())
+            )
+            # Keep only the newest `limit` entries for this token
+            self._conn.execute(
+                """
+                DELETE FROM history WHERE token = ? AND id <= (
+                    SELECT id FROM history WHERE token = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+                """,
+                (key, key, self.limit),
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._prune()
+            self._conn.commit()
 
+    def _prune(self):
+        """Drop idle tokens and the least recently active ones beyond max_tokens."""
+        stale = [row[0] for row in self._conn.execute(
+            """
+            SELECT token FROM history_tokens WHERE last_active < ?
+            UNION
+            SELECT token FROM (
+                SELECT token FROM history_tokens ORDER BY last_active DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (time.time() - self.idle_ttl_seconds, self.max_tokens),
+        )]
+        self._conn.executemany("DELETE FROM history WHERE token = ?", [(t,) for t in stale])
+        self._conn.executemany("DELETE FROM history_tokens WHERE token = ?", [(t,) for t in stale])
+        self.evictions += len(stale)
+
+    def get(self, token: str, limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        key = self._key(token)
+        with self._lock:
+            if self._is_idle(key):
+                return []
+            rows = self._conn.execute(
+                "SELECT question, answer FROM history WHERE token = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (key, -1 if limit is None else limit, max(0, offset)),
+            ).fetchall()
+        return [{"question": q, "answer": a} for q, a in reversed(rows)]
+
+    def count(self, token: str) -> int:
+        key = self._key(token)
+        with self._lock:
+            if self._is_idle(key):
+                return 0
+            return self._conn.execute("SELECT COUNT(*) FROM history WHERE token = ?", (key,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            tokens = self._conn.execute("SELECT COUNT(*) FROM history_tokens").fetchone()[0]
+            entries = self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "tokens": tokens,
+            "entries": entries,
+            "max_tokens": self.max_tokens,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self):
+        return self.stats()["tokens"]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM history")
+            self._conn.execute("DELETE FROM history_tokens")
+            self._conn.commit()
+            self.evictions = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_history_store(backend: str = HISTORY_BACKEND):
+    if backend == "sqlite":
+        return SQLiteHistoryStore()
+    if backend == "memory":
+        return MemoryHistoryStore()
+    raise ValueError(f"Unknown HISTORY_BACKEND '{backend}' (expected 'memory' or 'sqlite')")
+
+
+HISTORY = create_history_store()
+
+
+@timed("history")
 def add_history(token: str, question: str, answer: str):
-    HISTORY[token].append({
-        "question": question,
-        "answer": answer
-    })
+    HISTORY.add(token, question, answer)
+
+
+@timed("history")
+def get_history(token: str, limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+    """
+    History for a token, oldest first. With a limit, returns the `limit`
+    most recent entries after skipping the newest `offset` (page backwards
+    by increasing offset).
+    """
+    return HISTORY.get(token, limit, offset)
+
+
+def count_history(token: str) -> int:
+    return HISTORY.count(token)
+
+
+async def _offload(fn, *args):
+    # The SQLite store locks and writes to disk; keep that off the event loop
+    if isinstance(HISTORY, MemoryHistoryStore):
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+
+async def aadd_history(token: str, question: str, answer: str):
+    await _offload(add_history, token, question, answer)
+
 
-def get_history(token: str):
-    return list(HISTORY[token])
\ No newline at end of file
+async def aget_history(token: str, limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+    return await _offload(get_history, token, limit, offset)
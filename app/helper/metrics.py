@@ -0,0 +1,240 @@
+import os
+import time
+import bisect
+import inspect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Seconds; covers cache hits (sub-millisecond) through slow chat completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[n]) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.label_names), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[n]) for n in self.label_names))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "Time spent in each stage of the question pipeline.", labels=("stage",)
+)
+TOKENS = Counter("rag_tokens_total", "Tokens sent to or produced by OpenAI.", labels=("kind",))
+REQUEST_SECONDS = Histogram(
+    "rag_request_duration_seconds", "HTTP request latency by route and status.", labels=("route", "status")
+)
+
+ROUTE_DECISIONS = Counter(
+    "rag_route_decisions_total", "Question routing decisions by source and category.", labels=("source", "category")
+)
+
+EMBED_BATCH_SIZE = Histogram(
+    "rag_query_embedding_batch_size", "Distinct questions per micro-batched embeddings call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+RATE_LIMITED = Counter("rag_rate_limited_total", "Requests rejected by the rate limiter.", labels=("endpoint",))
+
+_REGISTRY = [STAGE_SECONDS, TOKENS, REQUEST_SECONDS, ROUTE_DECISIONS, EMBED_BATCH_SIZE, RATE_LIMITED]
+
+# Gauges computed when /metrics is scraped: name -> (help, label name, callback returning {label value: number})
+_GAUGES: Dict[str, Tuple[str, str, Callable[[], Dict[str, float]]]] = {}
+
+# Stage timings of the current request, for the Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def register_gauge(name: str, help_text: str, label: str, callback: Callable[[], Dict[str, float]]):
+    _GAUGES[name] = (help_text, label, callback)
+
+
+def _observe_stage(name: str, elapsed: float):
+    STAGE_SECONDS.observe(elapsed, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, elapsed))
+
+
+@contextmanager
+def _timed_stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe_stage(name, time.perf_counter() - start)
+
+
+_NOOP = nullcontext()
+
+
+def stage(name: str):
+    """Context manager timing a pipeline stage; a shared no-op when metrics are disabled."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _timed_stage(name)
+
+
+def timed(name: str):
+    """Decorator form of stage() for sync and async functions."""
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _observe_stage(name, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _observe_stage(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record_tokens(kind: str, count: Optional[int]):
+    if METRICS_ENABLED and isinstance(count, int) and count > 0:
+        TOKENS.inc(count, kind=kind)
+
+
+# --------------------------------
+# Per-request timings (Server-Timing)
+# --------------------------------
+def start_request_timing():
+    """Begin collecting stage timings for the current request; returns a token for reset."""
+    return _request_timings.set([])
+
+
+def finish_request_timing(token) -> List[Tuple[str, float]]:
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Sum repeated stages and format them as a Server-Timing header value (milliseconds)."""
+    totals: Dict[str, float] = {}
+    for name, elapsed in timings:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in totals.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    for name, (help_text, label, callback) in sorted(_GAUGES.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        try:
+            values = callback()
+        except Exception:
+            continue
+        for label_value, value in sorted(values.items()):
+            lines.append(f'{name}{{{label}="{_escape(label_value)}"}} {float(value)}')
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    for metric in _REGISTRY:
+        metric.reset()
@@ -1,9 +1,17 @@
 import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
 import pdfplumber
 import boto3
 from botocore.exceptions import NoCredentialsError, ClientError
+from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
+from pdfminer.psparser import PSLiteral
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+PAGE_CACHE_DIR = os.getenv("PDF_PAGE_CACHE_DIR", os.path.join(BASE_DIR, "data/page_cache"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
 
 
 AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME", "bucket-name")
@@ -23,17 +31,135 @@ def get_path_name(type:str,level:str|None=None):
         local_text_path = os.path.join(BASE_DIR, f"data/extracted/{type}.txt")
     return pdf_path, local_text_path
 
-def extract_pdf_text(pdf_path: str) -> str:
-    """Extract clean text from a PDF file."""
-    print(f"Extracting text from: {pdf_path}")
+def _object_digest(obj, memo: Dict[int, bytes], seen: frozenset = frozenset()) -> bytes:
+    """
+    Digest of a PDF object with every indirect reference resolved, so it
+    doesn't depend on object numbers. Referenced objects (fonts, images)
+    are usually shared between pages and are hashed once per document.
+    """
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in memo:
+            return memo[obj.objid]
+        if obj.objid in seen:  # reference cycle
+            return b"cycle"
+        digest = _object_digest(obj.resolve(), memo, seen | {obj.objid})
+        memo[obj.objid] = digest
+        return digest
 
-    text = []
+    h = hashlib.sha256()
+    if isinstance(obj, PDFStream):
+        h.update(b"stream")
+        h.update(_object_digest(obj.attrs, memo, seen))
+        h.update(obj.get_rawdata() or b"")
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for key in sorted(obj):
+            if key == "Parent":  # back-reference into the page tree
+                continue
+            h.update(str(key).encode("utf-8"))
+            h.update(_object_digest(obj[key], memo, seen))
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"list")
+        for item in obj:
+            h.update(_object_digest(item, memo, seen))
+    elif isinstance(obj, PSLiteral):
+        h.update(b"/" + str(obj.name).encode("utf-8"))
+    else:
+        h.update(repr(obj).encode("utf-8"))
+    return h.digest()
+
+
+def page_digests(pdf_path: str) -> List[str]:
+    """
+    Fingerprint every page by its page box, content streams and resources
+    (fonts, form XObjects, images), so a page that is unchanged between two
+    versions of a PDF keeps the same key.
+    """
+    digests = []
+    memo: Dict[int, bytes] = {}
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
-            extracted = page.extract_text()
-            if extracted:
-                text.append(extracted)
+            h = hashlib.sha256(repr(page.page_obj.mediabox).encode("utf-8"))
+            streams = page.page_obj.contents or []
+            for stream in streams if isinstance(streams, list) else [streams]:
+                h.update(resolve1(stream).get_data())
+            # Identical streams (e.g. "/Fx0 Do") can draw different resources
+            h.update(_object_digest(page.page_obj.resources or {}, memo))
+            digests.append(h.hexdigest())
+    return digests
 
+
+def _page_cache_path(digest: str) -> str:
+    return os.path.join(PAGE_CACHE_DIR, f"{digest}.txt")
+
+
+def _read_cached_page(digest: str) -> Optional[str]:
+    try:
+        with open(_page_cache_path(digest), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cached_page(digest: str, text: str):
+    os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+    path = _page_cache_path(digest)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _extract_page_range(pdf_path: str, page_indexes: List[int]) -> List[Tuple[int, str]]:
+    """Worker: open the PDF once and extract the given pages."""
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in page_indexes:
+            results.append((i, pdf.pages[i].extract_text() or ""))
+    return results
+
+
+def _split_evenly(items: List[int], parts: int) -> List[List[int]]:
+    size = -(-len(items) // parts)  # ceil
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def extract_pdf_text(pdf_path: str, max_workers: int = PDF_EXTRACT_WORKERS) -> str:
+    """
+    Extract clean text from a PDF file.
+
+    Pages already in the page cache are reused; the rest are split into
+    contiguous ranges and extracted across a process pool, then reassembled
+    in page order.
+    """
+    print(f"Extracting text from: {pdf_path}")
+
+    digests = page_digests(pdf_path)
+    pages: Dict[int, str] = {}
+    missing = []
+    for i, digest in enumerate(digests):
+        cached = _read_cached_page(digest)
+        if cached is None:
+            missing.append(i)
+        else:
+            pages[i] = cached
+
+    if missing:
+        workers = max(1, min(max_workers, len(missing)))
+        ranges = _split_evenly(missing, workers)
+        if workers == 1:
+            extracted = _extract_page_range(pdf_path, missing)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_extract_page_range, pdf_path, r) for r in ranges]
+                extracted = [item for future in futures for item in future.result()]
+        for i, page_text in extracted:
+            pages[i] = page_text
+            _write_cached_page(digests[i], page_text)
+
+    print(f"Extracted {len(missing)} of {len(digests)} pages ({len(digests) - len(missing)} from cache).")
+
+    text = [pages[i] for i in range(len(digests)) if pages[i]]
     full_text = "\n\n".join(text)
     cleaned = "\n".join([line.strip() for line in full_text.splitlines() if line.strip()])
 
@@ -135,16 +261,20 @@ def process_all_handbooks(levels=None):
             raise ValueError(f"Unsupported level '{lvl}'. Must be one of ug/pgt/pgr.")
         norm_levels.append(lvl_norm)
 
-    # Process each requested level
-    for level in norm_levels:
+    def process_level(level: str):
         pdf_path, local_text_path = get_path_name("handbook", level)
         print(f"\n=== Processing {level} handbook ===")
-        process_and_upload_pdf_for_level(
+        return process_and_upload_pdf_for_level(
             pdf_path=pdf_path,
             local_text_path=local_text_path,
             level=level,
         )
 
+    # Levels are independent, so process them concurrently
+    with ThreadPoolExecutor(max_workers=len(norm_levels) or 1) as pool:
+        futures = {level: pool.submit(process_level, level) for level in norm_levels}
+        return {level: future.result() for level, future in futures.items()}
+
 def process_other_document(type: str):
     """
     Process and upload other document types (e.g., academic integrity).
@@ -0,0 +1,69 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+
+
+def normalise_query(text: str) -> str:
+    """Case-fold and collapse whitespace so trivially different questions share a key."""
+    return " ".join(text.split()).casefold()
+
+
+class LRUCache:
+    """Small thread-safe LRU map with hit/miss counters."""
+
+    def __init__(self, max_size: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+QUERY_EMBEDDING_CACHE = LRUCache()
+
+
+def get_query_embedding(model: str, query: str) -> Optional[List[float]]:
+    return QUERY_EMBEDDING_CACHE.get((model, normalise_query(query)))
+
+
+def put_query_embedding(model: str, query: str, embedding: List[float]):
+    QUERY_EMBEDDING_CACHE.put((model, normalise_query(query)), embedding)
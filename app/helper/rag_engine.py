@@ -1,20 +1,60 @@
-import chromadb
-from chromadb.config import Settings
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
 import os
-from typing import List,Optional
-
-client = OpenAI()
+import json
+import time
+import asyncio
+import random
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List,Optional,Tuple
+from .embedding_cache import get_embedding_cache
+from .answer_cache import ANSWER_CACHE
+from .query_cache import get_query_embedding, put_query_embedding, normalise_query
+from .single_flight import SingleFlight
+from .embedding_batcher import EmbeddingBatcher
+from .vector_store import get_vector_backend
+from .chunker import chunk_document
+from .bm25 import BM25Index, get_bm25_index, save_bm25_index, reciprocal_rank_fusion
+from .tokens import count_tokens
+from .metrics import timed, stage, record_tokens
+
+logger = logging.getLogger(__name__)
+
+# Embedding calls retry in _embed_batch/_aembed_batch (EMBED_MAX_RETRIES);
+# the SDK's own retries would multiply the attempts and backoff
+client = OpenAI(max_retries=0)
+async_client = AsyncOpenAI(max_retries=0)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+# Embedding request splitting / concurrency
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", 8000))
+EMBED_BATCH_MAX_INPUTS = int(os.getenv("EMBED_BATCH_MAX_INPUTS", 2048))  # OpenAI per-request limit
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", 4))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 5))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", 0.5))
+EMBED_BACKOFF_MAX_SECONDS = 20.0
+
+# Chunking: "structured" (headings/clauses/sentences, with metadata) or "fixed" (character windows)
+CHUNKER = os.getenv("CHUNKER", "structured").lower()
+# Chunks retrieved per question
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 5))
+
+# Retrieval: "hybrid" (vector + BM25 fused with RRF), "vector" or "lexical" (BM25 only, no embedding call)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+# Coalesces concurrent embedding calls for the same question
+_query_flight = SingleFlight()
 
 # Local DB directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-CHROMA_DIR = os.path.join(BASE_DIR, "data/chroma_db")
-
-# Create or load persistent Chroma DB
-# chroma_client = chromadb.Client(Settings(chroma_db_impl="duckdb+parquet",
-#                                         persist_directory=CHROMA_DIR))
+MANIFEST_DIR = os.path.join(BASE_DIR, "data/manifests")
 
-chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+# The vector store (Chroma or the NumPy index) is selected with VECTOR_BACKEND
+# and created lazily on first use; see vector_store.py.
 
 
 def normalise_level(level: str) -> str:
@@ -70,18 +110,12 @@ def get_or_create_collection_for_level(doc_type: str, level: Optional[str] = Non
     Convenience wrapper: directly get/create the collection for a level.
     """
     name = get_collection_name(doc_type, level)
-    return chroma_client.get_or_create_collection(
-        name=name,
-        metadata={"hnsw:space": "cosine"},  # cosine similarity
-    )
+    return get_vector_backend().get_or_create_collection(name)
 
 
 def get_or_create_collection(doc_type: str, level: Optional[str] = None):
     name = get_collection_name(doc_type, level)
-    return chroma_client.get_or_create_collection(
-        name=name,
-        metadata={"hnsw:space": "cosine"},
-    )
+    return get_vector_backend().get_or_create_collection(name)
 
 # --------------------------------
 # 1. Chunk text
@@ -98,48 +132,543 @@ def chunk_text(text, chunk_size=2000, overlap=300):
     return chunks
 
 
+def chunk_with_metadata(text: str) -> List[Tuple[str, Optional[dict]]]:
+    """Chunk with the configured CHUNKER. Returns (chunk, metadata or None) pairs."""
+    if CHUNKER == "fixed":
+        return [(chunk, None) for chunk in chunk_text(text)]
+    return [(c["text"], c["metadata"] or None) for c in chunk_document(text)]
+
+
 # --------------------------------
 # 2. Compute embeddings
 # --------------------------------
+def split_into_batches(
+    texts: List[str],
+    max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+    max_inputs: int = EMBED_BATCH_MAX_INPUTS,
+) -> List[List[str]]:
+    """
+    Split texts into contiguous batches that stay under the per-request token
+    and input-count limits. A single text larger than max_tokens gets its own batch.
+    """
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for text in texts:
+        n_tokens = count_tokens(text)
+        if current and (current_tokens + n_tokens > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += n_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+
+def _retry_delay(e: Exception, attempt: int) -> float:
+    # Prefer the server's hint when it sends one
+    response = getattr(e, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), EMBED_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    delay = EMBED_BACKOFF_SECONDS * (2 ** attempt)
+    return min(delay, EMBED_BACKOFF_MAX_SECONDS) * (0.5 + random.random() / 2)
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            resp = client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=texts
+            )
+            record_tokens("embedding", getattr(getattr(resp, "usage", None), "total_tokens", None))
+            return [e.embedding for e in sorted(resp.data, key=lambda e: e.index)]
+        except Exception as e:
+            if attempt >= EMBED_MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(f"Embedding batch failed ({e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def _embed_uncached(texts: List[str]) -> List[List[float]]:
+    """
+    Embed texts in token-bounded batches sent concurrently on a bounded
+    thread pool. Results are returned in the original order.
+    """
+    batches = split_into_batches(texts)
+    if len(batches) <= 1:
+        return _embed_batch(texts) if texts else []
+
+    with ThreadPoolExecutor(max_workers=min(EMBED_MAX_WORKERS, len(batches))) as pool:
+        results = list(pool.map(_embed_batch, batches))
+
+    return [vec for batch in results for vec in batch]
+
+
+@timed("embed")
 def embed_text(texts):
-    resp = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=texts
-    )
-    return [e.embedding for e in resp.data]
+    """
+    Embed a list of texts, serving repeated texts from the persistent
+    embedding cache and only sending cache misses to OpenAI.
+    """
+    texts = list(texts)
+    cache = get_embedding_cache()
+    if cache is None:
+        return _embed_uncached(texts)
+
+    found = cache.get_many(EMBEDDING_MODEL, texts)
+    missing = [i for i in range(len(texts)) if i not in found]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        fresh = _embed_uncached(missing_texts)
+        cache.put_many(EMBEDDING_MODEL, missing_texts, fresh)
+        for i, vec in zip(missing, fresh):
+            found[i] = vec
+
+    return [found[i] for i in range(len(texts))]
+
+
+async def _aembed_batch(texts: List[str]) -> List[List[float]]:
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            resp = await async_client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=texts
+            )
+            record_tokens("embedding", getattr(getattr(resp, "usage", None), "total_tokens", None))
+            return [e.embedding for e in sorted(resp.data, key=lambda e: e.index)]
+        except Exception as e:
+            if attempt >= EMBED_MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(f"Embedding batch failed ({e}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+async def _aembed_uncached(texts: List[str]) -> List[List[float]]:
+    batches = split_into_batches(texts)
+    if len(batches) <= 1:
+        return await _aembed_batch(texts) if texts else []
+
+    semaphore = asyncio.Semaphore(EMBED_MAX_WORKERS)
+
+    async def run(batch):
+        async with semaphore:
+            return await _aembed_batch(batch)
+
+    results = await asyncio.gather(*(run(b) for b in batches))
+    return [vec for batch in results for vec in batch]
+
+
+@timed("embed")
+async def aembed_text(texts) -> List[List[float]]:
+    """Async counterpart of embed_text(); cache lookups run off the event loop."""
+    texts = list(texts)
+    cache = get_embedding_cache()
+    if cache is None:
+        return await _aembed_uncached(texts)
+
+    found = await asyncio.to_thread(cache.get_many, EMBEDDING_MODEL, texts)
+    missing = [i for i in range(len(texts)) if i not in found]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        fresh = await _aembed_uncached(missing_texts)
+        await asyncio.to_thread(cache.put_many, EMBEDDING_MODEL, missing_texts, fresh)
+        for i, vec in zip(missing, fresh):
+            found[i] = vec
+
+    return [found[i] for i in range(len(texts))]
+
+
+# Concurrent distinct questions share one embeddings call (duplicates are
+# already coalesced by _query_flight). Looked up at call time so the
+# embed functions can be patched.
+query_batcher = EmbeddingBatcher(lambda texts: embed_text(texts), lambda texts: aembed_text(texts))
+
+
+def _embed_and_cache_query(query: str) -> List[float]:
+    embedding = query_batcher.embed(query)
+    put_query_embedding(EMBEDDING_MODEL, query, embedding)
+    return embedding
+
+
+async def _aembed_and_cache_query(query: str) -> List[float]:
+    embedding = await query_batcher.aembed(query)
+    put_query_embedding(EMBEDDING_MODEL, query, embedding)
+    return embedding
+
+
+def embed_query(query: str) -> List[float]:
+    """
+    Embed a single question, served from the in-process query LRU when
+    possible. Concurrent misses for the same question share one API call.
+    """
+    embedding = get_query_embedding(EMBEDDING_MODEL, query)
+    if embedding is None:
+        key = (EMBEDDING_MODEL, normalise_query(query))
+        embedding = _query_flight.do(key, _embed_and_cache_query, query)
+    return embedding
+
+
+async def aembed_query(query: str) -> List[float]:
+    """Async counterpart of embed_query()."""
+    embedding = get_query_embedding(EMBEDDING_MODEL, query)
+    if embedding is None:
+        key = (EMBEDDING_MODEL, normalise_query(query))
+        embedding = await _query_flight.ado(key, _aembed_and_cache_query, query)
+    return embedding
 
 
 # --------------------------------
 # 3. Build DB from text
 # --------------------------------
-def build_rag_from_text(text: str, doc_type: str, level: Optional[str] = None)-> List[str]:
-    chunks = chunk_text(text)
-    embeddings = embed_text(chunks)
+def chunk_id(doc_type: str, chunk: str) -> str:
+    """Content-addressed chunk id: identical text always maps to the same id."""
+    digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:24]
+    return f"{doc_type}_{digest}"
+
+
+def _manifest_path(collection_name: str) -> str:
+    return os.path.join(MANIFEST_DIR, f"{collection_name}.json")
+
+
+def load_manifest(collection_name: str) -> Optional[dict]:
+    path = _manifest_path(collection_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    ids = [f"{doc_type}_chunk_{i}" for i in range(len(chunks))]
 
-    collection_name = get_collection_name(doc_type,level)
+def save_manifest(collection_name: str, manifest: dict):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = _manifest_path(collection_name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def index_document(text: str, doc_type: str, level: Optional[str] = None) -> dict:
+    """
+    Incrementally (re-)index a document.
+
+    Chunks are identified by a hash of their content, so the new chunk set is
+    diffed against what the collection already holds: only new chunks are
+    embedded and chunks that no longer exist are deleted. If the embedding
+    model recorded in the collection's manifest differs from the current one,
+    every chunk is re-embedded.
+
+    Returns a report: {"collection", "added", "removed", "unchanged", "total"}.
+    """
+    collection_name = get_collection_name(doc_type, level)
     col = get_or_create_collection(doc_type, level)
-    col.upsert(
-        ids=ids,
-        documents=chunks,
-        embeddings=embeddings,
+
+    # Ordered and de-duplicated {id: chunk}
+    new_chunks = {}
+    new_metadatas = {}
+    for chunk, metadata in chunk_with_metadata(text):
+        cid = chunk_id(doc_type, chunk)
+        if cid not in new_chunks:
+            new_chunks[cid] = chunk
+            new_metadatas[cid] = metadata
+
+    stored_ids = set(col.get(include=[])["ids"])
+    manifest = load_manifest(collection_name)
+    model_changed = manifest is not None and manifest.get("embedding_model") != EMBEDDING_MODEL
+
+    if model_changed:
+        to_add = list(new_chunks)
+    else:
+        to_add = [cid for cid in new_chunks if cid not in stored_ids]
+    to_remove = [cid for cid in stored_ids if cid not in new_chunks]
+
+    # Unchanged chunks whose offsets/pages moved only need a metadata update
+    old_metadatas = (manifest or {}).get("metadatas", {})
+    added = set(to_add)
+    to_update = [
+        cid for cid in new_chunks
+        if cid not in added and new_metadatas[cid] is not None and old_metadatas.get(cid) != new_metadatas[cid]
+    ]
+
+    if to_add:
+        documents = [new_chunks[cid] for cid in to_add]
+        col.upsert(
+            ids=to_add,
+            documents=documents,
+            embeddings=embed_text(documents),
+            metadatas=[new_metadatas[cid] for cid in to_add],
+        )
+    if to_update:
+        col.update(ids=to_update, metadatas=[new_metadatas[cid] for cid in to_update])
+    if to_remove:
+        col.delete(ids=to_remove)
+    if to_add or to_remove or get_bm25_index(collection_name) is None:
+        # The lexical index is cheap to rebuild and needs no embedding calls
+        save_bm25_index(collection_name, BM25Index.build(list(new_chunks), list(new_chunks.values())))
+    if to_add or to_remove:
+        # Cached answers were generated from the old chunks
+        ANSWER_CACHE.invalidate(collection_name)
+
+    save_manifest(collection_name, {
+        "collection": collection_name,
+        "embedding_model": EMBEDDING_MODEL,
+        "document_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "chunker": CHUNKER,
+        "ids": list(new_chunks),
+        "metadatas": new_metadatas,
+        "updated_at": time.time(),
+    })
+
+    report = {
+        "collection": collection_name,
+        "added": len(to_add),
+        "removed": len(to_remove),
+        "unchanged": len(new_chunks) - len(to_add),
+        "total": len(new_chunks),
+    }
+    print(
+        f"Indexed collection '{collection_name}': {report['added']} added, "
+        f"{report['removed']} removed, {report['unchanged']} unchanged"
     )
+    return report
 
-    print(f"Inserted {len(chunks)} chunks into ChromaDB collection '{collection_name}'")
-    return chunks
+
+def build_rag_from_text(text: str, doc_type: str, level: Optional[str] = None)-> List[str]:
+    index_document(text, doc_type, level)
+    return [chunk for chunk, _ in chunk_with_metadata(text)]
 
 
 # --------------------------------
 # 4. Query DB
 # --------------------------------
-def search_similar_chunks(query: str, doc_type: str, level: Optional[str] = None, top_k=5)-> List[str]:
-    query_embed = embed_text([query])[0]
-    col = get_or_create_collection(doc_type, level)
-
-    results = col.query(
-        query_embeddings=[query_embed],
-        n_results=top_k,
-    )
-
-    return results["documents"][0]  # list of chunk strings
+def lexical_search(query: str, doc_type: str, level: Optional[str] = None, top_k=RETRIEVAL_TOP_K) -> List[str]:
+    """BM25-only retrieval. Makes no network calls; [] if the collection has no lexical index."""
+    index = get_bm25_index(get_collection_name(doc_type, level))
+    if index is None:
+        return []
+    return [doc for _, doc, _ in index.search(query, top_k)]
+
+
+@timed("retrieve")
+def retrieve_chunks(
+    query: str,
+    doc_type: str,
+    level: Optional[str] = None,
+    top_k=RETRIEVAL_TOP_K,
+    query_embedding: Optional[List[float]] = None,
+) -> List[str]:
+    """
+    Retrieve chunks for an already-embedded query. Without an embedding (lexical
+    mode, or the embeddings API failed) this falls back to BM25 only. In hybrid
+    mode vector and BM25 candidates are fused with reciprocal rank fusion.
+    """
+    if query_embedding is None:
+        return lexical_search(query, doc_type, level, top_k)
+
+    bm25 = get_bm25_index(get_collection_name(doc_type, level)) if RETRIEVAL_MODE == "hybrid" else None
+    return rank_chunks(query, query_embedding, get_or_create_collection(doc_type, level), bm25, top_k)
+
+
+def rank_chunks(
+    query: str,
+    query_embedding: List[float],
+    col,
+    bm25: Optional[BM25Index],
+    top_k: int = RETRIEVAL_TOP_K,
+) -> List[str]:
+    """Vector search over `col`, fused with BM25 via reciprocal rank fusion when a lexical index is given."""
+    return rank_chunks_batch([query], [query_embedding], col, bm25, top_k)[0]
+
+
+def rank_chunks_batch(
+    queries: List[str],
+    query_embeddings: List[List[float]],
+    col,
+    bm25: Optional[BM25Index],
+    top_k: int = RETRIEVAL_TOP_K,
+) -> List[List[str]]:
+    """rank_chunks() for several queries with a single multi-query vector search."""
+    n_candidates = max(top_k, HYBRID_CANDIDATES) if bm25 is not None else top_k
+
+    with stage("vector_query"):
+        results = col.query(
+            query_embeddings=list(query_embeddings),
+            n_results=n_candidates,
+        )
+
+    ranked = []
+    for query, vector_docs in zip(queries, results["documents"]):  # lists of chunk strings
+        if bm25 is None:
+            ranked.append(vector_docs[:top_k])
+            continue
+        # Chunk texts are unique within a collection, so they double as fusion keys
+        with stage("bm25"):
+            lexical_docs = [doc for _, doc, _ in bm25.search(query, n_candidates)]
+        ranked.append(reciprocal_rank_fusion([vector_docs, lexical_docs], k=RRF_K)[:top_k])
+    return ranked
+
+
+@timed("retrieve")
+def retrieve_chunks_batch(
+    queries: List[str],
+    doc_type: str,
+    level: Optional[str] = None,
+    query_embeddings: Optional[List[Optional[List[float]]]] = None,
+    top_k=RETRIEVAL_TOP_K,
+) -> List[List[str]]:
+    """
+    retrieve_chunks() for several queries against one collection. Queries
+    with an embedding share one vector store call; the rest use BM25 only.
+    """
+    if query_embeddings is None:
+        query_embeddings = [None] * len(queries)
+    results: List[List[str]] = [[] for _ in queries]
+
+    embedded = [i for i, e in enumerate(query_embeddings) if e is not None]
+    for i, embedding in enumerate(query_embeddings):
+        if embedding is None:
+            results[i] = lexical_search(queries[i], doc_type, level, top_k)
+
+    if embedded:
+        bm25 = get_bm25_index(get_collection_name(doc_type, level)) if RETRIEVAL_MODE == "hybrid" else None
+        ranked = rank_chunks_batch(
+            [queries[i] for i in embedded],
+            [query_embeddings[i] for i in embedded],
+            get_or_create_collection(doc_type, level),
+            bm25,
+            top_k,
+        )
+        for i, chunks in zip(embedded, ranked):
+            results[i] = chunks
+    return results
+
+
+async def aretrieve_chunks(
+    query: str,
+    doc_type: str,
+    level: Optional[str] = None,
+    top_k=RETRIEVAL_TOP_K,
+    query_embedding: Optional[List[float]] = None,
+) -> List[str]:
+    """retrieve_chunks() in a worker thread, so vector store queries don't block the event loop."""
+    return await asyncio.to_thread(retrieve_chunks, query, doc_type, level, top_k, query_embedding)
+
+
+async def aretrieve_chunks_batch(
+    queries: List[str],
+    doc_type: str,
+    level: Optional[str] = None,
+    query_embeddings: Optional[List[Optional[List[float]]]] = None,
+    top_k=RETRIEVAL_TOP_K,
+) -> List[List[str]]:
+    """retrieve_chunks_batch() in a worker thread."""
+    return await asyncio.to_thread(retrieve_chunks_batch, queries, doc_type, level, query_embeddings, top_k)
+
+
+def _can_fall_back_to_lexical(doc_type: str, level: Optional[str]) -> bool:
+    return RETRIEVAL_MODE != "vector" and get_bm25_index(get_collection_name(doc_type, level)) is not None
+
+
+@timed("embed_query")
+def embed_query_for_search(query: str, doc_type: str, level: Optional[str] = None) -> Optional[List[float]]:
+    """
+    Embed the query for retrieval. Returns None in lexical mode, or when the
+    embeddings API fails and a lexical index is available to fall back to.
+    """
+    if RETRIEVAL_MODE == "lexical":
+        return None
+    try:
+        return embed_query(query)
+    except Exception as e:
+        if not _can_fall_back_to_lexical(doc_type, level):
+            raise
+        logger.warning(f"Query embedding failed ({e}); falling back to lexical retrieval")
+        return None
+
+
+@timed("embed_query")
+async def aembed_query_for_search(query: str, doc_type: str, level: Optional[str] = None) -> Optional[List[float]]:
+    """Async counterpart of embed_query_for_search()."""
+    if RETRIEVAL_MODE == "lexical":
+        return None
+    try:
+        return await aembed_query(query)
+    except Exception as e:
+        if not _can_fall_back_to_lexical(doc_type, level):
+            raise
+        logger.warning(f"Query embedding failed ({e}); falling back to lexical retrieval")
+        return None
+
+
+async def aembed_queries(queries: List[str]) -> List[List[float]]:
+    """
+    Embed several questions at once: query LRU hits are reused and all
+    misses go out together through aembed_text() (normally one API call).
+    """
+    embeddings = [get_query_embedding(EMBEDDING_MODEL, q) for q in queries]
+    missing = list(dict.fromkeys(q for q, e in zip(queries, embeddings) if e is None))
+    if missing:
+        fresh = dict(zip(missing, await aembed_text(missing)))
+        for query, embedding in fresh.items():
+            put_query_embedding(EMBEDDING_MODEL, query, embedding)
+        embeddings = [e if e is not None else fresh[q] for q, e in zip(queries, embeddings)]
+    return embeddings
+
+
+@timed("embed_query")
+async def aembed_queries_for_search(queries: List[str]) -> List[Optional[List[float]]]:
+    """
+    Batch counterpart of aembed_query_for_search(). Every entry is None in
+    lexical mode, or when the embeddings API fails outside vector-only mode
+    (retrieval then uses BM25 wherever a lexical index exists).
+    """
+    if RETRIEVAL_MODE == "lexical" or not queries:
+        return [None] * len(queries)
+    try:
+        return await aembed_queries(queries)
+    except Exception as e:
+        if RETRIEVAL_MODE == "vector":
+            raise
+        logger.warning(f"Query embedding failed ({e}); falling back to lexical retrieval")
+        return [None] * len(queries)
+
+
+def search_similar_chunks(
+    query: str,
+    doc_type: str,
+    level: Optional[str] = None,
+    top_k=RETRIEVAL_TOP_K,
+    query_embedding: Optional[List[float]] = None,
+)-> List[str]:
+    """Pass query_embedding when the caller has already embedded the query."""
+    if query_embedding is None:
+        query_embedding = embed_query_for_search(query, doc_type, level)
+    return retrieve_chunks(query, doc_type, level, top_k, query_embedding)
+
+
+async def asearch_similar_chunks(
+    query: str,
+    doc_type: str,
+    level: Optional[str] = None,
+    top_k=RETRIEVAL_TOP_K,
+    query_embedding: Optional[List[float]] = None,
+)-> List[str]:
+    """Async counterpart of search_similar_chunks()."""
+    if query_embedding is None:
+        query_embedding = await aembed_query_for_search(query, doc_type, level)
+    return await aretrieve_chunks(query, doc_type, level, top_k, query_embedding)
@@ -1,32 +1,292 @@
+import os
+import math
 import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple
 from fastapi import HTTPException, status
+from .metrics import timed, RATE_LIMITED
 
-RATE_LIMIT_STORE = {}
+logger = logging.getLogger("AI-assistant-api")
 
-# Config
-MAX_REQUESTS = 20 
-WINDOW_SECONDS = 60 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 
-def check_rate_limit(token: str):
-    now = time.time()
+# Config: each token may burst MAX_REQUESTS requests, refilled evenly over WINDOW_SECONDS
+MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", 20))
+WINDOW_SECONDS = float(os.getenv("RATE_LIMIT_WINDOW_SECONDS", 60))
+# Per-endpoint overrides with their own bucket, e.g. "/ask_batch=100/60,/ask=30/60"
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+# "memory" (per process), "sqlite" (shared by every worker on the host) or "redis"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", os.path.join(BASE_DIR, "data/rate_limit.sqlite3"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+# How often idle buckets are dropped (memory/sqlite; Redis keys expire on their own)
+RATE_LIMIT_EVICT_INTERVAL_SECONDS = float(os.getenv("RATE_LIMIT_EVICT_INTERVAL_SECONDS", 60))
 
-    if token not in RATE_LIMIT_STORE:
-        RATE_LIMIT_STORE[token] = {"count": 1, "start": now}
-        return
 
-    record = RATE_LIMIT_STORE[token]
-    elapsed = now - record["start"]
+def parse_limits(spec: str) -> Dict[str, Tuple[int, float]]:
+    """"/ask_batch=5/60,/ask=30/60" -> {"/ask_batch": (5, 60.0), "/ask": (30, 60.0)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            endpoint, limit = item.split("=", 1)
+            requests, seconds = limit.split("/", 1)
+            limits[endpoint.strip()] = (int(requests), float(seconds))
+        except ValueError:
+            raise ValueError(f"Invalid RATE_LIMITS entry '{item}' (expected '<endpoint>=<requests>/<seconds>')")
+    return limits
 
-    # Reset window if expired
-    if elapsed > WINDOW_SECONDS:
-        RATE_LIMIT_STORE[token] = {"count": 1, "start": now}
-        return
 
-    # Still in same window
-    if record["count"] >= MAX_REQUESTS:
+# /ask_batch charges one request per question, so it gets its own bucket
+# large enough for a full batch (BATCH_MAX_QUESTIONS, 50 by default)
+DEFAULT_ENDPOINT_LIMITS: Dict[str, Tuple[int, float]] = {"/ask_batch": (100, 60.0)}
+
+ENDPOINT_LIMITS = {**DEFAULT_ENDPOINT_LIMITS, **parse_limits(RATE_LIMITS)}
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _take(tokens: float, cost: float, rate: float) -> Tuple[float, bool, float]:
+    """Spend `cost` tokens if available: (tokens left, allowed, seconds until allowed)."""
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in process memory: one (tokens, updated, full_at) tuple per
+    active key. A bucket that has refilled completely is indistinguishable
+    from a new one, so evict_idle() drops it.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, capacity: float, rate: float, cost: float = 1.0, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = capacity if bucket is None else _refill(bucket[0], bucket[1], now, capacity, rate)
+            tokens, allowed, retry_after = _take(tokens, cost, rate)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return allowed, retry_after
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+            for key in idle:
+                del self._buckets[key]
+        return len(idle)
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a WAL-mode SQLite file shared by every worker on the
+    host. Each acquire is one IMMEDIATE transaction, so concurrent workers
+    can't spend the same tokens twice.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None):
+        path = path or RATE_LIMIT_DB_PATH
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # isolation_level=None: transactions are opened explicitly below
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                full_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_full_at ON buckets(full_at)")
+
+    def acquire(self, key: str, capacity: float, rate: float, cost: float = 1.0, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else _refill(row[0], row[1], now, capacity, rate)
+                tokens, allowed, retry_after = _take(tokens, cost, rate)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, now + (capacity - tokens) / rate),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, retry_after
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,)).rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM buckets")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Same algorithm as _refill/_take, run atomically inside Redis.
+# Floats are returned as strings because Redis truncates Lua numbers to integers.
+_REDIS_ACQUIRE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = capacity
+if state[1] then
+    tokens = math.min(capacity, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate)
+end
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisBucketStore:
+    """
+    Token buckets in Redis (or anything speaking its protocol), shared by
+    every worker and host. Buckets expire once they would be full again, so
+    idle keys need no sweeping.
+    """
+
+    name = "redis"
+
+    def __init__(self, client=None, url: str = RATE_LIMIT_REDIS_URL, prefix: str = "rate_limit:"):
+        if client is None:
+            import redis  # optional dependency, only needed for this backend
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def acquire(self, key: str, capacity: float, rate: float, cost: float = 1.0, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        allowed, retry_after = self.client.eval(
+            _REDIS_ACQUIRE, 1, self.prefix + key, repr(capacity), repr(rate), repr(cost), repr(now)
+        )
+        return bool(int(allowed)), float(retry_after)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        return 0
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_rate_limit_store(backend: str = RATE_LIMIT_BACKEND):
+    if backend == "redis":
+        if RATE_LIMIT_REDIS_URL:
+            try:
+                return RedisBucketStore()
+            except ImportError:
+                logger.warning("RATE_LIMIT_BACKEND=redis needs the 'redis' package; using SQLite instead")
+        else:
+            logger.warning("RATE_LIMIT_BACKEND=redis without RATE_LIMIT_REDIS_URL; using SQLite instead")
+        return SQLiteBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore()
+    if backend == "memory":
+        return MemoryBucketStore()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{backend}' (expected 'memory', 'sqlite' or 'redis')")
+
+
+RATE_LIMIT_STORE = create_rate_limit_store()
+
+
+def limit_for(endpoint: Optional[str]) -> Tuple[float, float]:
+    """(burst capacity, tokens refilled per second) for an endpoint."""
+    requests, seconds = ENDPOINT_LIMITS.get(endpoint, (MAX_REQUESTS, WINDOW_SECONDS))
+    return float(requests), requests / seconds
+
+
+@timed("rate_limit")
+def check_rate_limit(token: str, endpoint: Optional[str] = None, cost: int = 1):
+    """Spend `cost` requests (e.g. one per question in a batch) from the token's bucket."""
+    # Endpoints with their own limit get their own bucket; the rest share one
+    scope = endpoint if endpoint in ENDPOINT_LIMITS else "*"
+    key = hashlib.sha256(f"{scope}\0{token}".encode("utf-8")).hexdigest()
+    capacity, rate = limit_for(endpoint)
+    if cost > capacity:
+        # Would never be allowed, so a Retry-After would only make clients loop
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"This request counts as {cost} requests but the rate limit allows at most {int(capacity)}.",
+        )
+
+    allowed, retry_after = RATE_LIMIT_STORE.acquire(key, capacity, rate, cost)
+    if not allowed:
+        RATE_LIMITED.inc(endpoint=endpoint or "")
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Try again later."
+            detail="Rate limit exceeded. Try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
         )
 
-    record["count"] += 1
\ No newline at end of file
+
+async def acheck_rate_limit(token: str, endpoint: Optional[str] = None, cost: int = 1):
+    """check_rate_limit for async handlers: shared backends block on I/O, so they run in a thread."""
+    if isinstance(RATE_LIMIT_STORE, MemoryBucketStore):
+        check_rate_limit(token, endpoint, cost)
+    else:
+        await asyncio.to_thread(check_rate_limit, token, endpoint, cost)
+
+
+async def evict_idle_buckets(interval: float = RATE_LIMIT_EVICT_INTERVAL_SECONDS):
+    """Background task: periodically drop buckets that have refilled completely."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            evicted = await asyncio.to_thread(RATE_LIMIT_STORE.evict_idle)
+            if evicted:
+                logger.info(f"Evicted {evicted} idle rate-limit buckets")
+        except Exception as e:
+            logger.warning(f"Rate-limit eviction failed: {e}")
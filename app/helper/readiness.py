@@ -0,0 +1,70 @@
+import time
+import threading
+from typing import Dict, Optional
+
+# Collection build states
+PENDING = "pending"          # registered, build not started yet
+BUILDING = "building"        # downloading / indexing
+READY = "ready"
+UNAVAILABLE = "unavailable"  # source document could not be loaded
+FAILED = "failed"            # indexing raised
+
+WARMING_STATES = frozenset({PENDING, BUILDING})
+
+
+class CollectionReadiness:
+    """
+    Tracks the build state of each RAG collection during startup so the API
+    can serve collections that are ready while others are still warming.
+    Collections that were never registered are treated as ready.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections: Dict[str, dict] = {}
+
+    def _set(self, name: str, state: str, error: Optional[str] = None):
+        with self._lock:
+            self._collections[name] = {"state": state, "error": error, "since": time.time()}
+
+    def register(self, name: str):
+        self._set(name, PENDING)
+
+    def mark_building(self, name: str):
+        self._set(name, BUILDING)
+
+    def mark_ready(self, name: str):
+        self._set(name, READY)
+
+    def mark_unavailable(self, name: str, error: str):
+        self._set(name, UNAVAILABLE, error)
+
+    def mark_failed(self, name: str, error: str):
+        self._set(name, FAILED, error)
+
+    def state(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._collections.get(name)
+        return entry["state"] if entry else None
+
+    def is_warming(self, name: str) -> bool:
+        return self.state(name) in WARMING_STATES
+
+    def all_settled(self) -> bool:
+        """True once no registered collection is pending or building."""
+        with self._lock:
+            return all(entry["state"] not in WARMING_STATES for entry in self._collections.values())
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {"state": entry["state"], "error": entry["error"]}
+                for name, entry in self._collections.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._collections.clear()
+
+
+READINESS = CollectionReadiness()
@@ -0,0 +1,221 @@
+import os
+import json
+import hashlib
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import classifer
+from .query_cache import LRUCache, normalise_query
+from .metrics import ROUTE_DECISIONS, METRICS_ENABLED, stage
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+ROUTER_EXAMPLES_PATH = os.getenv("ROUTER_EXAMPLES_PATH", os.path.join(BASE_DIR, "data/router_examples.json"))
+# A centroid decision is trusted when the best category is at least this
+# similar to the question and beats the runner-up by at least the margin
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", 0.25))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", 0.03))
+# Ask the chat model when the centroids are not confident
+ROUTER_LLM_FALLBACK = os.getenv("ROUTER_LLM_FALLBACK", "true").lower() == "true"
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", 4096))
+
+CATEGORIES = ("handbook", "academic_integrity", "other")
+
+
+def load_examples(path: str = ROUTER_EXAMPLES_PATH) -> Dict[str, List[str]]:
+    """Labelled example questions: {category: [question, ...]}."""
+    with open(path, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+    unknown = set(examples) - set(CATEGORIES)
+    if unknown:
+        raise ValueError(f"Unknown router categories: {sorted(unknown)}")
+    return examples
+
+
+def examples_digest(examples: Dict[str, List[str]]) -> str:
+    return hashlib.sha256(json.dumps(examples, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _unit(vectors) -> np.ndarray:
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+    return arr / np.where(norms == 0, 1.0, norms)
+
+
+class CentroidRouter:
+    """
+    Route a question to "handbook", "academic_integrity" or "other" by cosine
+    similarity between its embedding and per-category centroids of labelled
+    example questions.
+
+    Low-confidence questions fall back to classifer.classify_category (one
+    chat call). Decisions are cached by normalised question text.
+    """
+
+    def __init__(
+        self,
+        examples: Optional[Dict[str, List[str]]] = None,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        min_similarity: float = ROUTER_MIN_SIMILARITY,
+        min_margin: float = ROUTER_MIN_MARGIN,
+        llm_fallback: bool = ROUTER_LLM_FALLBACK,
+        cache_size: int = ROUTER_CACHE_SIZE,
+    ):
+        self._examples = examples
+        self._embed = embed
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.llm_fallback = llm_fallback
+        self.cache = LRUCache(cache_size)
+        self.categories: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def fitted(self) -> bool:
+        return self._centroids is not None
+
+    def fit(self):
+        """Embed the examples (served by the embedding cache after the first run) and average per category."""
+        with self._lock:
+            if self._centroids is not None:
+                return
+            examples = self._examples if self._examples is not None else load_examples()
+            embed = self._embed
+            if embed is None:
+                from .rag_engine import embed_text
+                embed = embed_text
+
+            categories = [c for c in CATEGORIES if examples.get(c)]
+            texts = [q for c in categories for q in examples[c]]
+            vectors = _unit(embed(texts))
+
+            centroids, start = [], 0
+            for c in categories:
+                end = start + len(examples[c])
+                centroids.append(vectors[start:end].mean(axis=0))
+                start = end
+            self.categories = categories
+            self._centroids = _unit(centroids)
+            logger.info(f"Router fitted on {len(texts)} examples across {len(categories)} categories")
+
+    def export_state(self) -> dict:
+        """Fitted centroids, for index snapshots; fits first if needed."""
+        self.fit()
+        examples = self._examples if self._examples is not None else load_examples()
+        return {
+            "examples_sha256": examples_digest(examples),
+            "categories": list(self.categories),
+            "centroids": self._centroids.tolist(),
+        }
+
+    def load_state(self, state: dict) -> bool:
+        """Use centroids from export_state() instead of fitting; False if they were built from other examples."""
+        examples = self._examples if self._examples is not None else load_examples()
+        if state.get("examples_sha256") != examples_digest(examples):
+            return False
+        with self._lock:
+            self.categories = list(state["categories"])
+            self._centroids = _unit(state["centroids"])
+        return True
+
+    def scores(self, embedding: List[float]) -> Dict[str, float]:
+        """Cosine similarity of the question embedding to each category centroid."""
+        if self._centroids is None:
+            self.fit()
+        sims = self._centroids @ _unit(embedding)
+        return {c: float(s) for c, s in zip(self.categories, sims)}
+
+    def _decide(self, embedding: List[float]) -> dict:
+        with stage("route"):
+            ranked = sorted(self.scores(embedding).items(), key=lambda kv: kv[1], reverse=True)
+        best, best_sim = ranked[0]
+        margin = best_sim - ranked[1][1] if len(ranked) > 1 else best_sim
+        confident = best_sim >= self.min_similarity and margin >= self.min_margin
+        return {"category": best, "similarity": best_sim, "margin": margin, "confident": confident}
+
+    def _finish(self, key: str, decision: dict, source: str) -> dict:
+        result = {
+            "category": decision["category"],
+            "source": source,
+            "confident": decision["confident"] or source == "llm",
+            "similarity": round(decision["similarity"], 4),
+            "margin": round(decision["margin"], 4),
+        }
+        self.cache.put(key, result)
+        if METRICS_ENABLED:
+            ROUTE_DECISIONS.inc(source=source, category=result["category"])
+        return result
+
+    def _cached(self, key: str, llm_fallback: bool) -> Optional[dict]:
+        cached = self.cache.get(key)
+        # An unsure centroid decision is not reused by callers that want the LLM's answer
+        if cached is None or (llm_fallback and not cached["confident"]):
+            return None
+        if METRICS_ENABLED:
+            ROUTE_DECISIONS.inc(source="cache", category=cached["category"])
+        return {**cached, "source": "cache"}
+
+    def route(self, question: str, embedding: List[float], llm_fallback: Optional[bool] = None) -> dict:
+        """
+        Return {"category", "source", "confident", "similarity", "margin"};
+        source is "centroid", "llm" or "cache". Pass the embedding already
+        computed for retrieval. llm_fallback overrides the instance setting.
+        """
+        llm_fallback = self.llm_fallback if llm_fallback is None else llm_fallback
+        key = normalise_query(question)
+        cached = self._cached(key, llm_fallback)
+        if cached is not None:
+            return cached
+
+        decision = self._decide(embedding)
+        if decision["confident"] or not llm_fallback:
+            return self._finish(key, decision, "centroid")
+        try:
+            with stage("route_llm"):
+                decision["category"] = classifer.classify_category(question)
+        except Exception as e:
+            logger.warning(f"LLM routing failed ({e}); using nearest centroid")
+            return self._finish(key, decision, "centroid")
+        return self._finish(key, decision, "llm")
+
+    async def aroute(self, question: str, embedding: List[float], llm_fallback: Optional[bool] = None) -> dict:
+        """Async counterpart of route(); fitting and the LLM fallback run in a worker thread."""
+        llm_fallback = self.llm_fallback if llm_fallback is None else llm_fallback
+        key = normalise_query(question)
+        cached = self._cached(key, llm_fallback)
+        if cached is not None:
+            return cached
+
+        if not self.fitted:
+            await asyncio.to_thread(self.fit)
+        decision = self._decide(embedding)
+        if decision["confident"] or not llm_fallback:
+            return self._finish(key, decision, "centroid")
+        try:
+            with stage("route_llm"):
+                decision["category"] = await asyncio.to_thread(classifer.classify_category, question)
+        except Exception as e:
+            logger.warning(f"LLM routing failed ({e}); using nearest centroid")
+            return self._finish(key, decision, "centroid")
+        return self._finish(key, decision, "llm")
+
+    def reset(self):
+        """Drop cached decisions (centroids are kept)."""
+        self.cache.clear()
+
+
+ROUTER = CentroidRouter()
+
+
+def route_question(question: str, embedding: List[float], llm_fallback: Optional[bool] = None) -> dict:
+    return ROUTER.route(question, embedding, llm_fallback)
+
+
+async def aroute_question(question: str, embedding: List[float], llm_fallback: Optional[bool] = None) -> dict:
+    return await ROUTER.aroute(question, embedding, llm_fallback)
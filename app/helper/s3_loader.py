@@ -1,29 +1,121 @@
 import os
+import json
+import hashlib
+import threading
+from typing import Optional
+
 import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 
 AWS_BUCKET = os.getenv("AWS_BUCKET_NAME", "bucket-name")
 AWS_UG_KEY = os.getenv("AWS_UG_KEY")
 AWS_PGT_KEY = os.getenv("AWS_PGT_KEY")
-AWS_PGR_KEY = os.getenv("AWS_PGR_KEY") 
+AWS_PGR_KEY = os.getenv("AWS_PGR_KEY")
+
+S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", os.path.join(BASE_DIR, "data/s3_cache"))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 10))
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Return the process-wide S3 client (boto3 clients are thread-safe)."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client(
+                    "s3",
+                    config=Config(
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={"max_attempts": 3, "mode": "standard"},
+                    ),
+                )
+    return _s3_client
 
 
-def load_text_from_s3(key: str) -> str:
-    """Downloads the handbook text file from S3 and returns it as a string."""
+# --------------------------------
+# Local copy of each object: <digest>.txt plus <digest>.json holding its ETag
+# --------------------------------
+def _cache_paths(bucket: str, key: str):
+    digest = hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+    base = os.path.join(S3_CACHE_DIR, digest)
+    return base + ".txt", base + ".json"
 
-    s3 = boto3.client("s3")
-    s3_key = key
 
+def _read_cached(bucket: str, key: str):
+    """Return (text, etag) for a cached object, or (None, None)."""
+    text_path, meta_path = _cache_paths(bucket, key)
     try:
-        response = s3.get_object(Bucket=AWS_BUCKET, Key=s3_key)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(text_path, "r", encoding="utf-8") as f:
+            return f.read(), meta.get("etag")
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_cached(bucket: str, key: str, text: str, etag: Optional[str]):
+    os.makedirs(S3_CACHE_DIR, exist_ok=True)
+    text_path, meta_path = _cache_paths(bucket, key)
+    for path, content in (
+        (text_path, text),
+        (meta_path, json.dumps({"bucket": bucket, "key": key, "etag": etag})),
+    ):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+def _is_server_error(error: ClientError) -> bool:
+    # A missing key or denied access is a real answer, not an outage, and is
+    # not papered over with a stale copy.
+    return error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500
+
+
+def load_text_from_s3(key: str, bucket: str = AWS_BUCKET) -> str:
+    """
+    Return the text object at s3://bucket/key.
+
+    A local copy is revalidated with a conditional GET (If-None-Match), so an
+    unchanged object is not downloaded again. If S3 cannot be reached, the
+    local copy is used when there is one.
+    """
+    if not key:
+        raise RuntimeError("No S3 key given.")
+
+    cached_text, etag = _read_cached(bucket, key)
+    params = {"Bucket": bucket, "Key": key}
+    if cached_text is not None and etag:
+        params["IfNoneMatch"] = etag
+
+    try:
+        response = get_s3_client().get_object(**params)
         text = response["Body"].read().decode("utf-8")
-        print(f"Loaded handbook text from s3://{AWS_BUCKET}/{s3_key}")
+        _write_cached(bucket, key, text, response.get("ETag"))
+        print(f"Loaded handbook text from s3://{bucket}/{key}")
         return text
 
-    except NoCredentialsError:
-        raise RuntimeError("AWS credentials not found. Configure via environment variables.")
-
     except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+            print(f"Using cached copy of s3://{bucket}/{key} (not modified)")
+            return cached_text
+        if cached_text is not None and _is_server_error(e):
+            print(f"[OFFLINE] S3 error for s3://{bucket}/{key}, using cached copy: {e}")
+            return cached_text
+        raise RuntimeError(f"Failed to load from S3: {e}")
+
+    except BotoCoreError as e:
+        if cached_text is not None:
+            print(f"[OFFLINE] S3 unreachable for s3://{bucket}/{key}, using cached copy: {e}")
+            return cached_text
+        if isinstance(e, NoCredentialsError):
+            raise RuntimeError("AWS credentials not found. Configure via environment variables.")
         raise RuntimeError(f"Failed to load from S3: {e}")
 
 def load_text_from_s3_for_level(level: str) -> str:
@@ -40,7 +132,7 @@ def load_text_from_s3_for_level(level: str) -> str:
         raise ValueError(f"Unsupported level '{level}' for S3 load.")
 
     if not key:
-        
+
         raise RuntimeError(
             f"No S3 key configured for level '{level}'. "
             f"Set AWS_{level.upper()}_KEY in your environment."
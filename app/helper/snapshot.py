@@ -0,0 +1,250 @@
+"""
+Prebuilt index snapshots.
+
+A snapshot is a gzip-compressed JSON artifact holding, for every collection,
+the chunks, their metadata and embeddings, and the manifest, together with
+the embedding model that produced them, plus the question router's
+centroids. Restoring one fills the vector store, the BM25 index, the
+manifests and the router without any embedding calls.
+
+    python -m app.helper.snapshot build --output data/snapshots/index.json.gz [--source local]
+    python -m app.helper.snapshot restore --input s3://bucket/snapshots/index.json.gz
+"""
+import os
+import gzip
+import json
+import time
+import base64
+import argparse
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .rag_engine import (
+    EMBEDDING_MODEL,
+    CHUNKER,
+    get_collection_name,
+    get_or_create_collection,
+    index_document,
+    load_manifest,
+    save_manifest,
+)
+from .bm25 import BM25Index, save_bm25_index
+from .answer_cache import ANSWER_CACHE
+from .router import ROUTER, CentroidRouter
+from .s3_loader import get_s3_client, load_text_from_s3, load_text_from_s3_for_level
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# (doc_type, level) of every collection the API serves
+DOCUMENTS: List[Tuple[str, Optional[str]]] = [
+    ("handbook", "ug"),
+    ("handbook", "pgt"),
+    ("handbook", "pgr"),
+    ("academic-integrity", None),
+]
+
+AWS_ACADEMIC_KEY = os.getenv("AWS_ACADEMIC_KEY")
+
+
+def _encode_embeddings(embeddings) -> str:
+    return base64.b64encode(np.asarray(embeddings, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_embeddings(data: str, count: int) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(count, -1)
+
+
+# --------------------------------
+# Document sources
+# --------------------------------
+def load_local_text(doc_type: str, level: Optional[str]) -> str:
+    """Read previously extracted text from data/extracted."""
+    from .pdf_processor import get_path_name
+
+    _, text_path = get_path_name(doc_type, level.upper() if level else None)
+    with open(text_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def load_s3_text(doc_type: str, level: Optional[str]) -> str:
+    if doc_type == "handbook":
+        return load_text_from_s3_for_level(level)
+    return load_text_from_s3(AWS_ACADEMIC_KEY)
+
+
+SOURCES: Dict[str, Callable[[str, Optional[str]], str]] = {
+    "local": load_local_text,
+    "s3": load_s3_text,
+}
+
+
+# --------------------------------
+# Build
+# --------------------------------
+def export_collection(doc_type: str, level: Optional[str] = None) -> dict:
+    """Serialise one indexed collection."""
+    collection_name = get_collection_name(doc_type, level)
+    data = get_or_create_collection(doc_type, level).get(include=["documents", "metadatas", "embeddings"])
+    ids = list(data["ids"])
+    return {
+        "doc_type": doc_type,
+        "level": level,
+        "ids": ids,
+        "documents": list(data["documents"]),
+        "metadatas": list(data["metadatas"]),
+        "embeddings": _encode_embeddings(data["embeddings"]) if ids else "",
+        "manifest": load_manifest(collection_name),
+    }
+
+
+def build_snapshot(output_path: str, source: str = "s3", documents=DOCUMENTS) -> dict:
+    """
+    Index every document (embedding only what the local store lacks) and
+    write the result to `output_path`. Documents that cannot be loaded are
+    left out of the snapshot.
+    """
+    load_text = SOURCES[source]
+    collections = {}
+    for doc_type, level in documents:
+        collection_name = get_collection_name(doc_type, level)
+        try:
+            text = load_text(doc_type, level)
+        except Exception as e:
+            print(f"[MISSING] Skipping '{collection_name}': {e}")
+            continue
+        index_document(text, doc_type=doc_type, level=level)
+        collections[collection_name] = export_collection(doc_type, level)
+
+    snapshot = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "embedding_model": EMBEDDING_MODEL,
+        "chunker": CHUNKER,
+        "created_at": time.time(),
+        "collections": collections,
+        # A separate router so building doesn't change the one this process serves with
+        "router": CentroidRouter().export_state(),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, output_path)
+
+    print(f"Wrote snapshot with {len(collections)} collections to {output_path}")
+    return snapshot
+
+
+# --------------------------------
+# Restore
+# --------------------------------
+def _parse_s3_uri(uri: str) -> Tuple[str, str]:
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    if not bucket or not key:
+        raise ValueError(f"Invalid S3 URI '{uri}'. Expected s3://bucket/key")
+    return bucket, key
+
+
+def read_snapshot(location: str) -> dict:
+    """Load a snapshot from a local path or an s3://bucket/key URI."""
+    if location.startswith("s3://"):
+        bucket, key = _parse_s3_uri(location)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            local_path = os.path.join(tmp_dir, "snapshot.json.gz")
+            get_s3_client().download_file(bucket, key, local_path)
+            return read_snapshot(local_path)
+
+    with gzip.open(location, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def upload_snapshot(path: str, uri: str):
+    bucket, key = _parse_s3_uri(uri)
+    get_s3_client().upload_file(Filename=path, Bucket=bucket, Key=key)
+    print(f"Uploaded snapshot to s3://{bucket}/{key}")
+
+
+def restore_collection(collection_name: str, entry: dict):
+    doc_type, level = entry["doc_type"], entry["level"]
+    col = get_or_create_collection(doc_type, level)
+    ids = entry["ids"]
+
+    manifest = load_manifest(collection_name)
+    up_to_date = (
+        manifest is not None
+        and entry["manifest"] is not None
+        and manifest.get("ids") == entry["manifest"].get("ids")
+        and manifest.get("embedding_model") == EMBEDDING_MODEL
+        and col.count() == len(ids)
+    )
+    if not up_to_date:
+        keep = set(ids)
+        stale = [cid for cid in col.get(include=[])["ids"] if cid not in keep]
+        if stale:
+            col.delete(ids=stale)
+        if ids:
+            col.upsert(
+                ids=ids,
+                documents=entry["documents"],
+                embeddings=_decode_embeddings(entry["embeddings"], len(ids)).tolist(),
+                metadatas=entry["metadatas"],
+            )
+        ANSWER_CACHE.invalidate(collection_name)
+
+    save_bm25_index(collection_name, BM25Index.build(ids, entry["documents"]))
+    if entry["manifest"] is not None:
+        save_manifest(collection_name, entry["manifest"])
+    print(f"Restored collection '{collection_name}' ({len(ids)} chunks{', already up to date' if up_to_date else ''})")
+
+
+def restore_snapshot(location: str) -> List[str]:
+    """
+    Restore every collection in the snapshot at `location` and return their
+    names. A snapshot built with a different embedding model or format is
+    rejected, since its vectors would not match query embeddings.
+    """
+    snapshot = read_snapshot(location)
+    if snapshot.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {snapshot.get('format_version')}")
+    if snapshot.get("embedding_model") != EMBEDDING_MODEL:
+        raise ValueError(
+            f"Snapshot was built with '{snapshot.get('embedding_model')}', "
+            f"but EMBEDDING_MODEL is '{EMBEDDING_MODEL}'"
+        )
+
+    for collection_name, entry in snapshot["collections"].items():
+        restore_collection(collection_name, entry)
+
+    # Optional: older snapshots have no router state, and the examples may have changed since
+    router_state = snapshot.get("router")
+    if router_state and ROUTER.load_state(router_state):
+        print("Restored router centroids")
+    return list(snapshot["collections"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or restore a prebuilt RAG index snapshot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index all documents and write a snapshot")
+    build.add_argument("--output", default="data/snapshots/index.json.gz")
+    build.add_argument("--source", choices=sorted(SOURCES), default="s3",
+                       help="Read documents from S3 or from data/extracted")
+    build.add_argument("--upload", metavar="S3_URI", help="Also upload the snapshot to s3://bucket/key")
+
+    restore = commands.add_parser("restore", help="Restore a snapshot into the local stores")
+    restore.add_argument("--input", required=True, help="Local path or s3://bucket/key")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build_snapshot(args.output, source=args.source)
+        if args.upload:
+            upload_snapshot(args.output, args.upload)
+    else:
+        restore_snapshot(args.input)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import math
+import logging
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # a declared dependency, but keep working from a bare checkout
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Rough average for English prose with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(name: str):
+    if tiktoken is None:
+        logger.warning("tiktoken is not installed; token counts are estimates (%d chars per token)", CHARS_PER_TOKEN)
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # e.g. the encoding file wasn't pre-fetched (TIKTOKEN_CACHE_DIR) in an offline container
+        logger.warning("Could not load tiktoken encoding '%s' (%s); token counts are estimates", name, e)
+        return None
+
+
+def is_exact(encoding: str = "cl100k_base") -> bool:
+    """True when counts come from the tokenizer, False when they are character estimates."""
+    return _get_encoding(encoding) is not None
+
+
+def count_tokens(text: str, encoding: str = "cl100k_base") -> int:
+    """
+    Count tokens with tiktoken. If the encoding can't be loaded, estimate
+    from the character length (a warning is logged once).
+    """
+    enc = _get_encoding(encoding)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, encoding: str = "cl100k_base") -> str:
+    """Cut text to at most max_tokens, backing off to the last whitespace."""
+    if max_tokens <= 0:
+        return ""
+    enc = _get_encoding(encoding)
+    if enc is not None:
+        tokens = enc.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        cut = enc.decode(tokens[:max_tokens])
+    else:
+        limit = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= limit:
+            return text
+        cut = text[:limit]
+
+    boundary = cut.rfind(" ")
+    return cut[:boundary] if boundary > 0 else cut
@@ -0,0 +1,289 @@
+import os
+import json
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+CHROMA_DIR = os.path.join(BASE_DIR, "data/chroma_db")
+NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", os.path.join(BASE_DIR, "data/numpy_index"))
+
+# "chroma" (default) or "numpy"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+
+class VectorBackend(ABC):
+    """
+    Retrieval backend interface. Collections returned by
+    get_or_create_collection() expose the subset of the Chroma collection API
+    that rag_engine uses: upsert, update, delete, get, count and query.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def get_or_create_collection(self, name: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_collection_names(self) -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_collection(self, name: str):
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    """Persistent Chroma store (HNSW, cosine space). The client is created on first use."""
+
+    name = "chroma"
+
+    def __init__(self, path: str = CHROMA_DIR):
+        self.path = path
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import chromadb
+                    self._client = chromadb.PersistentClient(path=self.path)
+        return self._client
+
+    def get_or_create_collection(self, name: str):
+        return self.client.get_or_create_collection(
+            name=name,
+            metadata={"hnsw:space": "cosine"},  # cosine similarity
+        )
+
+    def list_collection_names(self) -> List[str]:
+        return [col.name for col in self.client.list_collections()]
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name)
+
+
+class NumpyCollection:
+    """
+    Exact brute-force cosine index.
+
+    Stored on disk as a float32 matrix of L2-normalised embeddings
+    (embeddings.npy, memory-mapped on load) plus records.json holding ids,
+    documents and metadatas in row order. A query is a single matrix-vector
+    product followed by argpartition for the top-k rows.
+    """
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Optional[dict]] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._load()
+
+    # ---------- persistence ----------
+    @property
+    def _matrix_path(self):
+        return os.path.join(self.path, "embeddings.npy")
+
+    @property
+    def _records_path(self):
+        return os.path.join(self.path, "records.json")
+
+    def _load(self):
+        if not os.path.exists(self._records_path):
+            return
+        with open(self._records_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        if self._ids:
+            self._matrix = np.load(self._matrix_path, mmap_mode="r")
+
+    def _save(self, ids, documents, metadatas, matrix):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_matrix = self._matrix_path + ".tmp.npy"
+        tmp_records = self._records_path + ".tmp"
+        np.save(tmp_matrix, matrix)
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+        os.replace(tmp_matrix, self._matrix_path)
+        os.replace(tmp_records, self._records_path)
+
+        # Swap in the new state; readers holding the old references are unaffected
+        self._ids, self._documents, self._metadatas = ids, documents, metadatas
+        self._matrix = np.load(self._matrix_path, mmap_mode="r") if ids else np.zeros((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _normalise(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    # ---------- Chroma-compatible API ----------
+    def count(self) -> int:
+        return len(self._ids)
+
+    def upsert(self, ids: List[str], documents: List[str], embeddings, metadatas: Optional[List[dict]] = None):
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        new_rows = self._normalise(embeddings)
+
+        with self._lock:
+            all_ids = list(self._ids)
+            all_docs = list(self._documents)
+            all_metas = list(self._metadatas)
+            position = {cid: i for i, cid in enumerate(all_ids)}
+
+            if len(self._matrix):
+                matrix = np.array(self._matrix, dtype=np.float32)
+            else:
+                matrix = np.zeros((0, new_rows.shape[1]), dtype=np.float32)
+
+            appended = []
+            for cid, doc, meta, row in zip(ids, documents, metadatas, new_rows):
+                if cid in position:
+                    i = position[cid]
+                    all_docs[i], all_metas[i] = doc, meta
+                    matrix[i] = row
+                else:
+                    position[cid] = len(all_ids)
+                    all_ids.append(cid)
+                    all_docs.append(doc)
+                    all_metas.append(meta)
+                    appended.append(row)
+
+            if appended:
+                matrix = np.vstack([matrix, np.stack(appended)])
+            self._save(all_ids, all_docs, all_metas, matrix)
+
+    def update(self, ids: List[str], metadatas: List[Optional[dict]]):
+        """Replace metadata for existing ids (embeddings and documents are untouched)."""
+        with self._lock:
+            position = {cid: i for i, cid in enumerate(self._ids)}
+            all_metas = list(self._metadatas)
+            for cid, meta in zip(ids, metadatas):
+                if cid in position:
+                    all_metas[position[cid]] = meta
+            self._save(list(self._ids), list(self._documents), all_metas, np.array(self._matrix, dtype=np.float32))
+
+    def delete(self, ids: List[str]):
+        drop = set(ids)
+        with self._lock:
+            keep = [i for i, cid in enumerate(self._ids) if cid not in drop]
+            if len(keep) == len(self._ids):
+                return
+            matrix = np.array(self._matrix[keep], dtype=np.float32) if keep else np.zeros((0, 0), dtype=np.float32)
+            self._save(
+                [self._ids[i] for i in keep],
+                [self._documents[i] for i in keep],
+                [self._metadatas[i] for i in keep],
+                matrix,
+            )
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> dict:
+        include = ["documents", "metadatas"] if include is None else include
+        all_ids, docs, metas, matrix = self._ids, self._documents, self._metadatas, self._matrix
+        if ids is None:
+            rows = list(range(len(all_ids)))
+        else:
+            wanted = set(ids)
+            rows = [i for i, cid in enumerate(all_ids) if cid in wanted]
+
+        embeddings = None
+        if "embeddings" in include:
+            # Stored L2-normalised, which is equivalent under cosine distance
+            embeddings = np.array(matrix[rows], dtype=np.float32) if rows else np.zeros((0, 0), dtype=np.float32)
+
+        return {
+            "ids": [all_ids[i] for i in rows],
+            "documents": [docs[i] for i in rows] if "documents" in include else None,
+            "metadatas": [metas[i] for i in rows] if "metadatas" in include else None,
+            "embeddings": embeddings,
+        }
+
+    def query(self, query_embeddings, n_results: int = 10, include: Optional[List[str]] = None) -> dict:
+        # Take one consistent snapshot of the index
+        all_ids, docs, metas, matrix = self._ids, self._documents, self._metadatas, self._matrix
+        queries = self._normalise(query_embeddings)
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, len(all_ids))
+        # One matrix-matrix product scores every query in the batch
+        all_scores = queries @ matrix.T if k else None
+        for qi in range(len(queries)):
+            if k == 0:
+                rows = np.array([], dtype=int)
+                scores = np.array([], dtype=np.float32)
+            else:
+                scores = all_scores[qi]
+                rows = np.argpartition(-scores, k - 1)[:k]
+                rows = rows[np.argsort(-scores[rows])]
+            result["ids"].append([all_ids[i] for i in rows])
+            result["documents"].append([docs[i] for i in rows])
+            result["metadatas"].append([metas[i] for i in rows])
+            result["distances"].append([float(1.0 - scores[i]) for i in rows])  # cosine distance
+        return result
+
+
+class NumpyBackend(VectorBackend):
+    name = "numpy"
+
+    def __init__(self, path: str = NUMPY_INDEX_DIR):
+        self.path = path
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str) -> NumpyCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NumpyCollection(name, os.path.join(self.path, name))
+            return self._collections[name]
+
+    def list_collection_names(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, "records.json"))
+        )
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+_BACKENDS = {
+    "chroma": ChromaBackend,
+    "numpy": NumpyBackend,
+}
+
+_backend: Optional[VectorBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_vector_backend() -> VectorBackend:
+    """Return the process-wide backend selected by VECTOR_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if VECTOR_BACKEND not in _BACKENDS:
+                    raise ValueError(
+                        f"Unsupported VECTOR_BACKEND '{VECTOR_BACKEND}'. Must be one of: {', '.join(_BACKENDS)}"
+                    )
+                _backend = _BACKENDS[VECTOR_BACKEND]()
+    return _backend
@@ -0,0 +1,274 @@
+"""
+Retrieval quality and speed evaluation over the extracted corpora.
+
+For every combination of chunker settings, vector backend, retrieval mode
+and top_k this builds throwaway indexes for the labelled documents and
+reports recall@k, MRR, build time, query latency and context tokens per
+question. A retrieved chunk counts as relevant when it contains one of the
+question's evidence phrases (whitespace-normalised), so labels do not depend
+on how the text was chunked.
+
+Embeddings go through the shared on-disk embedding cache, so after one run
+with an OpenAI key the evaluation runs offline. --embeddings fake uses
+deterministic local vectors instead (useful for speed, not quality).
+
+    python -m benchmarks.evaluate_retrieval --chunk-tokens 200 400 600 --top-k 3 5 8
+"""
+import os
+import json
+import math
+import time
+import argparse
+import tempfile
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+EVAL_SET_PATH = os.path.join(BENCH_DIR, "retrieval_eval.json")
+
+
+@dataclass(frozen=True)
+class ChunkerConfig:
+    name: str            # "structured" or "fixed"
+    size: int            # max tokens (structured) or characters (fixed)
+    overlap: int         # overlap tokens (structured) or characters (fixed)
+
+    @property
+    def label(self) -> str:
+        unit = "tok" if self.name == "structured" else "chars"
+        return f"{self.name}-{self.size}{unit}/{self.overlap}"
+
+    def chunk(self, text: str) -> List[str]:
+        from app.helper.chunker import chunk_document
+        from app.helper.rag_engine import chunk_text
+
+        if self.name == "structured":
+            return [c["text"] for c in chunk_document(text, max_tokens=self.size, overlap_tokens=self.overlap)]
+        return chunk_text(text, chunk_size=self.size, overlap=self.overlap)
+
+
+def normalise(text: str) -> str:
+    return " ".join(text.split())
+
+
+def is_relevant(chunk: str, evidence: List[str]) -> bool:
+    chunk = normalise(chunk)
+    return any(normalise(phrase) in chunk for phrase in evidence)
+
+
+def first_relevant_rank(chunks: List[str], evidence: List[str]) -> Optional[int]:
+    for rank, chunk in enumerate(chunks, start=1):
+        if is_relevant(chunk, evidence):
+            return rank
+    return None
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(p / 100 * len(ordered))) - 1]
+
+
+def get_embedder(kind: str) -> Callable[[List[str]], List[List[float]]]:
+    if kind == "fake":
+        from .fake_openai import fake_embedding
+
+        # rag_engine builds its OpenAI client at import; it is never called here
+        os.environ.setdefault("OPENAI_API_KEY", "unused")
+        return lambda texts: [fake_embedding(t).tolist() for t in texts]
+
+    from app.helper.rag_engine import embed_text
+    return embed_text
+
+
+def make_backend(kind: str, path: str):
+    from app.helper.vector_store import ChromaBackend, NumpyBackend
+    return ChromaBackend(path) if kind == "chroma" else NumpyBackend(path)
+
+
+# --------------------------------
+# Evaluation
+# --------------------------------
+def build_index(text: str, chunker: ChunkerConfig, backend, name: str, embed) -> dict:
+    from app.helper.bm25 import BM25Index
+    from app.helper.rag_engine import chunk_id
+
+    start = time.perf_counter()
+    chunks = list(dict.fromkeys(chunker.chunk(text)))  # de-duplicate, keep order
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = embed(chunks)
+    embed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids = [chunk_id(name, c) for c in chunks]
+    col = backend.get_or_create_collection(name)
+    col.upsert(ids=ids, documents=chunks, embeddings=embeddings)
+    bm25 = BM25Index.build(ids, chunks)
+    index_seconds = time.perf_counter() - start
+
+    return {
+        "collection": col,
+        "bm25": bm25,
+        "chunks": len(chunks),
+        "chunk_seconds": chunk_seconds,
+        "embed_seconds": embed_seconds,
+        "index_seconds": index_seconds,
+    }
+
+
+def retrieve(question: str, index: dict, mode: str, top_k: int, embed) -> List[str]:
+    from app.helper.rag_engine import rank_chunks
+
+    if mode == "lexical":
+        return [doc for _, doc, _ in index["bm25"].search(question, top_k)]
+    query_embedding = embed([question])[0]
+    bm25 = index["bm25"] if mode == "hybrid" else None
+    return rank_chunks(question, query_embedding, index["collection"], bm25, top_k)
+
+
+def evaluate_config(indexes: Dict[str, dict], questions: List[dict], mode: str, top_k: int, embed) -> dict:
+    from app.helper.context_builder import build_context
+
+    hits, reciprocal_ranks, latencies_ms, context_tokens = 0, [], [], []
+    misses = []
+    for item in questions:
+        start = time.perf_counter()
+        chunks = retrieve(item["question"], indexes[item["document"]], mode, top_k, embed)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        rank = first_relevant_rank(chunks, item["evidence"])
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        if rank is None:
+            misses.append(item["question"])
+        # No budget: measure everything retrieval would hand to the packer
+        context_tokens.append(build_context(chunks, token_budget=10 ** 9)[1])
+
+    n = len(questions)
+    return {
+        "recall_at_k": round(hits / n, 4) if n else 0.0,
+        "mrr": round(sum(reciprocal_ranks) / n, 4) if n else 0.0,
+        "query_latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 3),
+            "p95": round(percentile(latencies_ms, 95), 3),
+            "mean": round(sum(latencies_ms) / n, 3) if n else 0.0,
+        },
+        "context_tokens": {
+            "mean": round(sum(context_tokens) / n, 1) if n else 0.0,
+            "max": max(context_tokens) if context_tokens else 0,
+        },
+        "missed": misses,
+    }
+
+
+def run_evaluation(
+    eval_set: dict,
+    chunkers: List[ChunkerConfig],
+    backends: List[str],
+    modes: List[str],
+    top_ks: List[int],
+    embed,
+) -> List[dict]:
+    rows = []
+    texts = {}
+    for doc_name, doc in eval_set["documents"].items():
+        with open(os.path.join(BASE_DIR, doc["path"]), "r", encoding="utf-8") as f:
+            texts[doc_name] = f.read()
+
+    for chunker in chunkers:
+        for backend_kind in backends:
+            with tempfile.TemporaryDirectory() as workdir:
+                backend = make_backend(backend_kind, workdir)
+                indexes = {
+                    doc_name: build_index(text, chunker, backend, f"eval-{i}", embed)
+                    for i, (doc_name, text) in enumerate(texts.items())
+                }
+                build = {
+                    "chunks": sum(ix["chunks"] for ix in indexes.values()),
+                    "chunk_seconds": round(sum(ix["chunk_seconds"] for ix in indexes.values()), 4),
+                    "embed_seconds": round(sum(ix["embed_seconds"] for ix in indexes.values()), 4),
+                    "index_seconds": round(sum(ix["index_seconds"] for ix in indexes.values()), 4),
+                }
+                for mode in modes:
+                    for top_k in top_ks:
+                        result = evaluate_config(indexes, eval_set["questions"], mode, top_k, embed)
+                        rows.append({
+                            "chunker": asdict(chunker),
+                            "chunker_label": chunker.label,
+                            "backend": backend_kind,
+                            "mode": mode,
+                            "top_k": top_k,
+                            "build": build,
+                            **result,
+                        })
+                        print(
+                            f"{chunker.label:<24} {backend_kind:<7} {mode:<8} k={top_k:<3} "
+                            f"recall={result['recall_at_k']:.2f} mrr={result['mrr']:.2f} "
+                            f"ctx={result['context_tokens']['mean']:.0f}tok "
+                            f"p50={result['query_latency_ms']['p50']:.2f}ms"
+                        )
+    return rows
+
+
+def recommend(rows: List[dict], tolerance: float = 0.0) -> Optional[dict]:
+    """The configuration with the smallest mean context that keeps (near-)best recall."""
+    if not rows:
+        return None
+    best_recall = max(row["recall_at_k"] for row in rows)
+    eligible = [row for row in rows if row["recall_at_k"] >= best_recall - tolerance]
+    return min(eligible, key=lambda row: (row["context_tokens"]["mean"], -row["mrr"]))
+
+
+def parse_fixed(spec: str) -> ChunkerConfig:
+    size, _, overlap = spec.partition(":")
+    return ChunkerConfig("fixed", int(size), int(overlap or 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and speed.")
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH)
+    parser.add_argument("--chunk-tokens", type=int, nargs="*", default=[200, 400, 600],
+                        help="max_tokens values for the structured chunker")
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--fixed", nargs="*", default=["2000:300"], metavar="SIZE:OVERLAP",
+                        help="chunk_size:overlap (characters) for the fixed chunker")
+    parser.add_argument("--backends", nargs="+", choices=["numpy", "chroma"], default=["numpy"])
+    parser.add_argument("--modes", nargs="+", choices=["vector", "hybrid", "lexical"], default=["vector", "hybrid"])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--embeddings", choices=["openai", "fake"], default="openai",
+                        help="openai goes through the on-disk embedding cache")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Recall drop accepted when picking the smallest context")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/retrieval-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    with open(args.eval_set, "r", encoding="utf-8") as f:
+        eval_set = json.load(f)
+
+    chunkers = [ChunkerConfig("structured", size, args.overlap_tokens) for size in args.chunk_tokens]
+    chunkers += [parse_fixed(spec) for spec in args.fixed]
+
+    rows = run_evaluation(eval_set, chunkers, args.backends, args.modes, args.top_k, get_embedder(args.embeddings))
+    best = recommend(rows, args.tolerance)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"retrieval-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"embeddings": args.embeddings, "questions": len(eval_set["questions"]),
+                   "results": rows, "recommended": best}, f, indent=2)
+
+    if best:
+        print(
+            f"\nSmallest context keeping recall@k={best['recall_at_k']:.2f}: {best['chunker_label']} "
+            f"{best['backend']} {best['mode']} top_k={best['top_k']} (~{best['context_tokens']['mean']:.0f} tokens)"
+        )
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions APIs.
+
+Embeddings are deterministic hashed bag-of-words vectors, so retrieval over
+the real corpora behaves sensibly, and every call sleeps for a configurable
+latency to mimic the network and model time of the real service.
+
+    python -m benchmarks.fake_openai --port 8900 --chat-latency-ms 800
+"""
+import re
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import argparse
+import random
+from dataclasses import dataclass
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIMENSIONS = 256
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class FakeOpenAIConfig:
+    embedding_latency_ms: float = 50.0
+    chat_latency_ms: float = 500.0
+    stream_token_latency_ms: float = 10.0
+    jitter: float = 0.1  # +/- fraction applied to every latency
+    answer_words: int = 60
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """Unit-length hashed bag of words: texts sharing words get similar vectors."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in _WORD_RE.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return vector / norm
+
+
+def create_app(config: FakeOpenAIConfig = FakeOpenAIConfig()) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(0)
+
+    async def sleep_ms(ms: float):
+        if ms > 0:
+            await asyncio.sleep(ms * (1 + rng.uniform(-config.jitter, config.jitter)) / 1000)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await sleep_ms(config.embedding_latency_ms)
+
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(str(text))
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(len(str(text)) // 4 for text in inputs)
+        return JSONResponse({
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+        words = [f"word{i}" for i in range(config.answer_words)]
+        model = body.get("model", "fake-chat")
+        created = int(time.time())
+
+        if body.get("stream"):
+            async def events():
+                await sleep_ms(config.chat_latency_ms)
+                for word in words:
+                    await sleep_ms(config.stream_token_latency_ms)
+                    chunk = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await sleep_ms(config.chat_latency_ms)
+        return JSONResponse({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(words),
+                "total_tokens": prompt_tokens + len(words),
+            },
+        })
+
+    return app
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--embedding-latency-ms", type=float, default=FakeOpenAIConfig.embedding_latency_ms)
+    parser.add_argument("--chat-latency-ms", type=float, default=FakeOpenAIConfig.chat_latency_ms)
+    parser.add_argument("--stream-token-latency-ms", type=float, default=FakeOpenAIConfig.stream_token_latency_ms)
+    args = parser.parse_args(argv)
+
+    config = FakeOpenAIConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        stream_token_latency_ms=args.stream_token_latency_ms,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Offline load benchmark for the question endpoints.
+
+By default the API runs in-process against the fake OpenAI server
+(benchmarks/fake_openai.py) with isolated indexes built from data/extracted,
+so no OpenAI or AWS calls are made. Use --target to load-test a running
+deployment instead.
+
+    python -m benchmarks.run --concurrency 16 --requests 200
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+QUESTIONS_PATH = os.path.join(BENCH_DIR, "questions.json")
+BENCH_TOKEN = "bench-token"
+
+ENDPOINTS = ["/ask_handbook", "/ask_academic_integrity", "/ask"]
+
+
+# --------------------------------
+# Statistics
+# --------------------------------
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """'embed;dur=12.0, chat;dur=500.1' -> {"embed": 12.0, "chat": 500.1}"""
+    timings = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+def summarise(latencies_ms: List[float], stages: Dict[str, List[float]], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies_ms) + errors,
+        "errors": errors,
+        "rps": round(len(latencies_ms) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 2),
+            "p95": round(percentile(latencies_ms, 95), 2),
+            "p99": round(percentile(latencies_ms, 99), 2),
+            "mean": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+            "max": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+        },
+        "stages_ms": {
+            name: {
+                "mean": round(sum(values) / len(values), 2),
+                "p50": round(percentile(values, 50), 2),
+                "p95": round(percentile(values, 95), 2),
+            }
+            for name, values in sorted(stages.items())
+        },
+    }
+
+
+# --------------------------------
+# Load driver
+# --------------------------------
+async def drive_endpoint(
+    client: httpx.AsyncClient, path: str, payloads: List[dict], total_requests: int, concurrency: int
+) -> dict:
+    """Send total_requests requests (cycling through payloads) with `concurrency` in flight."""
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+    next_index = 0
+    headers = {"Authorization": f"Bearer {BENCH_TOKEN}"}
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total_requests:
+            payload = payloads[next_index % len(payloads)]
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                resp = await client.post(path, json=payload, headers=headers)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if resp.status_code != 200:
+                errors += 1
+                continue
+            latencies.append(elapsed_ms)
+            for name, duration in parse_server_timing(resp.headers.get("server-timing")).items():
+                stages[name].append(duration)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarise(latencies, stages, errors, time.perf_counter() - start)
+
+
+async def run_load(client: httpx.AsyncClient, endpoints: List[str], questions: dict, args) -> dict:
+    results = {}
+    for path in endpoints:
+        print(f"Benchmarking {path}: {args.requests} requests at concurrency {args.concurrency}")
+        if args.warmup:
+            await drive_endpoint(client, path, questions[path], args.warmup, args.concurrency)
+        results[path] = await drive_endpoint(client, path, questions[path], args.requests, args.concurrency)
+    return results
+
+
+# --------------------------------
+# In-process setup
+# --------------------------------
+def start_fake_openai(port: int, args) -> threading.Thread:
+    import uvicorn
+    from .fake_openai import FakeOpenAIConfig, create_app
+
+    config = FakeOpenAIConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        stream_token_latency_ms=0,
+    )
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("Fake OpenAI server did not start")
+        time.sleep(0.05)
+    return thread
+
+
+def configure_environment(workdir: str, args):
+    """Point the app at the fake OpenAI server and at throwaway local stores."""
+    os.environ.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "OPENAI_API_KEY": "fake-key",
+        "API_SECRET_TOKEN": BENCH_TOKEN,
+        "MODE": "production",
+        "STARTUP_MODE": "blocking",
+        "METRICS_ENABLED": "true",
+        "VECTOR_BACKEND": args.vector_backend,
+        "NUMPY_INDEX_DIR": os.path.join(workdir, "numpy_index"),
+        "BM25_DIR": os.path.join(workdir, "bm25_index"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite3"),
+        "EMBEDDING_CACHE_ENABLED": "true" if args.enable_caches else "false",
+        "ANSWER_CACHE_ENABLED": "true" if args.enable_caches else "false",
+        "QUERY_EMBEDDING_CACHE_SIZE": "2048" if args.enable_caches else "0",
+    })
+    os.environ.pop("INDEX_SNAPSHOT", None)
+
+
+def load_local_document(level: Optional[str] = None) -> str:
+    name = f"handbook-{level.upper()}.txt" if level else "academic-integrity.txt"
+    with open(os.path.join(BASE_DIR, "data/extracted", name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+async def run_in_process(endpoints: List[str], questions: dict, args) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir, args)
+        start_fake_openai(args.fake_port, args)
+
+        from app.api import main as api
+        from app.helper import rag_engine, rate_limiter
+
+        # Per-request log lines would dominate the output and the timings
+        for name in ("httpx", "AI-assistant-api"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        rag_engine.MANIFEST_DIR = os.path.join(workdir, "manifests")
+        rate_limiter.MAX_REQUESTS = sys.maxsize
+        rate_limiter.ENDPOINT_LIMITS = {}
+        api.load_text_from_s3_for_level = load_local_document
+        api.load_text_from_s3 = lambda key: load_local_document()
+
+        start = time.perf_counter()
+        async with api.lifespan(api.app):
+            print(f"Indexes built in {time.perf_counter() - start:.2f}s")
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                return await run_load(client, endpoints, questions, args)
+
+
+async def run_against_target(endpoints: List[str], questions: dict, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.target, timeout=120, limits=limits) as client:
+        return await run_load(client, endpoints, questions, args)
+
+
+# --------------------------------
+# Reporting
+# --------------------------------
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """Human-readable p50/p95/rps deltas against a previous results file."""
+    lines = [f"Compared with {baseline.get('commit') or 'baseline'}:"]
+    for path, result in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(path)
+        if not before:
+            continue
+        for metric, now, then in (
+            ("p50", result["latency_ms"]["p50"], before["latency_ms"]["p50"]),
+            ("p95", result["latency_ms"]["p95"], before["latency_ms"]["p95"]),
+            ("rps", result["rps"], before["rps"]),
+        ):
+            change = ((now - then) / then * 100) if then else 0.0
+            lines.append(f"  {path} {metric}: {then} -> {now} ({change:+.1f}%)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the question endpoints.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per endpoint")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--target", help="Base URL of a running API; by default the app runs in-process")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=500.0)
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy"], default="numpy")
+    parser.add_argument("--enable-caches", action="store_true",
+                        help="Keep the embedding, query-embedding and answer caches on (off by default)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Print deltas against an earlier results file")
+    args = parser.parse_args(argv)
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    if args.target:
+        endpoints = asyncio.run(run_against_target(args.endpoints, questions, args))
+    else:
+        endpoints = asyncio.run(run_in_process(args.endpoints, questions, args))
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "target": args.target or "in-process",
+            "embedding_latency_ms": args.embedding_latency_ms,
+            "chat_latency_ms": args.chat_latency_ms,
+            "vector_backend": args.vector_backend,
+            "caches": args.enable_caches,
+        },
+        "endpoints": endpoints,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for path, result in endpoints.items():
+        latency = result["latency_ms"]
+        print(f"{path}: {result['rps']} req/s | p50 {latency['p50']}ms | p95 {latency['p95']}ms | "
+              f"p99 {latency['p99']}ms | errors {result['errors']}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print("\n".join(compare(results, json.load(f))))
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
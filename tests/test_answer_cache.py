@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+from app.helper.answer_cache import SemanticAnswerCache
+
+
+def make_cache(**kwargs):
+    defaults = dict(threshold=0.9, ttl_seconds=60, max_entries=10, enabled=True)
+    defaults.update(kwargs)
+    return SemanticAnswerCache(**defaults)
+
+
+def test_lookup_matches_similar_embedding():
+    cache = make_cache()
+    cache.store("handbook_pgr", None, [1.0, 0.0], "answer", ["ctx"])
+
+    hit = cache.lookup("handbook_pgr", None, [0.98, 0.1])
+
+    assert hit["answer"] == "answer"
+    assert hit["context_used"] == ["ctx"]
+    assert hit["similarity"] > 0.9
+
+
+def test_lookup_misses_below_threshold():
+    cache = make_cache()
+    cache.store("handbook_pgr", None, [1.0, 0.0], "answer", ["ctx"])
+
+    assert cache.lookup("handbook_pgr", None, [0.5, 0.5]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lookup_is_scoped_by_collection_and_origin():
+    cache = make_cache()
+    cache.store("handbook_pgr", "international", [1.0, 0.0], "answer", [])
+
+    assert cache.lookup("handbook_ug", "international", [1.0, 0.0]) is None
+    assert cache.lookup("handbook_pgr", "home", [1.0, 0.0]) is None
+    assert cache.lookup("handbook_pgr", "international", [1.0, 0.0]) is not None
+
+
+def test_entries_expire_after_ttl():
+    cache = make_cache(ttl_seconds=10)
+    with patch("app.helper.answer_cache.time.time", return_value=1000.0):
+        cache.store("c", None, [1.0], "answer", [])
+    with patch("app.helper.answer_cache.time.time", return_value=1011.0):
+        assert cache.lookup("c", None, [1.0]) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.store("c", None, [1.0, 0.0, 0.0], "a", [])
+    cache.store("c", None, [0.0, 1.0, 0.0], "b", [])
+    cache.lookup("c", None, [1.0, 0.0, 0.0])  # "a" becomes most recent
+    cache.store("c", None, [0.0, 0.0, 1.0], "c", [])
+
+    assert cache.lookup("c", None, [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("c", None, [1.0, 0.0, 0.0])["answer"] == "a"
+
+
+def test_invalidate_only_drops_one_collection():
+    cache = make_cache()
+    cache.store("handbook_pgr", None, [1.0], "a", [])
+    cache.store("academic-integrity", None, [1.0], "b", [])
+
+    cache.invalidate("handbook_pgr")
+
+    assert cache.lookup("handbook_pgr", None, [1.0]) is None
+    assert cache.lookup("academic-integrity", None, [1.0])["answer"] == "b"
+
+
+def test_invalidating_either_collection_drops_a_combined_answer():
+    cache = make_cache()
+    for name in ("handbook_pgr", "academic-integrity"):
+        cache.store("handbook_pgr+academic-integrity", None, [1.0], "both", [],
+                    collections=["handbook_pgr", "academic-integrity"])
+        assert cache.lookup("handbook_pgr+academic-integrity", None, [1.0])["answer"] == "both"
+
+        cache.invalidate(name)
+
+        assert cache.lookup("handbook_pgr+academic-integrity", None, [1.0]) is None
+
+
+def test_disabled_cache_never_hits():
+    cache = make_cache(enabled=False)
+    cache.store("c", None, [1.0], "a", [])
+    assert cache.lookup("c", None, [1.0]) is None
@@ -0,0 +1,537 @@
+import os
+import json
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("API_SECRET_TOKEN", "test-token")
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import main
+from app.helper.answer_cache import ANSWER_CACHE
+from app.helper.history_store import HISTORY, count_history, get_history
+from app.helper.rate_limiter import RATE_LIMIT_STORE
+from app.helper.readiness import READINESS
+
+AUTH = {"Authorization": f"Bearer {os.environ['API_SECRET_TOKEN']}"}
+
+
+def _completion(text):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=text))])
+
+
+@pytest.fixture
+def api():
+    HISTORY.clear()
+    RATE_LIMIT_STORE.clear()
+    ANSWER_CACHE.clear()
+    READINESS.reset()
+    # no `with` block: the S3/embedding lifespan is not run in unit tests
+    return TestClient(main.app)
+
+
+@pytest.fixture(autouse=True)
+def router_fit(monkeypatch):
+    # Fitting embeds the router examples through OpenAI; lifespan tests must not
+    fit = MagicMock()
+    monkeypatch.setattr(main.ROUTER, "fit", fit)
+    return fit
+
+
+@pytest.fixture
+def mock_embed():
+    with patch("app.api.main.aembed_query_for_search", new_callable=AsyncMock) as m:
+        m.return_value = [1.0, 0.0, 0.0]
+        yield m
+
+
+@pytest.fixture
+def mock_search(mock_embed):
+    with patch("app.api.main.aretrieve_chunks", new_callable=AsyncMock) as m:
+        m.return_value = ["chunk A", "chunk B"]
+        yield m
+
+
+@pytest.fixture
+def mock_chat():
+    with patch("app.api.main.client") as m:
+        m.chat.completions.create = AsyncMock(return_value=_completion("The answer."))
+        yield m.chat.completions.create
+
+
+def test_ask_handbook_returns_answer(api, mock_search, mock_chat):
+    resp = api.post("/ask_handbook", json={"question": "When is the viva?", "level": "PGR", "include_history": True},
+                    headers=AUTH)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["answer"] == "The answer."
+    assert body["context_used"] == ["chunk A", "chunk B"]
+    assert body["collection_used"] == "handbook_pgr"
+    assert body["history"] == [{"question": "When is the viva?", "answer": "The answer."}]
+    mock_search.assert_awaited_once_with(
+        "When is the viva?", doc_type="handbook", level="pgr", query_embedding=[1.0, 0.0, 0.0]
+    )
+    messages = mock_chat.await_args.kwargs["messages"]
+    assert messages[1]["content"] == "chunk A\n\nchunk B"
+    assert body["context_tokens"] > 0
+
+
+def test_rate_limited_requests_get_retry_after(api, mock_search, mock_chat):
+    with patch("app.helper.rate_limiter.MAX_REQUESTS", 2):
+        statuses = [
+            api.post("/ask_handbook", json={"question": f"q{i}", "level": "pgr"}, headers=AUTH)
+            for i in range(3)
+        ]
+
+    assert [r.status_code for r in statuses] == [200, 200, 429]
+    assert int(statuses[-1].headers["Retry-After"]) >= 1
+
+
+def test_history_is_only_returned_on_request_and_paged(api, mock_search, mock_chat):
+    for i in range(5):
+        resp = api.post("/ask_handbook", json={"question": f"q{i}", "level": "pgr"}, headers=AUTH)
+        assert resp.json()["history"] is None
+
+    with patch("app.api.main.HISTORY_PAGE_SIZE", 2):
+        resp = api.post("/ask_handbook", json={"question": "q5", "level": "pgr", "include_history": True},
+                        headers=AUTH)
+    assert [h["question"] for h in resp.json()["history"]] == ["q4", "q5"]
+
+    page = api.get("/history", params={"limit": 3, "offset": 2}, headers=AUTH).json()
+    assert [h["question"] for h in page["items"]] == ["q1", "q2", "q3"]
+    assert page["total"] == 6
+    assert api.get("/history", params={"limit": 0}, headers=AUTH).status_code == 400
+    assert api.get("/history").status_code in (401, 403)
+
+
+def test_repeated_question_is_served_from_answer_cache(api, mock_embed, mock_search, mock_chat):
+    payload = {"question": "When is the viva?", "level": "pgr"}
+    api.post("/ask_handbook", json=payload, headers=AUTH)
+
+    # a near-identical embedding for a reworded question
+    mock_embed.return_value = [0.99, 0.05, 0.0]
+    resp = api.post("/ask_handbook", json={**payload, "question": "when's the viva"}, headers=AUTH)
+
+    assert resp.status_code == 200
+    assert resp.json()["answer"] == "The answer."
+    assert resp.json()["context_used"] == ["chunk A", "chunk B"]
+    assert resp.json()["context_tokens"] is None
+    assert mock_chat.await_count == 1
+    assert mock_search.await_count == 1
+
+
+def test_answer_cache_is_scoped_by_collection(api, mock_search, mock_chat):
+    api.post("/ask_handbook", json={"question": "q", "level": "pgr"}, headers=AUTH)
+    api.post("/ask_handbook", json={"question": "q", "level": "ug"}, headers=AUTH)
+
+    assert mock_chat.await_count == 2
+
+
+def test_ask_handbook_rejects_unknown_level(api, mock_search, mock_chat):
+    resp = api.post("/ask_handbook", json={"question": "q", "level": "phd"}, headers=AUTH)
+
+    assert resp.status_code == 400
+    mock_search.assert_not_awaited()
+
+
+def test_ask_handbook_404_without_context(api, mock_search, mock_chat):
+    mock_search.return_value = []
+
+    resp = api.post("/ask_handbook", json={"question": "q", "level": "ug"}, headers=AUTH)
+
+    assert resp.status_code == 404
+    mock_chat.assert_not_awaited()
+
+
+def test_ask_integrity_returns_500_on_llm_error(api, mock_search, mock_chat):
+    mock_chat.side_effect = RuntimeError("boom")
+
+    resp = api.post("/ask_academic_integrity", json={"question": "q", "level": "pgr"}, headers=AUTH)
+
+    assert resp.status_code == 500
+    assert resp.json()["detail"] == "Failed to generate answer from AI model."
+
+
+def _route(category, confident=True):
+    return patch("app.api.main.aroute_question", new_callable=AsyncMock,
+                 return_value={"category": category, "confident": confident})
+
+
+def test_ask_routes_to_a_single_collection(api, mock_embed, mock_search, mock_chat):
+    with _route("academic_integrity") as route:
+        resp = api.post("/ask", json={"question": "Is self-plagiarism allowed?", "level": "pgr"}, headers=AUTH)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["category"] == "academic_integrity"
+    assert body["collections_used"] == ["academic-integrity"]
+    mock_embed.assert_awaited_once()
+    # never the chat classifier: /ask makes exactly one chat call
+    route.assert_awaited_once_with("Is self-plagiarism allowed?", [1.0, 0.0, 0.0], llm_fallback=False)
+    mock_search.assert_awaited_once_with(
+        "Is self-plagiarism allowed?", doc_type="academic-integrity", level=None, query_embedding=[1.0, 0.0, 0.0]
+    )
+    assert mock_chat.await_count == 1
+
+
+def test_ask_searches_both_collections_when_routing_is_ambiguous(api, mock_search, mock_chat):
+    mock_search.side_effect = [["handbook chunk", "shared"], ["integrity chunk", "shared"]]
+
+    with _route("handbook", confident=False):
+        resp = api.post("/ask", json={"question": "Plagiarism in my thesis?", "level": "pgr"}, headers=AUTH)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["category"] == "both"
+    assert body["collections_used"] == ["handbook_pgr", "academic-integrity"]
+    assert body["context_used"][0] == "shared"
+    assert set(body["context_used"]) == {"handbook chunk", "integrity chunk", "shared"}
+    assert {c.kwargs["doc_type"] for c in mock_search.await_args_list} == {"handbook", "academic-integrity"}
+    assert mock_chat.await_count == 1
+    assert "Academic Integrity" in mock_chat.await_args.kwargs["messages"][0]["content"]
+
+
+def test_ask_combined_answer_is_dropped_when_one_collection_is_reindexed(api, mock_search, mock_chat):
+    payload = {"question": "Plagiarism in my thesis?", "level": "pgr"}
+    with _route("handbook", confident=False):
+        api.post("/ask", json=payload, headers=AUTH)
+        api.post("/ask", json=payload, headers=AUTH)
+        assert mock_chat.await_count == 1
+
+        # what index_document / restore_snapshot do after the document changes
+        ANSWER_CACHE.invalidate("academic-integrity")
+        resp = api.post("/ask", json=payload, headers=AUTH)
+
+    assert resp.status_code == 200
+    assert mock_chat.await_count == 2
+    assert ANSWER_CACHE.stats()["misses"] == 2
+
+
+def test_ask_never_spends_a_chat_call_on_classification(api, mock_search, mock_chat, monkeypatch):
+    unsure = {"category": "handbook", "similarity": 0.1, "margin": 0.0, "confident": False}
+    monkeypatch.setattr(main.ROUTER, "_decide", lambda embedding: dict(unsure))
+    monkeypatch.setattr(main.ROUTER, "llm_fallback", True)
+
+    with patch("app.helper.router.classifer.classify_category") as classify:
+        resp = api.post("/ask", json={"question": "Unsure-routing probe?", "level": "pgr"}, headers=AUTH)
+
+    assert resp.json()["category"] == "both"
+    classify.assert_not_called()
+    assert mock_chat.await_count == 1
+    main.ROUTER.reset()
+
+
+def test_ask_skips_a_warming_collection_when_searching_both(api, mock_search, mock_chat):
+    READINESS.register("academic-integrity")
+    READINESS.mark_building("academic-integrity")
+
+    with _route("other", confident=False):
+        resp = api.post("/ask", json={"question": "q", "level": "ug"}, headers=AUTH)
+
+    assert resp.status_code == 200
+    assert resp.json()["collections_used"] == ["handbook_ug"]
+
+
+def test_ask_answers_out_of_scope_questions_from_both_collections(api, mock_search, mock_chat):
+    with _route("other"):
+        resp = api.post("/ask", json={"question": "Where is the gym?", "level": "ug"}, headers=AUTH)
+
+    assert resp.status_code == 200
+    assert resp.json()["category"] == "other"
+    assert resp.json()["collections_used"] == ["handbook_ug", "academic-integrity"]
+    assert mock_chat.await_count == 1
+
+
+def test_ask_searches_both_when_the_router_fails(api, mock_search, mock_chat):
+    with patch("app.api.main.aroute_question", new_callable=AsyncMock, side_effect=RuntimeError("no examples")):
+        resp = api.post("/ask", json={"question": "q", "level": "pgt"}, headers=AUTH)
+
+    assert resp.status_code == 200
+    assert resp.json()["category"] == "both"
+
+
+@pytest.fixture
+def mock_batch():
+    with patch("app.api.main.aembed_queries_for_search", new_callable=AsyncMock) as embed, \
+         patch("app.api.main.aretrieve_chunks_batch", new_callable=AsyncMock) as retrieve:
+        embed.side_effect = lambda questions: [[float(i + 1), 0.0, 0.0] for i in range(len(questions))]
+        retrieve.side_effect = lambda questions, doc_type, level, embeddings: [[f"{doc_type}: {q}"] for q in questions]
+        yield embed, retrieve
+
+
+def test_ask_batch_embeds_once_and_retrieves_once_per_collection(api, mock_batch, mock_chat):
+    embed, retrieve = mock_batch
+    routes = {"q1": "handbook", "q2": "academic_integrity", "q3": "handbook", "q4": "handbook"}
+
+    async def route(question, embedding, llm_fallback):
+        return {"category": routes[question], "confident": True}
+
+    with patch("app.api.main.aroute_question", side_effect=route):
+        resp = api.post("/ask_batch", json={"questions": [
+            {"question": "q1", "level": "pgr"},
+            {"question": "q2", "level": "pgr"},
+            {"question": "bad", "level": "phd"},
+            {"question": "q3", "level": "pgr"},
+            {"question": "q4", "level": "ug"},
+        ]}, headers=AUTH)
+
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["status"] for r in results] == [200, 200, 400, 200, 200]
+    assert [r["collection_used"] for r in results] == [
+        "handbook_pgr", "academic-integrity", None, "handbook_pgr", "handbook_ug"
+    ]
+    assert results[3]["context_used"] == ["handbook: q3"]
+    embed.assert_awaited_once_with(["q1", "q2", "q3", "q4"])
+    calls = {(c.args[1], c.args[2]): c.args[0] for c in retrieve.await_args_list}
+    assert calls == {("handbook", "pgr"): ["q1", "q3"], ("academic-integrity", None): ["q2"], ("handbook", "ug"): ["q4"]}
+    assert mock_chat.await_count == 4
+
+
+def test_ask_batch_reports_generation_errors_per_question(api, mock_batch, mock_chat):
+    mock_chat.side_effect = [_completion("ok"), RuntimeError("boom")]
+
+    with _route("handbook"), patch("app.api.main.BATCH_MAX_CONCURRENCY", 1):
+        resp = api.post("/ask_batch", json={"questions": [
+            {"question": "first", "level": "pgr"},
+            {"question": "second", "level": "pgr"},
+        ]}, headers=AUTH)
+
+    results = resp.json()["results"]
+    assert [r["status"] for r in results] == [200, 500]
+    assert results[0]["answer"] == "ok"
+    assert results[1]["detail"] == "Failed to generate answer from AI model."
+    assert main.get_history(AUTH["Authorization"].split()[1]) == [{"question": "first", "answer": "ok"}]
+
+
+def test_ask_batch_rejects_oversized_batches(api, mock_batch, mock_chat):
+    with patch("app.api.main.BATCH_MAX_QUESTIONS", 2):
+        resp = api.post("/ask_batch", json={"questions": [{"question": "q", "level": "ug"}] * 3}, headers=AUTH)
+
+    assert resp.status_code == 400
+    mock_batch[0].assert_not_awaited()
+
+
+def test_ask_batch_charges_the_rate_limit_per_question(api, mock_batch, mock_chat):
+    batch = {"questions": [{"question": f"q{i}", "level": "pgr"} for i in range(3)]}
+    with _route("handbook"), patch.dict("app.helper.rate_limiter.ENDPOINT_LIMITS", {"/ask_batch": (5, 60.0)}):
+        first = api.post("/ask_batch", json=batch, headers=AUTH)
+        second = api.post("/ask_batch", json=batch, headers=AUTH)
+        too_big = api.post("/ask_batch", json={"questions": batch["questions"] * 2}, headers=AUTH)
+
+    assert first.status_code == 200
+    assert second.status_code == 429 and "Retry-After" in second.headers
+    assert too_big.status_code == 400
+
+
+def test_a_full_batch_fits_the_default_limits_without_draining_other_endpoints(api, mock_batch, mock_search, mock_chat):
+    batch = {"questions": [{"question": f"q{i}", "level": "pgr"} for i in range(main.BATCH_MAX_QUESTIONS)]}
+    with _route("handbook"), patch("app.helper.rate_limiter.MAX_REQUESTS", 1):
+        assert api.post("/ask_batch", json=batch, headers=AUTH).status_code == 200
+        assert api.post("/ask_handbook", json={"question": "q", "level": "pgr"}, headers=AUTH).status_code == 200
+
+
+def test_startup_rejects_a_batch_size_the_rate_limit_can_never_accept(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_QUESTIONS", 500)
+
+    with pytest.raises(RuntimeError, match="BATCH_MAX_QUESTIONS"):
+        main.check_batch_limit()
+
+
+def test_ask_batch_combined_answers_are_dropped_on_reindex(api, mock_batch, mock_chat):
+    batch = {"questions": [{"question": "Plagiarism in my thesis?", "level": "pgr"}]}
+    with _route("handbook", confident=False):
+        api.post("/ask_batch", json=batch, headers=AUTH)
+        ANSWER_CACHE.invalidate("handbook_pgr")
+        resp = api.post("/ask_batch", json=batch, headers=AUTH)
+
+    assert resp.json()["results"][0]["status"] == 200
+    assert mock_chat.await_count == 2
+    assert ANSWER_CACHE.stats()["hits"] == 0
+
+
+def test_requires_bearer_token(api, mock_search, mock_chat):
+    resp = api.post("/ask_academic_integrity", json={"question": "q", "level": "pgr"},
+                    headers={"Authorization": "Bearer wrong"})
+    assert resp.status_code == 401
+
+
+class _FakeStream:
+    def __init__(self, deltas, fail_after=None):
+        self.deltas = deltas
+        self.fail_after = fail_after
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        for i, d in enumerate(self.deltas):
+            if self.fail_after is not None and i == self.fail_after:
+                raise RuntimeError("stream broke")
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content=d))])
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_ask_handbook_stream_sends_context_then_tokens(api, mock_search, mock_chat):
+    mock_chat.return_value = _FakeStream(["The ", "viva ", "is soon."])
+
+    resp = api.post("/ask_handbook/stream", json={"question": "viva?", "level": "pgr"}, headers=AUTH)
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    assert events[0][0] == "context"
+    assert events[0][1]["context_used"] == ["chunk A", "chunk B"]
+    assert events[0][1]["collection_used"] == "handbook_pgr"
+    assert events[0][1]["context_tokens"] > 0
+    assert [e[1]["text"] for e in events if e[0] == "token"] == ["The ", "viva ", "is soon."]
+    assert events[-1] == ("done", {"answer": "The viva is soon."})
+    assert mock_chat.await_args.kwargs["stream"] is True
+    assert get_history("test-token")[-1] == {"question": "viva?", "answer": "The viva is soon."}
+
+
+def test_ask_integrity_stream_reports_generation_error(api, mock_search, mock_chat):
+    mock_chat.return_value = _FakeStream(["partial", "never"], fail_after=1)
+
+    resp = api.post("/ask_academic_integrity/stream", json={"question": "q", "level": "pgr"}, headers=AUTH)
+
+    events = _parse_sse(resp.text)
+    assert events[-1][0] == "error"
+    assert count_history("test-token") == 0
+
+
+def test_stream_404_before_streaming_without_context(api, mock_search, mock_chat):
+    mock_search.return_value = []
+
+    resp = api.post("/ask_academic_integrity/stream", json={"question": "q", "level": "pgr"}, headers=AUTH)
+
+    assert resp.status_code == 404
+
+
+def test_warming_collection_returns_503_while_others_serve(api, mock_search, mock_chat):
+    READINESS.mark_building("handbook_pgr")
+    READINESS.mark_ready("handbook_ug")
+
+    warming = api.post("/ask_handbook", json={"question": "q", "level": "pgr"}, headers=AUTH)
+    ready = api.post("/ask_handbook", json={"question": "q", "level": "ug"}, headers=AUTH)
+
+    assert warming.status_code == 503
+    assert "Retry-After" in warming.headers
+    assert ready.status_code == 200
+
+
+def test_ready_endpoint_tracks_collection_builds(api):
+    READINESS.register("handbook_ug")
+    assert api.get("/ready").status_code == 503
+
+    READINESS.mark_ready("handbook_ug")
+    resp = api.get("/ready")
+
+    assert resp.status_code == 200
+    assert resp.json()["collections"]["handbook_ug"]["state"] == "ready"
+    assert api.get("/health").json()["collections"]["handbook_ug"]["state"] == "ready"
+
+
+def test_lifespan_builds_collections_and_marks_missing_documents(monkeypatch):
+    def load_level(level):
+        if level == "pgt":
+            raise RuntimeError("no such key")
+        return f"{level} text"
+
+    monkeypatch.setattr(main, "load_text_from_s3_for_level", load_level)
+    monkeypatch.setattr(main, "load_text_from_s3", lambda key: "integrity text")
+    monkeypatch.setattr(main, "MODE", "production")
+
+    with patch("app.api.main.index_document") as mock_index:
+        with TestClient(main.app) as client:
+            states = client.get("/health").json()["collections"]
+
+    assert states["handbook_ug"]["state"] == "ready"
+    assert states["handbook_pgt"]["state"] == "unavailable"
+    assert states["academic-integrity"]["state"] == "ready"
+    assert mock_index.call_count == 3
+
+
+def test_warm_startup_serves_before_collections_are_built(monkeypatch):
+    import threading
+    import time
+    release = threading.Event()
+
+    monkeypatch.setattr(main, "load_text_from_s3_for_level", lambda level: release.wait(5) and f"{level} text")
+    monkeypatch.setattr(main, "load_text_from_s3", lambda key: release.wait(5) and "integrity text")
+    monkeypatch.setattr(main, "MODE", "production")
+    monkeypatch.setattr(main, "STARTUP_MODE", "warm")
+
+    with patch("app.api.main.index_document"):
+        with TestClient(main.app) as client:
+            assert client.get("/ready").status_code == 503
+            warming = client.post("/ask_academic_integrity", json={"question": "q", "level": "ug"}, headers=AUTH)
+            assert warming.status_code == 503
+
+            release.set()
+            for _ in range(100):
+                if client.get("/ready").status_code == 200:
+                    break
+                time.sleep(0.02)
+            assert client.get("/ready").status_code == 200
+
+
+def test_router_is_fitted_in_the_background_without_delaying_readiness(monkeypatch, router_fit):
+    import threading
+    release, fitted = threading.Event(), threading.Event()
+    router_fit.side_effect = lambda: (release.wait(5), fitted.set())
+    monkeypatch.setattr(main, "load_text_from_s3_for_level", lambda level: f"{level} text")
+    monkeypatch.setattr(main, "load_text_from_s3", lambda key: "integrity text")
+    monkeypatch.setattr(main, "MODE", "production")
+
+    with patch("app.api.main.index_document"):
+        with TestClient(main.app) as client:
+            assert client.get("/ready").status_code == 200  # fit still blocked
+            release.set()
+            assert fitted.wait(5)
+
+    router_fit.assert_called_once()
+
+
+def test_fit_router_skips_a_router_restored_from_the_snapshot(monkeypatch, router_fit):
+    import asyncio
+    monkeypatch.setattr(main.ROUTER, "_centroids", [[1.0]])
+
+    asyncio.run(main.fit_router())
+
+    router_fit.assert_not_called()
+
+
+def test_lifespan_restores_snapshot_and_builds_only_the_rest(monkeypatch):
+    monkeypatch.setattr(main, "load_text_from_s3_for_level", lambda level: f"{level} text")
+    monkeypatch.setattr(main, "load_text_from_s3", lambda key: "integrity text")
+    monkeypatch.setattr(main, "MODE", "production")
+    monkeypatch.setattr(main, "INDEX_SNAPSHOT", "s3://bucket/index.json.gz")
+
+    restored = ["handbook_ug", "handbook_pgt", "handbook_pgr"]
+    with patch("app.api.main.restore_snapshot", return_value=restored), \
+         patch("app.api.main.index_document") as mock_index:
+        with TestClient(main.app) as client:
+            assert client.get("/ready").status_code == 200
+
+    mock_index.assert_called_once_with("integrity text", doc_type="academic-integrity")
+
+
+def test_metrics_and_server_timing(api, mock_search, mock_chat):
+    resp = api.post("/ask_handbook", json={"question": "When is the viva?", "level": "pgr"}, headers=AUTH)
+
+    assert "chat;dur=" in resp.headers["Server-Timing"]
+    assert "history;dur=" in resp.headers["Server-Timing"]
+
+    body = api.get("/metrics").text
+    assert 'rag_stage_duration_seconds_count{stage="chat"}' in body
+    assert 'rag_request_duration_seconds_count{route="/ask_handbook",status="200"}' in body
+    assert 'rag_cache_hit_ratio{cache="answer"}' in body
@@ -0,0 +1,54 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAIConfig, create_app, fake_embedding
+from benchmarks.run import compare, parse_server_timing, percentile
+
+
+def fake_client():
+    app = create_app(FakeOpenAIConfig(embedding_latency_ms=0, chat_latency_ms=0, stream_token_latency_ms=0,
+                                      answer_words=3))
+    return OpenAI(base_url="http://testserver/v1", api_key="fake", http_client=TestClient(app))
+
+
+def test_fake_embeddings_are_deterministic_and_similar_for_shared_words():
+    a = fake_embedding("submission of thesis")
+    b = fake_embedding("thesis submission deadline")
+    c = fake_embedding("plagiarism penalties")
+
+    assert np.allclose(a, fake_embedding("submission of thesis"))
+    assert float(a @ b) > float(a @ c)
+
+
+def test_openai_client_parses_fake_server_responses():
+    client = fake_client()
+
+    embeddings = client.embeddings.create(model="m", input=["one", "two"])
+    completion = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}])
+    stream = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hi"}], stream=True)
+
+    assert [e.index for e in embeddings.data] == [0, 1]
+    assert len(embeddings.data[0].embedding) == 256
+    assert completion.choices[0].message.content == "word0 word1 word2"
+    assert "".join(c.choices[0].delta.content or "" for c in stream if c.choices) == "word0 word1 word2 "
+
+
+def test_percentile_and_server_timing_parsing():
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+    assert percentile([5, 1, 4, 2, 3], 99) == 5
+    assert percentile([], 95) == 0.0
+    assert parse_server_timing("embed;dur=12.5, chat;dur=500, total;dur=520.1") == {
+        "embed": 12.5, "chat": 500.0, "total": 520.1
+    }
+
+
+def test_compare_reports_relative_change():
+    result = {"endpoints": {"/ask": {"latency_ms": {"p50": 110, "p95": 200}, "rps": 50}}}
+    baseline = {"commit": "abc123", "endpoints": {"/ask": {"latency_ms": {"p50": 100, "p95": 200}, "rps": 40}}}
+
+    lines = compare(result, baseline)
+
+    assert lines[0] == "Compared with abc123:"
+    assert "  /ask p50: 100 -> 110 (+10.0%)" in lines
+    assert "  /ask rps: 40 -> 50 (+25.0%)" in lines
@@ -0,0 +1,36 @@
+from app.helper.bm25 import BM25Index, tokenize, reciprocal_rank_fusion
+
+
+def test_tokenize_lowercases_and_drops_stopwords():
+    assert tokenize("What is the Viva Voce?") == ["viva", "voce"]
+
+
+def test_bm25_ranks_exact_term_matches_first():
+    index = BM25Index.build(
+        ["a", "b", "c"],
+        [
+            "The thesis must be submitted to the Student Registry.",
+            "The MPhil degree is examined by viva voce.",
+            "Registration periods for the PhD and MPhil.",
+        ],
+    )
+
+    results = index.search("viva voce for MPhil", top_k=3)
+
+    assert [r[0] for r in results][:1] == ["b"]
+    assert all(score > 0 for _, _, score in results)
+    assert "a" not in [r[0] for r in results]
+
+
+def test_bm25_roundtrip():
+    index = BM25Index.build(["a", "b"], ["schedule of work", "standing academic committee"])
+
+    restored = BM25Index.from_dict(index.to_dict())
+
+    assert restored.search("committee") == index.search("committee")
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "z", "w"]])
+    assert fused[0] == "y"
+    assert set(fused) == {"x", "y", "z", "w"}
@@ -0,0 +1,77 @@
+import os
+
+from app.helper.chunker import chunk_document
+from app.helper.tokens import count_tokens
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+SAMPLE = """MARP 2025-26
+Postgraduate Research Regulations
+PR 2 PHD REGULATIONS
+PR 2.1 CRITERIA FOR THE AWARD
+PR 2.1.1 The degree shall be awarded on the examination of a thesis embodying the results of a
+candidate's research, and on an oral examination.
+PR 2.1.2 A successful candidate shall show convincing evidence of the capacity to pursue
+scholarly research.
+Version 1.1 3
+MARP 2025-26
+Postgraduate Research Regulations
+PR 2.2 REGISTRATION PERIOD
+PR 2.2.1 For full-time students the minimum period of registration shall normally be thirty-six
+calendar months.
+(a) an ability to conceptualise a project;
+(b) a systematic acquisition of knowledge.
+Version 1.1 4
+MARP 2025-26
+Postgraduate Research Regulations
+MARP 2025-26
+Postgraduate Research Regulations
+MARP 2025-26
+Postgraduate Research Regulations
+"""
+
+
+def test_chunks_follow_sections_and_record_metadata():
+    chunks = chunk_document(SAMPLE, max_tokens=200)
+
+    assert [c["metadata"]["section"] for c in chunks] == ["PR 2.1 CRITERIA FOR THE AWARD", "PR 2.2 REGISTRATION PERIOD"]
+    first, second = chunks
+    assert first["text"].startswith("PR 2 PHD REGULATIONS\nPR 2.1 CRITERIA FOR THE AWARD\nPR 2.1.1")
+    # wrapped lines are re-joined, running headers and footers dropped
+    assert "results of a candidate's research" in first["text"]
+    assert "MARP" not in first["text"] and "Version 1.1" not in first["text"]
+    assert first["metadata"]["page_start"] == 3
+    assert second["metadata"]["page_start"] == 4
+    assert "\n(a) an ability" in second["text"]
+
+
+def test_metadata_offsets_point_into_the_source():
+    for chunk in chunk_document(SAMPLE, max_tokens=200):
+        meta = chunk["metadata"]
+        span = SAMPLE[meta["start_char"]:meta["end_char"]]
+        assert span.startswith(chunk["text"][:20])
+
+
+def test_long_clauses_are_split_on_sentences_with_overlap():
+    sentences = [f"Sentence {i} explains one more rule about the thesis." for i in range(60)]
+    text = "PR 9 LONG SECTION\nPR 9.1 " + " ".join(sentences)
+
+    chunks = chunk_document(text, max_tokens=80, overlap_tokens=20)
+
+    assert len(chunks) > 3
+    assert all(count_tokens(c["text"]) <= 80 for c in chunks)
+    # every piece ends on a sentence boundary and adjacent pieces share a sentence
+    assert all(c["text"].endswith(".") for c in chunks)
+    tail = chunks[1]["text"].split(". ")[-1]
+    assert tail in chunks[2]["text"]
+
+
+def test_real_handbook_chunks_stay_within_budget():
+    with open(os.path.join(BASE_DIR, "data/extracted/handbook-PGR.txt"), encoding="utf-8") as f:
+        text = f.read()
+
+    chunks = chunk_document(text, max_tokens=300)
+
+    assert all(count_tokens(c["text"]) <= 300 for c in chunks)
+    assert any(c["metadata"].get("section") == "PR 2.8 EXAMINATION" for c in chunks)
+    assert all("page_start" in c["metadata"] for c in chunks)
@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+from app.helper.context_builder import build_context, merge_chunks
+from app.helper.tokens import count_tokens
+
+DOC = " ".join(f"Sentence number {i} of the regulations." for i in range(200))
+
+
+def windows(text, size, overlap):
+    return [text[i:i + size] for i in range(0, len(text), size - overlap)]
+
+
+def test_merge_stitches_overlapping_adjacent_chunks():
+    chunks = windows(DOC, 600, 150)[:3]
+
+    merged = merge_chunks(chunks)
+
+    assert len(merged) == 1
+    assert merged[0] == DOC[:len(merged[0])].strip()
+
+
+def test_merge_stitches_out_of_order_chunks_at_best_rank():
+    a, b, c = windows(DOC, 600, 150)[:3]
+    unrelated = "Completely different text about tuition fees and funding " * 2
+
+    merged = merge_chunks([c, unrelated, a, b])
+
+    assert len(merged) == 2
+    assert merged[1] == unrelated.strip()
+    assert merged[0].startswith(a[:50]) and merged[0].endswith(c.strip()[-50:])
+
+
+def test_merge_drops_duplicates_and_contained_chunks():
+    big = DOC[:800]
+    merged = merge_chunks([DOC[100:300], big, big, DOC[200:250]])
+    assert merged == [big]
+
+
+def test_non_overlapping_chunks_are_kept_in_order():
+    assert merge_chunks(["first chunk", "second chunk"]) == ["first chunk", "second chunk"]
+
+
+def test_build_context_respects_token_budget():
+    chunks = [DOC[i:i + 2000] for i in range(0, 8000, 2000)]  # disjoint chunks
+
+    context, tokens = build_context(chunks, token_budget=700)
+
+    assert tokens <= 700
+    assert tokens == count_tokens(context)
+    assert context.startswith(chunks[0])
+
+
+def test_build_context_reports_tokens_for_overlapping_top_k():
+    chunks = windows(DOC, 2000, 300)[:5]
+    naive_tokens = count_tokens("\n".join(chunks))
+
+    _, tokens = build_context(chunks, token_budget=100_000)
+
+    assert tokens < naive_tokens
+
+
+@patch("app.helper.context_builder.MIN_TAIL_TOKENS", 1000)
+def test_build_context_skips_tiny_tails():
+    context, _ = build_context(["a " * 400, "b " * 400], token_budget=150)
+    assert context == ""
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.helper.embedding_batcher import EmbeddingBatcher
+from app.helper.metrics import EMBED_BATCH_SIZE
+
+
+def vector(text):
+    return [float(len(text)), float(sum(map(ord, text)))]
+
+
+class Recorder:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self.lock = threading.Lock()
+
+    def embed(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        if self.error:
+            raise self.error
+        return [vector(t) for t in texts]
+
+    async def aembed(self, texts):
+        await asyncio.sleep(0)
+        return self.embed(texts)
+
+
+def make(recorder, **kwargs):
+    return EmbeddingBatcher(recorder.embed, recorder.aembed, **kwargs)
+
+
+def test_concurrent_async_queries_share_one_call():
+    recorder = Recorder()
+    batcher = make(recorder, window_ms=20, max_batch_size=64)
+    texts = [f"question {i}" for i in range(20)] + ["question 3"]
+
+    async def run():
+        return await asyncio.gather(*(batcher.aembed(t) for t in texts))
+
+    results = asyncio.run(run())
+
+    assert results == [vector(t) for t in texts]
+    assert len(recorder.calls) == 1
+    assert len(recorder.calls[0]) == 20  # the duplicate is embedded once
+    assert batcher.stats()["requests"] == 21
+
+
+def test_full_batches_are_sent_without_waiting_for_the_window():
+    recorder = Recorder()
+    batcher = make(recorder, window_ms=10_000, max_batch_size=4)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.aembed(f"q{i}") for i in range(8))), timeout=2)
+
+    asyncio.run(run())
+
+    assert [len(c) for c in recorder.calls] == [4, 4]
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    recorder = Recorder(error=RuntimeError("rate limited"))
+    batcher = make(recorder, window_ms=5)
+
+    async def run():
+        return await asyncio.gather(batcher.aembed("a"), batcher.aembed("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(recorder.calls) == 1
+
+
+def test_cancelled_batch_fails_every_waiter_instead_of_hanging():
+    async def run():
+        called = asyncio.Event()
+
+        async def never_returns(texts):
+            called.set()
+            await asyncio.Event().wait()
+
+        batcher = EmbeddingBatcher(lambda texts: [], never_returns, window_ms=1)
+        waiters = [asyncio.create_task(batcher.aembed(t)) for t in ("a", "b")]
+        await called.wait()
+        flush = [t for t in asyncio.all_tasks() if t.get_coro().__name__ == "_arun"]
+        assert len(flush) == 1
+        flush[0].cancel()
+        return await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), timeout=2)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_threads_are_batched_too():
+    recorder = Recorder()
+    batcher = make(recorder, window_ms=100, max_batch_size=8)
+    barrier = threading.Barrier(8)
+
+    def call(i):
+        barrier.wait()
+        return batcher.embed(f"thread {i}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(call, range(8)))
+
+    assert results == [vector(f"thread {i}") for i in range(8)]
+    assert len(recorder.calls) == 1
+
+
+def test_zero_window_disables_batching():
+    recorder = Recorder()
+    batcher = make(recorder, window_ms=0)
+
+    assert batcher.embed("a") == vector("a")
+    assert asyncio.run(batcher.aembed("b")) == vector("b")
+    assert recorder.calls == [["a"], ["b"]]
+    assert batcher.stats()["batches"] == 0
+
+
+def test_batch_sizes_are_recorded():
+    EMBED_BATCH_SIZE.reset()
+    batcher = make(Recorder(), window_ms=5)
+
+    async def run():
+        await asyncio.gather(batcher.aembed("x"), batcher.aembed("y"), batcher.aembed("z"))
+
+    asyncio.run(run())
+
+    assert EMBED_BATCH_SIZE.count() == 1
+    assert "rag_query_embedding_batch_size_sum 3.0" in "\n".join(EMBED_BATCH_SIZE.render())
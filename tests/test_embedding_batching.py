@@ -0,0 +1,92 @@
+import os
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+import threading
+from unittest.mock import patch, MagicMock
+
+import httpx
+import pytest
+from openai import RateLimitError, BadRequestError
+
+from app.helper import rag_engine
+from app.helper.rag_engine import split_into_batches, _embed_uncached
+
+
+def _fake_response(texts):
+    # deterministic embedding: [len(text)], returned in reverse order to check re-sorting
+    data = [MagicMock(embedding=[float(len(t))], index=i) for i, t in enumerate(texts)]
+    return MagicMock(data=list(reversed(data)))
+
+
+def _api_error(cls, status):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(status, request=request)
+    return cls("boom", response=response, body=None)
+
+
+def test_split_into_batches_respects_token_limit():
+    texts = ["a" * 40] * 5  # 10 tokens each with the character estimate
+
+    with patch("app.helper.rag_engine.count_tokens", side_effect=lambda t: len(t) // 4):
+        batches = split_into_batches(texts, max_tokens=25, max_inputs=100)
+
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert sum(batches, []) == texts
+
+
+def test_split_into_batches_respects_input_limit():
+    batches = split_into_batches(["x"] * 7, max_tokens=10_000, max_inputs=3)
+    assert [len(b) for b in batches] == [3, 3, 1]
+
+
+def test_oversized_text_gets_its_own_batch():
+    with patch("app.helper.rag_engine.count_tokens", side_effect=len):
+        batches = split_into_batches(["aa", "b" * 50, "cc"], max_tokens=10, max_inputs=100)
+    assert batches == [["aa"], ["b" * 50], ["cc"]]
+
+
+@patch("app.helper.rag_engine.client")
+def test_embed_uncached_runs_batches_concurrently_and_keeps_order(mock_client):
+    texts = [f"text-{'x' * i}" for i in range(6)]
+    barrier = threading.Barrier(3, timeout=5)
+
+    def create(model, input):
+        barrier.wait()  # only passes if all three batches are in flight at once
+        return _fake_response(input)
+
+    mock_client.embeddings.create.side_effect = create
+
+    with patch("app.helper.rag_engine.split_into_batches", return_value=[texts[:2], texts[2:4], texts[4:]]):
+        vectors = _embed_uncached(texts)
+
+    assert vectors == [[float(len(t))] for t in texts]
+    assert mock_client.embeddings.create.call_count == 3
+
+
+@patch("app.helper.rag_engine.time.sleep")
+@patch("app.helper.rag_engine.client")
+def test_embed_retries_on_rate_limit(mock_client, mock_sleep):
+    mock_client.embeddings.create.side_effect = [
+        _api_error(RateLimitError, 429),
+        _fake_response(["abc"]),
+    ]
+
+    assert _embed_uncached(["abc"]) == [[3.0]]
+    assert mock_client.embeddings.create.call_count == 2
+    mock_sleep.assert_called_once()
+
+
+@patch("app.helper.rag_engine.time.sleep")
+@patch("app.helper.rag_engine.client")
+def test_embed_does_not_retry_client_errors(mock_client, mock_sleep):
+    mock_client.embeddings.create.side_effect = _api_error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        _embed_uncached(["abc"])
+
+    assert mock_client.embeddings.create.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+def test_sdk_retries_are_disabled_so_embed_max_retries_is_the_real_count():
+    assert rag_engine.client.max_retries == 0
+    assert rag_engine.async_client.max_retries == 0
@@ -0,0 +1,69 @@
+import os
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from app.helper.embedding_cache import EmbeddingCache
+from app.helper.rag_engine import embed_text
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+    yield c
+    c.close()
+
+
+def test_cache_roundtrip_and_counters(cache):
+    cache.put_many("m", ["a", "b"], [[0.5, 1.0], [2.0, 3.0]])
+
+    found = cache.get_many("m", ["a", "x", "b"])
+
+    assert found == {0: [0.5, 1.0], 2: [2.0, 3.0]}
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["entries"] == 2
+
+
+def test_cache_is_keyed_by_model(cache):
+    cache.put_many("model-a", ["a"], [[1.0]])
+
+    assert cache.get_many("model-b", ["a"]) == {}
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    # each 4-dim float32 vector is 16 bytes
+    c = EmbeddingCache(path=str(tmp_path / "c.sqlite3"), max_bytes=40)
+    c.put_many("m", ["old"], [[0.0] * 4])
+    c.put_many("m", ["mid"], [[1.0] * 4])
+    c.get_many("m", ["old"])  # refresh "old"
+    c.put_many("m", ["new"], [[2.0] * 4])
+
+    remaining = c.get_many("m", ["old", "mid", "new"])
+
+    assert 1 not in remaining  # "mid" was least recently used
+    assert c.size_bytes() <= 40
+    assert c.stats()["evictions"] == 1
+    c.close()
+
+
+@patch("app.helper.rag_engine.client")
+def test_embed_text_only_sends_cache_misses(mock_client, cache):
+    cache.put_many("text-embedding-3-small", ["cached"], [[1.0, 1.0]])
+    mock_client.embeddings.create.return_value = MagicMock(
+        data=[MagicMock(embedding=[2.0, 2.0], index=0)]
+    )
+
+    with patch("app.helper.rag_engine.get_embedding_cache", return_value=cache):
+        vectors = embed_text(["cached", "fresh"])
+
+    assert vectors == [[1.0, 1.0], [2.0, 2.0]]
+    mock_client.embeddings.create.assert_called_once()
+    assert mock_client.embeddings.create.call_args.kwargs["input"] == ["fresh"]
+
+    # second call is served entirely from the cache
+    with patch("app.helper.rag_engine.get_embedding_cache", return_value=cache):
+        assert embed_text(["fresh"]) == [[2.0, 2.0]]
+    mock_client.embeddings.create.assert_called_once()
@@ -0,0 +1,88 @@
+import json
+
+from benchmarks.evaluate_retrieval import (
+    ChunkerConfig,
+    first_relevant_rank,
+    get_embedder,
+    is_relevant,
+    main,
+    recommend,
+    run_evaluation,
+)
+
+
+def test_relevance_ignores_whitespace_differences():
+    chunk = "The thesis shall not normally\nexceed  80,000 words, excluding appendices."
+
+    assert is_relevant(chunk, ["shall not normally exceed 80,000 words"])
+    assert not is_relevant(chunk, ["100,000 words"])
+    assert first_relevant_rank(["intro", "other", chunk], ["exceed 80,000"]) == 3
+    assert first_relevant_rank(["intro"], ["exceed 80,000"]) is None
+
+
+def test_recommend_prefers_smallest_context_within_tolerance():
+    rows = [
+        {"recall_at_k": 0.9, "mrr": 0.7, "context_tokens": {"mean": 2000}},
+        {"recall_at_k": 0.9, "mrr": 0.6, "context_tokens": {"mean": 1200}},
+        {"recall_at_k": 0.85, "mrr": 0.6, "context_tokens": {"mean": 600}},
+    ]
+
+    assert recommend(rows)["context_tokens"]["mean"] == 1200
+    assert recommend(rows, tolerance=0.05)["context_tokens"]["mean"] == 600
+    assert recommend([]) is None
+
+
+def write_eval_set(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text(
+        "1. Registration\n\nThe minimum period of registration is thirty-six months.\n\n"
+        "2. Thesis\n\nThe thesis shall not exceed 80,000 words.\n\n"
+        "3. Examiners\n\nA supervisor shall not act as an examiner.\n",
+        encoding="utf-8",
+    )
+    eval_set = {
+        "documents": {"doc": {"path": str(doc)}},
+        "questions": [
+            {"document": "doc", "question": "What is the thesis word limit?", "evidence": ["exceed 80,000 words"]},
+            {"document": "doc", "question": "Can my supervisor examine me?", "evidence": ["act as an examiner"]},
+        ],
+    }
+    path = tmp_path / "eval.json"
+    path.write_text(json.dumps(eval_set), encoding="utf-8")
+    return eval_set, path
+
+
+def test_run_evaluation_reports_metrics_per_configuration(tmp_path):
+    eval_set, _ = write_eval_set(tmp_path)
+
+    rows = run_evaluation(
+        eval_set,
+        [ChunkerConfig("structured", 20, 0), ChunkerConfig("fixed", 80, 0)],
+        ["numpy"],
+        ["vector", "lexical"],
+        [1, 3],
+        get_embedder("fake"),
+    )
+
+    assert len(rows) == 8
+    for row in rows:
+        assert 0.0 <= row["mrr"] <= row["recall_at_k"] <= 1.0
+        assert row["build"]["chunks"] > 1
+        assert row["query_latency_ms"]["p95"] >= row["query_latency_ms"]["p50"]
+    # Vector search returns every chunk at k=3, so the evidence is always found
+    assert all(row["recall_at_k"] == 1.0 for row in rows if row["mode"] == "vector" and row["top_k"] == 3)
+
+
+def test_main_writes_results_and_recommendation(tmp_path):
+    _, eval_path = write_eval_set(tmp_path)
+    output = tmp_path / "results.json"
+
+    main([
+        "--eval-set", str(eval_path), "--embeddings", "fake", "--chunk-tokens", "20", "--fixed",
+        "--modes", "hybrid", "--top-k", "1", "2", "--output", str(output),
+    ])
+
+    results = json.loads(output.read_text(encoding="utf-8"))
+    assert results["questions"] == 2
+    assert len(results["results"]) == 2
+    assert results["recommended"]["mode"] == "hybrid"
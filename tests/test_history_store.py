@@ -1,9 +1,16 @@
+import asyncio
+import threading
+
 import pytest
 
 from app.helper.history_store import (
     HISTORY,
     HISTORY_LIMIT,
+    MemoryHistoryStore,
+    SQLiteHistoryStore,
+    aadd_history,
     add_history,
+    aget_history,
     get_history,
 )
 
@@ -71,3 +78,104 @@ def test_history_respects_limit():
 
     expected_questions = [f"Q{i}" for i in range(5, limit + 5)]
     assert [h["question"] for h in history] == expected_questions
+
+
+def test_get_history_pages_back_from_the_newest_entry():
+    for i in range(6):
+        add_history("pager", f"Q{i}", f"A{i}")
+
+    assert [h["question"] for h in get_history("pager", limit=2)] == ["Q4", "Q5"]
+    assert [h["question"] for h in get_history("pager", limit=2, offset=2)] == ["Q2", "Q3"]
+    assert [h["question"] for h in get_history("pager", limit=4, offset=4)] == ["Q0", "Q1"]
+    assert get_history("pager", limit=2, offset=10) == []
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        if request.param == "memory":
+            store = MemoryHistoryStore(**kwargs)
+        else:
+            store = SQLiteHistoryStore(path=str(tmp_path / "history.sqlite3"), **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        if hasattr(store, "close"):
+            store.close()
+
+
+def test_store_keeps_the_newest_entries_per_token(make_store):
+    store = make_store(limit=3)
+    for i in range(5):
+        store.add("t", f"Q{i}", f"A{i}")
+
+    assert [h["question"] for h in store.get("t")] == ["Q2", "Q3", "Q4"]
+    assert store.count("t") == 3
+
+
+def test_store_evicts_least_recently_active_tokens(make_store, monkeypatch):
+    monkeypatch.setattr("app.helper.history_store._PRUNE_EVERY", 1)
+    store = make_store(max_tokens=2)
+    store.add("a", "Q", "A")
+    store.add("b", "Q", "A")
+    store.add("a", "Q2", "A2")
+    store.add("c", "Q", "A")
+
+    assert store.get("b") == []
+    assert store.count("a") == 2
+    assert store.stats()["tokens"] == 2
+    assert store.stats()["evictions"] == 1
+
+
+def test_store_expires_idle_tokens(make_store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.helper.history_store.time.time", lambda: now[0])
+    store = make_store(idle_ttl_seconds=60)
+    store.add("t", "old", "A")
+
+    now[0] += 61
+    assert store.get("t") == []
+    store.add("t", "new", "A")
+    assert [h["question"] for h in store.get("t")] == ["new"]
+
+
+def test_sqlite_history_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    worker_a = SQLiteHistoryStore(path=path)
+    worker_b = SQLiteHistoryStore(path=path)
+
+    worker_a.add("token", "Q", "A")
+
+    assert worker_b.get("token") == [{"question": "Q", "answer": "A"}]
+    raw = worker_b._conn.execute("SELECT token FROM history").fetchone()[0]
+    assert raw != "token"  # bearer tokens are not stored in clear
+    worker_a.close()
+    worker_b.close()
+
+
+def test_async_helpers_keep_sqlite_writes_off_the_event_loop(monkeypatch, tmp_path):
+    threads = []
+
+    class RecordingStore(SQLiteHistoryStore):
+        def add(self, *args):
+            threads.append(threading.current_thread())
+            super().add(*args)
+
+        def get(self, *args):
+            threads.append(threading.current_thread())
+            return super().get(*args)
+
+    store = RecordingStore(path=str(tmp_path / "history.sqlite3"))
+    monkeypatch.setattr("app.helper.history_store.HISTORY", store)
+
+    async def run():
+        await aadd_history("t", "Q", "A")
+        return await aget_history("t", 5)
+
+    assert asyncio.run(run()) == [{"question": "Q", "answer": "A"}]
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    store.close()
@@ -0,0 +1,145 @@
+import os
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+from unittest.mock import patch
+
+import pytest
+
+from app.helper import rag_engine, bm25
+from app.helper.rag_engine import index_document, chunk_id
+
+
+class FakeCollection:
+    """Minimal in-memory stand-in for a Chroma collection."""
+
+    def __init__(self):
+        self.docs = {}
+        self.metadatas = {}
+
+    def get(self, include=None, ids=None):
+        return {"ids": list(self.docs)}
+
+    def upsert(self, ids, documents, embeddings, metadatas=None):
+        self.docs.update(zip(ids, documents))
+        self.metadatas.update(zip(ids, metadatas or [None] * len(ids)))
+
+    def update(self, ids, metadatas):
+        self.metadatas.update(zip(ids, metadatas))
+
+    def delete(self, ids):
+        for i in ids:
+            self.docs.pop(i, None)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_engine, "MANIFEST_DIR", str(tmp_path))
+    monkeypatch.setattr(bm25, "BM25_DIR", str(tmp_path / "bm25"))
+    col = FakeCollection()
+    embedded = []
+
+    def fake_embed(texts):
+        embedded.append(list(texts))
+        return [[0.0] for _ in texts]
+
+    with patch("app.helper.rag_engine.get_or_create_collection", return_value=col), \
+         patch("app.helper.rag_engine.embed_text", side_effect=fake_embed), \
+         patch("app.helper.rag_engine.chunk_with_metadata",
+               side_effect=lambda text: [(c, None) for c in text.split("|")]):
+        yield col, embedded
+
+
+def test_first_index_embeds_everything(env):
+    col, embedded = env
+
+    report = index_document("a|b|c", doc_type="handbook", level="ug")
+
+    assert report == {"collection": "handbook_ug", "added": 3, "removed": 0, "unchanged": 0, "total": 3}
+    assert sorted(col.docs.values()) == ["a", "b", "c"]
+    assert embedded == [["a", "b", "c"]]
+
+
+def test_reindex_only_embeds_changed_chunks(env):
+    col, embedded = env
+    index_document("a|b|c", doc_type="handbook", level="ug")
+    embedded.clear()
+
+    report = index_document("a|B|c|d", doc_type="handbook", level="ug")
+
+    assert report["added"] == 2
+    assert report["removed"] == 1
+    assert report["unchanged"] == 2
+    assert embedded == [["B", "d"]]
+    assert sorted(col.docs.values()) == ["B", "a", "c", "d"]
+
+
+def test_unchanged_document_makes_no_embedding_calls(env):
+    col, embedded = env
+    index_document("a|b", doc_type="academic-integrity")
+    embedded.clear()
+
+    report = index_document("a|b", doc_type="academic-integrity")
+
+    assert report["added"] == 0 and report["removed"] == 0
+    assert embedded == []
+
+
+def test_shrinking_document_removes_stale_chunks(env):
+    col, _ = env
+    index_document("a|b|c", doc_type="handbook", level="pgr")
+
+    index_document("a", doc_type="handbook", level="pgr")
+
+    assert list(col.docs) == [chunk_id("handbook", "a")]
+
+
+def test_model_change_reembeds_all_chunks(env, monkeypatch):
+    col, embedded = env
+    index_document("a|b", doc_type="handbook", level="ug")
+    embedded.clear()
+
+    monkeypatch.setattr(rag_engine, "EMBEDDING_MODEL", "other-model")
+    report = index_document("a|b", doc_type="handbook", level="ug")
+
+    assert report["added"] == 2
+    assert embedded == [["a", "b"]]
+
+
+def test_chunk_id_is_content_addressed():
+    assert chunk_id("handbook", "same text") == chunk_id("handbook", "same text")
+    assert chunk_id("handbook", "same text") != chunk_id("handbook", "other text")
+
+
+def test_reindex_with_changes_invalidates_answer_cache(env):
+    with patch("app.helper.rag_engine.ANSWER_CACHE") as mock_cache:
+        index_document("a|b", doc_type="handbook", level="ug")
+        mock_cache.invalidate.assert_called_once_with("handbook_ug")
+
+        mock_cache.reset_mock()
+        index_document("a|b", doc_type="handbook", level="ug")
+        mock_cache.invalidate.assert_not_called()
+
+
+def test_index_builds_lexical_index(env):
+    index_document("viva voce examination|plagiarism penalties", doc_type="handbook", level="pgr")
+
+    index = bm25.get_bm25_index("handbook_pgr")
+
+    assert [doc for _, doc, _ in index.search("viva", 5)] == ["viva voce examination"]
+
+
+def test_moved_chunks_only_get_a_metadata_update(env):
+    col, embedded = env
+    pages = {"a": 1, "b": 2}
+
+    def chunk_with_pages(text):
+        return [(c, {"page_start": pages[c]}) for c in text.split("|")]
+
+    with patch("app.helper.rag_engine.chunk_with_metadata", side_effect=chunk_with_pages):
+        index_document("a|b", doc_type="handbook", level="ug")
+        embedded.clear()
+        pages["b"] = 3
+        report = index_document("a|b", doc_type="handbook", level="ug")
+
+    assert report["added"] == 0
+    assert embedded == []
+    assert col.metadatas[chunk_id("handbook", "b")] == {"page_start": 3}
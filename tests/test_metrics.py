@@ -0,0 +1,65 @@
+import asyncio
+
+from app.helper import metrics
+from app.helper.metrics import Counter, Histogram, server_timing_header
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("latency_seconds", "Latency.", labels=("stage",), buckets=(0.1, 1.0))
+    h.observe(0.05, stage="embed")
+    h.observe(0.5, stage="embed")
+    h.observe(5.0, stage="embed")
+
+    lines = h.render()
+
+    assert 'latency_seconds_bucket{stage="embed",le="0.1"} 1.0' in lines
+    assert 'latency_seconds_bucket{stage="embed",le="1.0"} 2.0' in lines
+    assert 'latency_seconds_bucket{stage="embed",le="+Inf"} 3.0' in lines
+    assert 'latency_seconds_count{stage="embed"} 3.0' in lines
+    assert h.count(stage="embed") == 3
+
+
+def test_counter_accumulates_per_label():
+    c = Counter("tokens_total", "Tokens.", labels=("kind",))
+    c.inc(10, kind="prompt")
+    c.inc(5, kind="prompt")
+
+    assert c.value(kind="prompt") == 15
+    assert 'tokens_total{kind="prompt"} 15.0' in c.render()
+
+
+def test_timed_records_sync_and_async_stages_for_the_request():
+    @metrics.timed("unit_sync")
+    def work():
+        return 1
+
+    @metrics.timed("unit_async")
+    async def awork():
+        return 2
+
+    token = metrics.start_request_timing()
+    assert work() == 1
+    assert asyncio.run(awork()) == 2
+    timings = metrics.finish_request_timing(token)
+
+    assert [name for name, _ in timings] == ["unit_sync", "unit_async"]
+    assert metrics.STAGE_SECONDS.count(stage="unit_sync") >= 1
+
+
+def test_disabled_metrics_are_a_no_op(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+
+    def work():
+        return 1
+
+    assert metrics.timed("off")(work) is work
+    assert metrics.stage("off") is metrics._NOOP
+    with metrics.stage("off"):
+        pass
+    assert metrics.STAGE_SECONDS.count(stage="off") == 0
+
+
+def test_server_timing_header_sums_repeated_stages():
+    header = server_timing_header([("embed", 0.010), ("chat", 0.5), ("embed", 0.005)], total=0.6)
+
+    assert header == "embed;dur=15.0, chat;dur=500.0, total;dur=600.0"
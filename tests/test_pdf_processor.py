@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.helper import pdf_processor
+from app.helper.pdf_processor import extract_pdf_text, page_digests, process_all_handbooks
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import LIT
+
+
+@pytest.fixture(autouse=True)
+def isolated_page_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_processor, "PAGE_CACHE_DIR", str(tmp_path / "pages"))
+
+
+def fake_extract(pdf_path, page_indexes):
+    return [(i, f"  Page {i} text  \n\n") for i in page_indexes]
+
+
+@patch("app.helper.pdf_processor.page_digests", return_value=["d0", "d1", "d2"])
+@patch("app.helper.pdf_processor._extract_page_range", side_effect=fake_extract)
+def test_pages_are_reassembled_in_order_and_cached(mock_extract, mock_digests):
+    first = extract_pdf_text("doc.pdf", max_workers=1)
+
+    assert first == "Page 0 text\nPage 1 text\nPage 2 text"
+    mock_extract.assert_called_once_with("doc.pdf", [0, 1, 2])
+
+    mock_extract.reset_mock()
+    second = extract_pdf_text("doc.pdf", max_workers=1)
+
+    assert second == first
+    mock_extract.assert_not_called()
+
+
+@patch("app.helper.pdf_processor._extract_page_range", side_effect=fake_extract)
+def test_only_changed_pages_are_re_extracted(mock_extract):
+    with patch("app.helper.pdf_processor.page_digests", return_value=["d0", "d1", "d2"]):
+        extract_pdf_text("doc.pdf", max_workers=1)
+
+    mock_extract.reset_mock()
+    with patch("app.helper.pdf_processor.page_digests", return_value=["d0", "changed", "d2"]):
+        extract_pdf_text("doc.pdf", max_workers=1)
+
+    mock_extract.assert_called_once_with("doc.pdf", [1])
+
+
+class FakeDoc:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def getobj(self, objid):
+        return self.objects[objid]
+
+
+def fake_pdf(*forms):
+    """One page per form XObject; every page's content stream is just "/Fx0 Do"."""
+    doc = FakeDoc({i + 10: PDFStream({"Subtype": LIT("Form")}, body) for i, body in enumerate(forms)})
+    pages = [
+        SimpleNamespace(page_obj=SimpleNamespace(
+            mediabox=[0, 0, 612, 792],
+            contents=[PDFStream({}, b"/Fx0 Do")],
+            resources={"XObject": {"Fx0": PDFObjRef(doc, i + 10)}, "Font": {"F1": LIT("Helvetica")}},
+        ))
+        for i in range(len(forms))
+    ]
+    pdf = MagicMock(pages=pages)
+    pdf.__enter__.return_value = pdf
+    return pdf
+
+
+def test_page_digests_include_the_resources_a_page_draws():
+    with patch("app.helper.pdf_processor.pdfplumber.open", return_value=fake_pdf(b"(A) Tj", b"(B) Tj", b"(A) Tj")):
+        first, second, same_as_first = page_digests("doc.pdf")
+
+    assert first != second  # identical streams, different form XObjects
+    assert first == same_as_first
+
+
+def test_split_evenly_keeps_contiguous_ranges():
+    assert pdf_processor._split_evenly([0, 1, 2, 3, 4], 2) == [[0, 1, 2], [3, 4]]
+    assert pdf_processor._split_evenly([7], 4) == [[7]]
+
+
+@patch("app.helper.pdf_processor.process_and_upload_pdf_for_level")
+def test_process_all_handbooks_runs_every_level(mock_process):
+    mock_process.side_effect = lambda pdf_path, local_text_path, level: f"text-{level}"
+
+    results = process_all_handbooks(["ug", "pgr"])
+
+    assert results == {"UG": "text-UG", "PGR": "text-PGR"}
+    assert mock_process.call_count == 2
+
+
+@patch("app.helper.pdf_processor.process_and_upload_pdf_for_level", side_effect=RuntimeError("boom"))
+def test_process_all_handbooks_surfaces_errors(mock_process):
+    with pytest.raises(RuntimeError):
+        process_all_handbooks("pgr")
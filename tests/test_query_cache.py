@@ -0,0 +1,51 @@
+import threading
+
+from app.helper.query_cache import LRUCache, normalise_query
+
+
+def test_normalise_query():
+    assert normalise_query("  When is\tthe VIVA? ") == "when is the viva?"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_stats():
+    cache = LRUCache(max_size=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["size"] == 1
+
+
+def test_lru_is_safe_under_concurrent_access():
+    cache = LRUCache(max_size=50)
+
+    def worker(n):
+        for i in range(500):
+            cache.put((n, i % 80), i)
+            cache.get((n, (i * 7) % 80))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(cache) == 50
+    assert cache.hits + cache.misses == 8 * 500
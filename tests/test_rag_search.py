@@ -1,7 +1,19 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
-from app.helper.rag_engine import search_similar_chunks
+from app.helper.rag_engine import (
+    search_similar_chunks, asearch_similar_chunks, retrieve_chunks_batch, aembed_queries_for_search,
+)
+from app.helper import bm25
+from app.helper.bm25 import BM25Index
+from app.helper.query_cache import QUERY_EMBEDDING_CACHE
+
+
+@pytest.fixture(autouse=True)
+def isolated_indexes(tmp_path, monkeypatch):
+    QUERY_EMBEDDING_CACHE.clear()
+    monkeypatch.setattr(bm25, "BM25_DIR", str(tmp_path))
 
 @patch("app.helper.rag_engine.embed_text")
 @patch("app.helper.rag_engine.get_or_create_collection")
@@ -67,3 +79,114 @@ def test_search_calls_collection_with_correct_level(mock_get_collection, mock_em
 
     # Ensure correct call based on doc_type + level
     mock_get_collection.assert_called_with("handbook", "pgt")
+
+
+@patch("app.helper.rag_engine.aembed_text", new_callable=AsyncMock)
+@patch("app.helper.rag_engine.get_or_create_collection")
+def test_asearch_similar_chunks(mock_get_collection, mock_aembed):
+    mock_aembed.return_value = [[0.1, 0.2, 0.3]]
+
+    mock_collection = MagicMock()
+    mock_collection.query.return_value = {"documents": [["chunk A"]]}
+    mock_get_collection.return_value = mock_collection
+
+    chunks = asyncio.run(asearch_similar_chunks("hello", "handbook", "pgr", top_k=1))
+
+    assert chunks == ["chunk A"]
+    mock_aembed.assert_awaited_once_with(["hello"])
+    mock_collection.query.assert_called_once_with(query_embeddings=[[0.1, 0.2, 0.3]], n_results=1)
+
+
+@patch("app.helper.rag_engine.embed_text")
+@patch("app.helper.rag_engine.get_or_create_collection")
+def test_repeated_query_reuses_cached_embedding(mock_get_collection, mock_embed):
+    mock_embed.return_value = [[0.1, 0.2, 0.3]]
+    mock_collection = MagicMock()
+    mock_collection.query.return_value = {"documents": [["chunk"]]}
+    mock_get_collection.return_value = mock_collection
+
+    search_similar_chunks("When is the viva?", "handbook", "pgr")
+    search_similar_chunks("  when is the   VIVA? ", "handbook", "pgr")
+
+    mock_embed.assert_called_once()
+    assert mock_collection.query.call_count == 2
+    assert QUERY_EMBEDDING_CACHE.stats()["hits"] == 1
+
+
+@patch("app.helper.rag_engine.embed_text")
+@patch("app.helper.rag_engine.get_or_create_collection")
+def test_hybrid_search_fuses_vector_and_lexical_results(mock_get_collection, mock_embed):
+    docs = ["general rules", "viva voce arrangements", "fees and funding"]
+    bm25.save_bm25_index("handbook_pgr", BM25Index.build(["a", "b", "c"], docs))
+    mock_embed.return_value = [[0.1, 0.2, 0.3]]
+    mock_collection = MagicMock()
+    # vector search ranks the exact-term chunk low
+    mock_collection.query.return_value = {"documents": [["general rules", "fees and funding", "viva voce arrangements"]]}
+    mock_get_collection.return_value = mock_collection
+
+    chunks = search_similar_chunks("When is my viva voce?", "handbook", "pgr", top_k=2)
+
+    assert chunks[0] == "viva voce arrangements"
+    assert len(chunks) == 2
+
+
+@patch("app.helper.rag_engine.RETRIEVAL_MODE", "lexical")
+@patch("app.helper.rag_engine.embed_text")
+@patch("app.helper.rag_engine.get_or_create_collection")
+def test_lexical_mode_makes_no_embedding_call(mock_get_collection, mock_embed):
+    bm25.save_bm25_index("academic-integrity", BM25Index.build(["a", "b"], ["plagiarism penalties", "proofreading policy"]))
+
+    chunks = search_similar_chunks("What are the plagiarism penalties?", "academic-integrity", top_k=1)
+
+    assert chunks == ["plagiarism penalties"]
+    mock_embed.assert_not_called()
+    mock_get_collection.assert_not_called()
+
+
+@patch("app.helper.rag_engine.embed_text", side_effect=RuntimeError("embeddings API down"))
+@patch("app.helper.rag_engine.get_or_create_collection")
+def test_falls_back_to_lexical_when_embedding_fails(mock_get_collection, mock_embed):
+    bm25.save_bm25_index("handbook_pgr", BM25Index.build(["a"], ["Standing Academic Committee"]))
+
+    chunks = search_similar_chunks("Standing Academic Committee", "handbook", "pgr")
+
+    assert chunks == ["Standing Academic Committee"]
+    mock_get_collection.assert_not_called()
+
+
+@patch("app.helper.rag_engine.embed_text", side_effect=RuntimeError("embeddings API down"))
+def test_embedding_failure_without_lexical_index_raises(mock_embed):
+    with pytest.raises(RuntimeError):
+        search_similar_chunks("anything", "handbook", "ug")
+
+
+@patch("app.helper.rag_engine.get_or_create_collection")
+def test_batch_retrieval_makes_one_vector_query_per_collection(mock_get_collection):
+    bm25.save_bm25_index("handbook_pgr", BM25Index.build(["a"], ["thesis word limit"]))
+    mock_collection = MagicMock()
+    mock_collection.query.return_value = {"documents": [["chunk 1"], ["chunk 2"]]}
+    mock_get_collection.return_value = mock_collection
+
+    results = retrieve_chunks_batch(
+        ["q1", "thesis word limit", "q2"], "handbook", "pgr", [[0.1, 0.2], None, [0.3, 0.4]], top_k=1
+    )
+
+    assert results == [["chunk 1"], ["thesis word limit"], ["chunk 2"]]
+    mock_collection.query.assert_called_once()
+    assert mock_collection.query.call_args.kwargs["query_embeddings"] == [[0.1, 0.2], [0.3, 0.4]]
+
+
+@patch("app.helper.rag_engine.aembed_text", new_callable=AsyncMock)
+def test_batch_query_embedding_reuses_cache_and_embeds_misses_together(mock_aembed):
+    mock_aembed.return_value = [[1.0], [2.0]]
+    QUERY_EMBEDDING_CACHE.put(("text-embedding-3-small", "cached question"), [9.0])
+
+    embeddings = asyncio.run(aembed_queries_for_search(["Cached question", "new one", "other", "new one"]))
+
+    assert embeddings == [[9.0], [1.0], [2.0], [1.0]]
+    mock_aembed.assert_awaited_once_with(["new one", "other"])
+
+
+@patch("app.helper.rag_engine.aembed_text", new_callable=AsyncMock, side_effect=RuntimeError("down"))
+def test_batch_query_embedding_failure_falls_back_to_lexical(mock_aembed):
+    assert asyncio.run(aembed_queries_for_search(["a", "b"])) == [None, None]
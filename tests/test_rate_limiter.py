@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.helper import rate_limiter
+from app.helper.rate_limiter import (
+    MemoryBucketStore,
+    RedisBucketStore,
+    SQLiteBucketStore,
+    check_rate_limit,
+    parse_limits,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryBucketStore()
+    else:
+        store = SQLiteBucketStore(path=str(tmp_path / "rate_limit.sqlite3"))
+        yield store
+        store.close()
+
+
+def test_bucket_allows_a_burst_then_refills_evenly(store):
+    # 5 requests per 10 seconds: capacity 5, one token every 2 seconds
+    results = [store.acquire("k", 5, 0.5, now=100.0) for _ in range(6)]
+
+    assert [allowed for allowed, _ in results] == [True] * 5 + [False]
+    assert results[-1][1] == pytest.approx(2.0)
+    assert store.acquire("k", 5, 0.5, now=101.0) == (False, pytest.approx(1.0))
+    assert store.acquire("k", 5, 0.5, now=102.0)[0]
+    assert not store.acquire("k", 5, 0.5, now=102.5)[0]
+
+
+def test_no_double_burst_at_window_edges(store):
+    # A fixed window allowed 2x the limit around a window boundary
+    allowed = sum(store.acquire("k", 10, 10 / 60, now=59.0)[0] for _ in range(10))
+    allowed += sum(store.acquire("k", 10, 10 / 60, now=61.0)[0] for _ in range(10))
+
+    assert allowed == 10
+
+
+def test_idle_buckets_are_evicted_once_refilled(store):
+    store.acquire("busy", 2, 1.0, now=0.0)
+    store.acquire("busy", 2, 1.0, now=0.0)
+    store.acquire("quiet", 2, 1.0, now=0.0)
+
+    assert store.evict_idle(now=1.5) == 1  # "quiet" is full again, "busy" is not
+    assert len(store) == 1
+    assert store.evict_idle(now=2.0) == 1
+    assert len(store) == 0
+
+
+def test_sqlite_buckets_are_shared_between_connections(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite3")
+    workers = [SQLiteBucketStore(path=path) for _ in range(4)]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda i: workers[i % 4].acquire("k", 10, 0.001, now=0.0)[0], range(40)))
+
+    assert sum(results) == 10
+    for worker in workers:
+        worker.close()
+
+
+def test_memory_store_is_thread_safe():
+    store = MemoryBucketStore()
+    barrier = threading.Barrier(8)
+
+    def hammer(_):
+        barrier.wait()
+        return sum(store.acquire("k", 100, 0.001, now=0.0)[0] for _ in range(50))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert sum(pool.map(hammer, range(8))) == 100
+
+
+def test_parse_limits():
+    assert parse_limits("/ask_batch=5/60, /ask=30/1.5") == {"/ask_batch": (5, 60.0), "/ask": (30, 1.5)}
+    assert parse_limits("") == {}
+    with pytest.raises(ValueError):
+        parse_limits("/ask=30")
+
+
+def test_endpoints_with_their_own_limit_use_their_own_bucket(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_STORE", MemoryBucketStore())
+    monkeypatch.setattr(rate_limiter, "MAX_REQUESTS", 3)
+    monkeypatch.setattr(rate_limiter, "ENDPOINT_LIMITS", {"/ask_batch": (1, 60.0)})
+
+    check_rate_limit("t", "/ask_batch")
+    with pytest.raises(HTTPException) as exc:
+        check_rate_limit("t", "/ask_batch")
+    assert exc.value.status_code == 429
+    assert exc.value.headers == {"Retry-After": "60"}
+
+    for _ in range(3):
+        check_rate_limit("t", "/ask")
+    with pytest.raises(HTTPException):
+        check_rate_limit("t", "/ask_handbook")  # shares the default bucket with /ask
+    check_rate_limit("other-token", "/ask")
+
+
+def test_async_check_keeps_shared_backends_off_the_event_loop(monkeypatch, tmp_path):
+    threads = []
+
+    class RecordingStore(SQLiteBucketStore):
+        def acquire(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return super().acquire(*args, **kwargs)
+
+    store = RecordingStore(path=str(tmp_path / "rate_limit.sqlite3"))
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_STORE", store)
+    monkeypatch.setattr(rate_limiter, "MAX_REQUESTS", 1)
+
+    async def run():
+        await rate_limiter.acheck_rate_limit("t", "/ask")
+        with pytest.raises(HTTPException):
+            await rate_limiter.acheck_rate_limit("t", "/ask")
+
+    asyncio.run(run())
+    store.close()
+
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+
+class StandInRedis:
+    """Records eval calls and replies like the Lua script would."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def eval(self, script, numkeys, *args):
+        self.calls.append((numkeys, args))
+        return self.reply
+
+
+def test_redis_store_runs_the_bucket_script_atomically_on_the_server():
+    client = StandInRedis([0, b"2.5"])
+    store = RedisBucketStore(client=client)
+
+    assert store.acquire("k", 5, 0.5, now=100.0) == (False, 2.5)
+    assert client.calls == [(1, ("rate_limit:k", "5", "0.5", "1.0", "100.0"))]
+
+
+def test_redis_backend_without_url_stands_in_with_sqlite(monkeypatch, tmp_path):
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_REDIS_URL", "")
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_DB_PATH", str(tmp_path / "rate_limit.sqlite3"))
+
+    store = rate_limiter.create_rate_limit_store("redis")
+
+    assert store.name == "sqlite"
+    store.close()
+
+
+def test_background_eviction_drops_idle_buckets(monkeypatch):
+    store = MemoryBucketStore()
+    store.acquire("k", 1, 1000.0, now=0.0)
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_STORE", store)
+
+    async def run():
+        task = asyncio.create_task(rate_limiter.evict_idle_buckets(interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert len(store) == 0
@@ -0,0 +1,112 @@
+import os
+import time
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+import asyncio
+from unittest.mock import patch
+
+from app.helper.router import CentroidRouter, load_examples, CATEGORIES
+
+EXAMPLES = {
+    "handbook": ["thesis submission deadline", "viva examiners thesis", "registration period thesis"],
+    "academic_integrity": ["plagiarism penalty", "cheating plagiarism collusion", "plagiarism malpractice"],
+    "other": ["campus accommodation rent", "library opening hours", "bus parking campus"],
+}
+VOCAB = sorted({w for qs in EXAMPLES.values() for q in qs for w in q.split()})
+
+
+def embed(texts):
+    """Bag of words over the example vocabulary."""
+    return [[float(w in t.split()) for w in VOCAB] for t in texts]
+
+
+def make_router(**kwargs):
+    embed_calls = []
+
+    def counting_embed(texts):
+        embed_calls.append(len(texts))
+        return embed(texts)
+
+    router = CentroidRouter(examples=EXAMPLES, embed=counting_embed, **kwargs)
+    return router, embed_calls
+
+
+def test_confident_questions_are_routed_by_centroid_without_llm():
+    router, embed_calls = make_router(min_similarity=0.2, min_margin=0.05)
+
+    with patch("app.helper.router.classifer.classify_category") as llm:
+        decision = router.route("When is the thesis deadline?", embed(["thesis deadline"])[0])
+        other = router.route("Where is the library?", embed(["library"])[0])
+
+    assert decision["category"] == "handbook" and decision["source"] == "centroid"
+    assert other["category"] == "other"
+    llm.assert_not_called()
+    assert embed_calls == [9]  # examples embedded once
+
+
+def test_low_confidence_falls_back_to_llm_and_caches_the_decision():
+    router, _ = make_router(min_similarity=0.9, min_margin=0.05)
+
+    with patch("app.helper.router.classifer.classify_category", return_value="academic_integrity") as llm:
+        first = router.route("Something  vague", embed(["thesis plagiarism"])[0])
+        second = router.route("something vague", embed(["thesis plagiarism"])[0])
+
+    assert first["source"] == "llm" and first["category"] == "academic_integrity"
+    assert second["source"] == "cache" and second["category"] == "academic_integrity"
+    llm.assert_called_once_with("Something  vague")
+
+
+def test_llm_failure_or_disabled_fallback_uses_nearest_centroid():
+    router, _ = make_router(min_similarity=0.99)
+    with patch("app.helper.router.classifer.classify_category", side_effect=RuntimeError("down")):
+        assert router.route("q1", embed(["plagiarism"])[0])["category"] == "academic_integrity"
+
+    router, _ = make_router(min_similarity=0.99, llm_fallback=False)
+    with patch("app.helper.router.classifer.classify_category") as llm:
+        assert router.route("q2", embed(["viva"])[0])["source"] == "centroid"
+    llm.assert_not_called()
+
+
+def test_async_route_matches_sync():
+    router, _ = make_router(min_similarity=0.2, min_margin=0.05)
+
+    decision = asyncio.run(router.aroute("Plagiarism?", embed(["plagiarism"])[0]))
+
+    assert decision["category"] == "academic_integrity"
+    assert decision["source"] == "centroid"
+
+
+def test_routing_a_1536_dim_embedding_takes_under_a_millisecond():
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    examples = {c: [f"{c} {i}" for i in range(20)] for c in CATEGORIES}
+    router = CentroidRouter(examples=examples, embed=lambda texts: rng.normal(size=(len(texts), 1536)).tolist(),
+                            llm_fallback=False, cache_size=0)
+    router.fit()
+    queries = rng.normal(size=(200, 1536)).tolist()
+
+    start = time.perf_counter()
+    for i, q in enumerate(queries):
+        router.route(f"question {i}", q)
+    assert (time.perf_counter() - start) / len(queries) < 0.001
+
+
+def test_shipped_examples_cover_every_category():
+    examples = load_examples()
+
+    assert set(examples) == set(CATEGORIES)
+    assert all(len(questions) >= 10 for questions in examples.values())
+
+
+def test_unsure_decisions_are_not_reused_when_the_llm_fallback_is_wanted():
+    router, _ = make_router(min_similarity=0.99)
+
+    with patch("app.helper.router.classifer.classify_category", return_value="handbook") as llm:
+        unsure = router.route("thesis?", embed(["thesis"])[0], llm_fallback=False)
+        again = router.route("thesis?", embed(["thesis"])[0], llm_fallback=False)
+        resolved = router.route("thesis?", embed(["thesis"])[0])
+
+    assert unsure["source"] == "centroid" and not unsure["confident"]
+    assert again["source"] == "cache"
+    assert resolved["source"] == "llm" and resolved["confident"]
+    llm.assert_called_once()
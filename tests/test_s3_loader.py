@@ -0,0 +1,94 @@
+import io
+
+import boto3
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from unittest.mock import patch
+
+from app.helper import s3_loader
+from app.helper.s3_loader import load_text_from_s3
+
+
+def body(text: str) -> StreamingBody:
+    raw = text.encode("utf-8")
+    return StreamingBody(io.BytesIO(raw), len(raw))
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    monkeypatch.setattr(s3_loader, "S3_CACHE_DIR", str(tmp_path))
+    client = boto3.client(
+        "s3", region_name="eu-west-2", aws_access_key_id="test", aws_secret_access_key="test"
+    )
+    monkeypatch.setattr(s3_loader, "_s3_client", client)
+    with Stubber(client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def test_first_load_downloads_and_caches(s3):
+    s3.add_response(
+        "get_object",
+        {"Body": body("handbook v1"), "ETag": '"etag-1"'},
+        {"Bucket": "bucket", "Key": "ug.txt"},
+    )
+
+    assert load_text_from_s3("ug.txt", bucket="bucket") == "handbook v1"
+    assert s3_loader._read_cached("bucket", "ug.txt") == ("handbook v1", '"etag-1"')
+
+
+def test_unchanged_object_is_revalidated_not_downloaded(s3):
+    s3_loader._write_cached("bucket", "ug.txt", "handbook v1", '"etag-1"')
+    s3.add_client_error(
+        "get_object",
+        service_error_code="304",
+        http_status_code=304,
+        expected_params={"Bucket": "bucket", "Key": "ug.txt", "IfNoneMatch": '"etag-1"'},
+    )
+
+    assert load_text_from_s3("ug.txt", bucket="bucket") == "handbook v1"
+
+
+def test_changed_object_replaces_cached_copy(s3):
+    s3_loader._write_cached("bucket", "ug.txt", "handbook v1", '"etag-1"')
+    s3.add_response(
+        "get_object",
+        {"Body": body("handbook v2"), "ETag": '"etag-2"'},
+        {"Bucket": "bucket", "Key": "ug.txt", "IfNoneMatch": '"etag-1"'},
+    )
+
+    assert load_text_from_s3("ug.txt", bucket="bucket") == "handbook v2"
+    assert s3_loader._read_cached("bucket", "ug.txt") == ("handbook v2", '"etag-2"')
+
+
+def test_server_error_falls_back_to_cached_copy(s3):
+    s3_loader._write_cached("bucket", "ug.txt", "handbook v1", '"etag-1"')
+    s3.add_client_error("get_object", service_error_code="ServiceUnavailable", http_status_code=503)
+
+    assert load_text_from_s3("ug.txt", bucket="bucket") == "handbook v1"
+
+
+def test_missing_key_is_not_hidden_by_cache(s3):
+    s3_loader._write_cached("bucket", "ug.txt", "handbook v1", '"etag-1"')
+    s3.add_client_error("get_object", service_error_code="NoSuchKey", http_status_code=404)
+
+    with pytest.raises(RuntimeError):
+        load_text_from_s3("ug.txt", bucket="bucket")
+
+
+def test_unreachable_s3_uses_cached_copy(s3):
+    s3_loader._write_cached("bucket", "ug.txt", "handbook v1", '"etag-1"')
+    error = EndpointConnectionError(endpoint_url="https://s3.example")
+
+    with patch.object(s3_loader._s3_client, "get_object", side_effect=error):
+        assert load_text_from_s3("ug.txt", bucket="bucket") == "handbook v1"
+
+
+def test_unreachable_s3_without_cache_raises(s3):
+    error = EndpointConnectionError(endpoint_url="https://s3.example")
+
+    with patch.object(s3_loader._s3_client, "get_object", side_effect=error):
+        with pytest.raises(RuntimeError):
+            load_text_from_s3("ug.txt", bucket="bucket")
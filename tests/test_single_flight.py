@@ -0,0 +1,115 @@
+import os
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("API_SECRET_TOKEN", "test-token")
+import asyncio
+import threading
+import time
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+from app.helper.single_flight import SingleFlight
+
+
+def test_do_coalesces_concurrent_thread_calls():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "result"
+
+    results = []
+
+    def worker():
+        results.append(flight.do("key", slow))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=worker) for _ in range(4)]
+    for t in followers:
+        t.start()
+    for t in [leader, *followers]:
+        t.join()
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "shared": 4}
+
+
+def test_do_propagates_exceptions_and_forgets_key():
+    flight = SingleFlight()
+
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+
+    assert flight.do("key", lambda: 42) == 42
+
+
+def test_ado_coalesces_concurrent_coroutines():
+    flight = SingleFlight()
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", slow, 21) for _ in range(5)))
+
+    assert asyncio.run(main()) == [42] * 5
+    assert calls == [21]
+    assert flight.in_flight() == 0
+
+
+def test_ado_different_keys_run_independently():
+    flight = SingleFlight()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+
+    async def main():
+        return await asyncio.gather(flight.ado("a", work, 1), flight.ado("b", work, 2))
+
+    assert asyncio.run(main()) == [1, 2]
+    assert sorted(calls) == [1, 2]
+
+
+def test_identical_concurrent_questions_share_one_llm_call():
+    from app.api import main
+
+    async def slow_answer(*args):
+        await asyncio.sleep(0.05)
+        return "The answer."
+
+    async def run():
+        kwargs = dict(
+            collection_name="handbook_pgr",
+            doc_type="handbook",
+            level="pgr",
+            system_prompt="prompt",
+            not_found_detail="missing",
+        )
+        return await asyncio.gather(
+            main.answer_question_once("ask_handbook", "When is the viva?", None, **kwargs),
+            main.answer_question_once("ask_handbook", "when is the  viva?", None, **kwargs),
+            main.answer_question_once("ask_handbook", "When is the viva?", "international", **kwargs),
+        )
+
+    with patch("app.api.main.retrieve_context", new_callable=AsyncMock) as mock_retrieve, \
+         patch("app.api.main.generate_answer", side_effect=slow_answer) as mock_generate, \
+         patch("app.api.main.ANSWER_CACHE"):
+        mock_retrieve.return_value = ([1.0], ["chunk"], None)
+        results = asyncio.run(run())
+
+    assert [r[:2] for r in results] == [(["chunk"], "The answer.")] * 3
+    # the first two are duplicates; the third differs by origin
+    assert mock_generate.call_count == 2
@@ -0,0 +1,99 @@
+import os
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+from unittest.mock import patch
+
+import pytest
+
+from app.helper import rag_engine, bm25, snapshot, vector_store
+from app.helper.router import ROUTER
+from app.helper.vector_store import NumpyBackend
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_engine, "MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(bm25, "BM25_DIR", str(tmp_path / "bm25"))
+    monkeypatch.setattr(vector_store, "_backend", NumpyBackend(str(tmp_path / "index")))
+
+    texts = {
+        ("handbook", "ug"): "UG 1 INTRODUCTION\nThe viva is held after submission.",
+        ("academic-integrity", None): "AI 1 MALPRACTICE\nPlagiarism is academic malpractice.",
+    }
+    monkeypatch.setitem(snapshot.SOURCES, "fake", lambda doc_type, level: texts[(doc_type, level)])
+    return tmp_path
+
+
+def fake_embed(texts):
+    return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+
+def fresh_stores(tmp_path, monkeypatch, name):
+    """Point every store at empty directories, as on a new replica."""
+    monkeypatch.setattr(rag_engine, "MANIFEST_DIR", str(tmp_path / name / "manifests"))
+    monkeypatch.setattr(bm25, "BM25_DIR", str(tmp_path / name / "bm25"))
+    monkeypatch.setattr(vector_store, "_backend", NumpyBackend(str(tmp_path / name / "index")))
+
+
+def test_build_then_restore_without_embedding_calls(env, monkeypatch):
+    path = str(env / "snap.json.gz")
+    documents = [("handbook", "ug"), ("academic-integrity", None)]
+    with patch("app.helper.rag_engine.embed_text", side_effect=fake_embed):
+        built = snapshot.build_snapshot(path, source="fake", documents=documents)
+
+    assert set(built["collections"]) == {"handbook_ug", "academic-integrity"}
+
+    assert built["router"]["categories"] == ["handbook", "academic_integrity", "other"]
+
+    fresh_stores(env, monkeypatch, "replica")
+    monkeypatch.setattr(ROUTER, "_centroids", None)
+    with patch("app.helper.rag_engine.embed_text", side_effect=AssertionError("no embedding at restore")):
+        restored = snapshot.restore_snapshot(path)
+
+    assert ROUTER.fitted  # router centroids come from the snapshot too
+
+    assert sorted(restored) == ["academic-integrity", "handbook_ug"]
+    col = rag_engine.get_or_create_collection("handbook", "ug")
+    assert col.count() == len(built["collections"]["handbook_ug"]["ids"])
+    assert rag_engine.load_manifest("handbook_ug")["embedding_model"] == rag_engine.EMBEDDING_MODEL
+    assert bm25.get_bm25_index("handbook_ug").search("viva")
+
+    # The manifest matches, so a later boot does not re-embed anything
+    with patch("app.helper.rag_engine.embed_text", side_effect=AssertionError("no re-embedding")):
+        report = rag_engine.index_document(
+            "UG 1 INTRODUCTION\nThe viva is held after submission.", doc_type="handbook", level="ug"
+        )
+    assert report["added"] == 0
+
+
+def test_restore_rejects_a_different_embedding_model(env, monkeypatch):
+    path = str(env / "snap.json.gz")
+    with patch("app.helper.rag_engine.embed_text", side_effect=fake_embed):
+        snapshot.build_snapshot(path, source="fake", documents=[("handbook", "ug")])
+
+    monkeypatch.setattr(snapshot, "EMBEDDING_MODEL", "another-model")
+    with pytest.raises(ValueError):
+        snapshot.restore_snapshot(path)
+
+
+def test_restore_from_s3_uri_downloads_first(env):
+    path = str(env / "snap.json.gz")
+    with patch("app.helper.rag_engine.embed_text", side_effect=fake_embed):
+        snapshot.build_snapshot(path, source="fake", documents=[("handbook", "ug")])
+
+    def download(bucket, key, local_path):
+        assert (bucket, key) == ("bucket", "snapshots/index.json.gz")
+        with open(path, "rb") as src, open(local_path, "wb") as dst:
+            dst.write(src.read())
+
+    with patch("app.helper.snapshot.get_s3_client") as mock_client:
+        mock_client.return_value.download_file.side_effect = download
+        loaded = snapshot.read_snapshot("s3://bucket/snapshots/index.json.gz")
+
+    assert list(loaded["collections"]) == ["handbook_ug"]
+
+
+def test_router_state_built_from_other_examples_is_ignored(monkeypatch):
+    monkeypatch.setattr(ROUTER, "_centroids", None)
+
+    assert not ROUTER.load_state({"examples_sha256": "stale", "categories": ["handbook"], "centroids": [[1.0]]})
+    assert not ROUTER.fitted
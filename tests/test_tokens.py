@@ -0,0 +1,34 @@
+import logging
+
+from app.helper import tokens
+
+
+def test_counts_fall_back_to_an_estimate_and_say_so(monkeypatch, caplog):
+    monkeypatch.setattr(tokens, "tiktoken", None)
+    tokens._get_encoding.cache_clear()
+    try:
+        with caplog.at_level(logging.WARNING):
+            assert tokens.count_tokens("x" * 10) == 3
+            assert not tokens.is_exact()
+        assert "token counts are estimates" in caplog.text
+    finally:
+        tokens._get_encoding.cache_clear()
+
+
+def test_counts_use_the_tokenizer_when_it_loads(monkeypatch):
+    class FakeEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    class FakeTiktoken:
+        @staticmethod
+        def get_encoding(name):
+            return FakeEncoding()
+
+    monkeypatch.setattr(tokens, "tiktoken", FakeTiktoken)
+    tokens._get_encoding.cache_clear()
+    try:
+        assert tokens.is_exact()
+        assert tokens.count_tokens("one two three four five six") == 6
+    finally:
+        tokens._get_encoding.cache_clear()
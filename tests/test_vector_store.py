@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from app.helper.vector_store import NumpyBackend, NumpyCollection, VectorBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return NumpyBackend(path=str(tmp_path))
+
+
+def test_query_returns_nearest_chunks_in_order(backend):
+    col = backend.get_or_create_collection("handbook_pgr")
+    col.upsert(
+        ids=["a", "b", "c"],
+        documents=["doc a", "doc b", "doc c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]],
+    )
+
+    results = col.query(query_embeddings=[[1.0, 0.1]], n_results=2)
+
+    assert results["ids"] == [["a", "c"]]
+    assert results["documents"] == [["doc a", "doc c"]]
+    assert results["distances"][0][0] == pytest.approx(1 - 1 / np.sqrt(1.01), abs=1e-5)
+
+
+def test_query_matches_brute_force_ranking(backend):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16))
+    col = backend.get_or_create_collection("big")
+    col.upsert(ids=[str(i) for i in range(200)], documents=[f"d{i}" for i in range(200)], embeddings=vectors)
+
+    query = rng.normal(size=16)
+    results = col.query(query_embeddings=[query], n_results=5)
+
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normed @ (query / np.linalg.norm(query))))[:5]
+    assert results["ids"][0] == [str(i) for i in expected]
+
+
+def test_multi_query_matches_single_queries(backend):
+    rng = np.random.default_rng(1)
+    col = backend.get_or_create_collection("multi")
+    col.upsert(ids=[str(i) for i in range(50)], documents=[f"d{i}" for i in range(50)],
+               embeddings=rng.normal(size=(50, 8)))
+    queries = rng.normal(size=(4, 8))
+
+    batched = col.query(query_embeddings=queries, n_results=3)
+
+    for i, query in enumerate(queries):
+        single = col.query(query_embeddings=[query], n_results=3)
+        assert batched["ids"][i] == single["ids"][0]
+        assert batched["distances"][i] == pytest.approx(single["distances"][0], abs=1e-6)
+
+
+def test_upsert_replaces_existing_ids(backend):
+    col = backend.get_or_create_collection("c1")
+    col.upsert(ids=["a"], documents=["old"], embeddings=[[1.0, 0.0]])
+    col.upsert(ids=["a", "b"], documents=["new", "other"], embeddings=[[0.0, 1.0], [1.0, 0.0]])
+
+    assert col.count() == 2
+    assert col.query(query_embeddings=[[0.0, 1.0]], n_results=1)["documents"] == [["new"]]
+
+
+def test_delete_and_get(backend):
+    col = backend.get_or_create_collection("c2")
+    col.upsert(ids=["a", "b", "c"], documents=["x", "y", "z"], embeddings=np.eye(3))
+
+    col.delete(ids=["b"])
+
+    assert col.get(include=[])["ids"] == ["a", "c"]
+    assert col.get(ids=["c"])["documents"] == ["z"]
+
+
+def test_empty_collection_query(backend):
+    col = backend.get_or_create_collection("empty")
+    assert col.query(query_embeddings=[[1.0, 0.0]], n_results=5)["documents"] == [[]]
+
+
+def test_index_persists_and_is_memory_mapped(tmp_path):
+    col = NumpyBackend(path=str(tmp_path)).get_or_create_collection("persisted")
+    col.upsert(ids=["a", "b"], documents=["x", "y"], embeddings=[[1.0, 0.0], [0.0, 1.0]],
+               metadatas=[{"section": "PR 2"}, None])
+
+    reloaded = NumpyCollection("persisted", str(tmp_path / "persisted"))
+
+    assert isinstance(reloaded._matrix, np.memmap)
+    assert reloaded._matrix.dtype == np.float32
+    results = reloaded.query(query_embeddings=[[0.9, 0.1]], n_results=1)
+    assert results["ids"] == [["a"]]
+    assert results["metadatas"] == [[{"section": "PR 2"}]]
+
+
+def test_backend_lists_and_deletes_collections(backend):
+    backend.get_or_create_collection("one").upsert(ids=["a"], documents=["x"], embeddings=[[1.0]])
+    backend.get_or_create_collection("two").upsert(ids=["a"], documents=["x"], embeddings=[[1.0]])
+
+    assert backend.list_collection_names() == ["one", "two"]
+    backend.delete_collection("one")
+    assert backend.list_collection_names() == ["two"]
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class HalfBackend(VectorBackend):
+        def get_or_create_collection(self, name):
+            return None
+
+    with pytest.raises(TypeError):
+        HalfBackend()